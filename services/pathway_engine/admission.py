@@ -0,0 +1,189 @@
+"""
+Backpressure and admission control for session ingestion
+
+AdmissionController tracks sessions written to INPUT_DIR that the pipeline
+has not counted yet. Once that backlog crosses the high-water mark, or the
+oldest pending session is older than the lag budget, ingestion is refused
+until the backlog drains below the low-water mark. Per-user token buckets
+keep a single client from flooding the input directory.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Classic token bucket, refilled lazily on each take"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, rate: float, burst: float) -> float:
+        """Consume one token, return 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class AdmissionController:
+    """Bounded ingestion backlog with hysteresis and per-user rate limits"""
+
+    def __init__(
+        self,
+        high_water: int = 10000,
+        low_water: int = 5000,
+        lag_budget_seconds: float = 30.0,
+        pending_timeout_seconds: float = 300.0,
+        user_rate: float = 20.0,
+        user_burst: float = 100.0,
+        max_tracked_users: int = 100000
+    ):
+        self.high_water = high_water
+        self.low_water = low_water
+        self.lag_budget_seconds = lag_budget_seconds
+        self.pending_timeout_seconds = pending_timeout_seconds
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_tracked_users = max_tracked_users
+
+        self._pending = deque()  # monotonic accept times, oldest first
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Pipeline total at startup: 0 for a fresh pipeline, the persisted
+        # total when it resumes from a snapshot (see seed_total)
+        self._last_total = 0
+        self._saturated = False
+        self._processed_rate = 0.0  # EWMA of sessions/second counted by the pipeline
+        self._last_progress = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.accepted = 0
+        self.processed = 0
+        self.expired = 0
+        self.rejected_backlog = 0
+        self.rejected_lag = 0
+        self.rejected_rate_limit = 0
+
+    def check_backlog(self) -> Optional[int]:
+        """None if the pipeline can take more input, else a Retry-After in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            depth = len(self._pending)
+            lag = now - self._pending[0] if self._pending else 0.0
+
+            if self._saturated and depth <= self.low_water and lag <= self.lag_budget_seconds:
+                self._saturated = False
+            if depth >= self.high_water:
+                self._saturated = True
+                self.rejected_backlog += 1
+            elif lag > self.lag_budget_seconds:
+                self._saturated = True
+                self.rejected_lag += 1
+            elif self._saturated:
+                self.rejected_backlog += 1
+            else:
+                return None
+
+            return self._retry_after(depth)
+
+    def check_user(self, user_id: str) -> Optional[int]:
+        """None if user_id is within its rate limit, else a Retry-After in seconds"""
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) >= self.max_tracked_users:
+                    self._prune_buckets()
+                bucket = self._buckets[user_id] = TokenBucket(self.user_burst)
+            wait = bucket.take(self.user_rate, self.user_burst)
+            if wait == 0:
+                return None
+            self.rejected_rate_limit += 1
+            return max(1, math.ceil(wait))
+
+    def on_accepted(self):
+        """A session was written to INPUT_DIR"""
+        with self._lock:
+            self._pending.append(time.monotonic())
+            self.accepted += 1
+
+    def seed_total(self, total: int):
+        """Session total the pipeline resumes from, call before admitting anything"""
+        with self._lock:
+            self._last_total = total
+
+    def on_total_sessions(self, total: int):
+        """Pipeline's running session total (from global_stats), marks sessions as processed"""
+        with self._lock:
+            if total < self._last_total:
+                # The pipeline restarted without its state
+                self._last_total = total
+                return
+            delta = total - self._last_total
+            self._last_total = total
+            if delta <= 0:
+                return
+
+            now = time.monotonic()
+            elapsed = max(now - self._last_progress, 1e-3)
+            self._processed_rate = 0.8 * self._processed_rate + 0.2 * (delta / elapsed)
+            self._last_progress = now
+            self.processed += delta
+            for _ in range(min(delta, len(self._pending))):
+                self._pending.popleft()
+
+    def on_global_stats_change(self, key, row, time: int, is_addition: bool):
+        """pw.io.subscribe callback for the global_stats table"""
+        if is_addition:
+            self.on_total_sessions(row["total_sessions"])
+
+    def _expire(self, now: float):
+        # Sessions the pipeline never counted (e.g. malformed rows) must not
+        # hold the backlog open forever
+        while self._pending and now - self._pending[0] > self.pending_timeout_seconds:
+            self._pending.popleft()
+            self.expired += 1
+
+    def _retry_after(self, depth: int) -> int:
+        excess = max(depth - self.low_water, 1)
+        if self._processed_rate > 0:
+            return max(1, math.ceil(excess / self._processed_rate))
+        return max(1, math.ceil(self.lag_budget_seconds / 2))
+
+    def _prune_buckets(self):
+        # A bucket that has refilled completely behaves like a new one
+        now = time.monotonic()
+        full_after = self.user_burst / self.user_rate
+        for user_id in [u for u, b in self._buckets.items() if now - b.updated >= full_after]:
+            del self._buckets[user_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "queue_depth": len(self._pending),
+                "oldest_pending_seconds": round(now - self._pending[0], 3) if self._pending else 0.0,
+                "high_water": self.high_water,
+                "low_water": self.low_water,
+                "lag_budget_seconds": self.lag_budget_seconds,
+                "saturated": self._saturated,
+                "accepted": self.accepted,
+                "processed": self.processed,
+                "expired": self.expired,
+                "processed_per_second": round(self._processed_rate, 2),
+                "rejected": {
+                    "backlog": self.rejected_backlog,
+                    "lag": self.rejected_lag,
+                    "rate_limit": self.rejected_rate_limit
+                },
+                "tracked_users": len(self._buckets)
+            }
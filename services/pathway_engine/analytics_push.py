@@ -0,0 +1,100 @@
+"""
+Push delivery of per-user analytics changes
+
+The broadcaster is fed with the pipeline's comprehensive analytics stream
+(pw.io.subscribe or JsonlFollower) and forwards the changed fields of a
+user's row to that user's SSE/WebSocket subscribers. Updates for users with
+no subscribers are dropped after a single dict lookup.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+
+class AnalyticsBroadcaster:
+    """Fan out comprehensive row changes to per-user subscriber queues"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._last_rows: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, user_id: str, initial_row: Optional[Dict[str, Any]] = None) -> asyncio.Queue:
+        """Register a subscriber, must be called from the serving event loop"""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(queue)
+            if initial_row is not None and user_id not in self._last_rows:
+                self._last_rows[user_id] = dict(initial_row)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+                self._last_rows.pop(user_id, None)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the comprehensive analytics table"""
+        # An update arrives as a retraction plus an addition, the addition
+        # carries the new state
+        if not is_addition:
+            return
+
+        user_id = row["user_id"]
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if not queues:
+                return
+            previous = self._last_rows.get(user_id, {})
+            changes = {
+                field: value for field, value in row.items()
+                if previous.get(field) != value
+            }
+            self._last_rows[user_id] = dict(row)
+            queues = list(queues)
+            loop = self._loop
+
+        if not changes or loop is None:
+            return
+
+        message = {
+            "type": "update",
+            "user_id": user_id,
+            "changes": changes,
+            "emitted_at": _now_ms()
+        }
+        for queue in queues:
+            loop.call_soon_threadsafe(self._deliver, queue, message, dict(row))
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, message: Dict[str, Any], row: Dict[str, Any]):
+        if not queue.full():
+            queue.put_nowait(message)
+            return
+        # Slow consumer: drop the backlog of deltas and send the full row
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({
+            "type": "resync",
+            "user_id": message["user_id"],
+            "changes": row,
+            "emitted_at": message["emitted_at"]
+        })
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
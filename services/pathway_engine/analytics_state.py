@@ -0,0 +1,121 @@
+"""
+Versioned per-user analytics state
+
+Mirrors the pipeline's comprehensive, type and language outputs in memory.
+Each user carries a version that advances only when the pipeline emits a
+change for that user, which lets the API cache formatted responses per
+version and answer conditional GETs without touching the output files.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class UserAnalyticsState:
+    """Latest pipeline rows per user, with a per-user change version"""
+
+    def __init__(self):
+        self._comprehensive: Dict[str, Dict[str, Any]] = {}
+        self._types: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._languages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, user_id: str) -> int:
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def snapshot(self, user_id: str) -> Optional[Tuple[int, Dict[str, Any], list, list]]:
+        """(version, comprehensive row, type rows, language rows) or None if unseen"""
+        with self._lock:
+            comprehensive = self._comprehensive.get(user_id)
+            if comprehensive is None:
+                return None
+            return (
+                self._versions.get(user_id, 0),
+                dict(comprehensive),
+                list(self._types.get(user_id, {}).values()),
+                list(self._languages.get(user_id, {}).values())
+            )
+
+    def on_comprehensive_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the comprehensive table"""
+        user_id = row["user_id"]
+        with self._lock:
+            if is_addition:
+                self._comprehensive[user_id] = row
+            elif self._comprehensive.get(user_id) == row:
+                del self._comprehensive[user_id]
+            self._bump(user_id)
+
+    def on_type_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the type_stats table"""
+        self._apply_keyed(self._types, row["session_type"], row, is_addition)
+
+    def on_language_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the language_stats table"""
+        self._apply_keyed(self._languages, row["language"], row, is_addition)
+
+    def _apply_keyed(self, table: Dict[str, Dict[str, Dict[str, Any]]], name: str, row: Dict[str, Any], is_addition: bool):
+        user_id = row["user_id"]
+        with self._lock:
+            rows = table.setdefault(user_id, {})
+            if is_addition:
+                rows[name] = row
+            elif rows.get(name) == row:
+                # Only drop the row if it has not already been replaced
+                del rows[name]
+            if not rows:
+                del table[user_id]
+            self._bump(user_id)
+
+    def _bump(self, user_id: str):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+
+class LatestRow:
+    """Latest row of a single-row pipeline table, such as the global stats"""
+
+    def __init__(self):
+        self._row: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback, retractions are superseded by the next addition"""
+        if is_addition:
+            with self._lock:
+                self._row = row
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return dict(self._row) if self._row is not None else None
+
+
+class VersionedResponseCache:
+    """LRU cache of formatted responses, valid only for the version they were built at"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Hashable, version: int, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = build()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
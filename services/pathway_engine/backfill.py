@@ -0,0 +1,113 @@
+"""
+Offline backfill for the Pathway analytics pipeline
+
+Runs create_pathway_pipeline() in static mode over a bulk export (one CSV
+or JSON Lines file, or a directory of them) at full speed and writes the
+final-state outputs, e.g. to rebuild every user's analytics after a logic
+change. Input columns follow SessionSchema with unix timestamps.
+
+Usage:
+    python backfill.py export.csv --output-dir /app/output_backfill
+    python backfill.py exports/ --format jsonl --threads 8 --replace
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild analytics outputs from a bulk session export")
+    parser.add_argument("input", help="CSV/JSON Lines file or directory of files")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--output-dir", help="Where to write outputs (default: $OUTPUT_DIR with a _backfill suffix)")
+    parser.add_argument("--replace", action="store_true", help="Swap the finished outputs into $OUTPUT_DIR, keeping the old ones as *_previous")
+    parser.add_argument("--threads", type=int, help="Pathway worker threads (PATHWAY_THREADS)")
+    parser.add_argument("--history", action="store_true", help="Also write the rebuilt sessions/metrics to the history store")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+    if args.threads:
+        os.environ["PATHWAY_THREADS"] = str(args.threads)
+
+    # Imported after PATHWAY_THREADS is set
+    import pathway as pw
+    from output_log import MIRRORED_OUTPUTS, compact, log_path
+    from pathway_analytics import OUTPUT_DIR, OUTPUT_LOG_DIR, create_pathway_pipeline
+
+    output_dir = args.output_dir or f"{OUTPUT_DIR.rstrip('/')}_backfill"
+    if os.path.abspath(output_dir) == os.path.abspath(OUTPUT_DIR):
+        parser.error("--output-dir must differ from OUTPUT_DIR, use --replace to swap it in")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+
+    outputs = create_pathway_pipeline(
+        input_dir=args.input,
+        output_dir=output_dir,
+        mode="static",
+        input_format=args.format,
+        history=args.history
+    )
+
+    # A single aggregate row, so counting costs one callback per update, not per session
+    counts = {"sessions": 0, "users": 0}
+
+    def on_count_change(key, row, time, is_addition):
+        if is_addition:
+            counts.update(row)
+
+    pw.io.subscribe(
+        outputs["sessions"].reduce(sessions=pw.reducers.count()),
+        on_change=on_count_change
+    )
+    pw.io.subscribe(
+        outputs["user_stats"].reduce(users=pw.reducers.count()),
+        on_change=on_count_change
+    )
+
+    logger.info(f"⏳ Backfilling from {args.input} into {output_dir}...")
+    start = time.perf_counter()
+    pw.run()
+    elapsed = time.perf_counter() - start
+
+    if args.replace:
+        previous = f"{OUTPUT_DIR.rstrip('/')}_previous"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(OUTPUT_DIR):
+            os.replace(OUTPUT_DIR, previous)
+        os.replace(output_dir, OUTPUT_DIR)
+        output_dir = OUTPUT_DIR
+        # The API rebuilds its state from the output log, not the sinks
+        os.makedirs(OUTPUT_LOG_DIR, exist_ok=True)
+        for name in MIRRORED_OUTPUTS:
+            shutil.copyfile(os.path.join(OUTPUT_DIR, f"{name}.jsonl"), log_path(OUTPUT_LOG_DIR, name))
+            compact(log_path(OUTPUT_LOG_DIR, name))
+        logger.info(f"🔁 Outputs swapped into {OUTPUT_DIR} and {OUTPUT_LOG_DIR}, previous kept in {previous}")
+
+    report = {
+        "input": args.input,
+        "output_dir": output_dir,
+        "sessions": counts["sessions"],
+        "users": counts["users"],
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(counts["sessions"] / elapsed, 1) if elapsed > 0 else None,
+        "threads": int(os.getenv("PATHWAY_THREADS", "1"))
+    }
+    logger.info(f"✅ Backfill complete: {report['sessions']} sessions for {report['users']} users in {report['seconds']}s ({report['rows_per_second']} rows/s)")
+    json.dump(report, sys.stdout)
+    print()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
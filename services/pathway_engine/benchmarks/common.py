@@ -0,0 +1,94 @@
+"""
+Shared helpers for the Pathway engine benchmarks
+"""
+
+import os
+import random
+import subprocess
+import sys
+import time
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CSV_HEADER = "user_id,session_type,timestamp,duration,focus_score,quality_score,distractions,language,lines_of_code,creativity_score\n"
+
+
+def write_sessions(input_dir: str, sessions: int, users: int, files: int):
+    """Write the session history as a handful of bulk CSV files"""
+    rng = random.Random(42)
+    now = int(time.time())
+    per_file = max(1, sessions // files)
+    written = 0
+    index = 0
+    while written < sessions:
+        count = min(per_file, sessions - written)
+        with open(os.path.join(input_dir, f"history_{index:05d}.csv"), "w") as f:
+            f.write(CSV_HEADER)
+            for _ in range(count):
+                session_type = rng.choice(["code", "whiteboard"])
+                f.write(
+                    f"user_{rng.randrange(users)},{session_type},"
+                    f"{now - rng.randrange(90 * 86400)},{rng.randint(300, 7200)},"
+                    f"{rng.randint(20, 100)},{rng.randint(20, 100)},{rng.randint(0, 10)},"
+                    f"{'python' if session_type == 'code' else 'unknown'},"
+                    f"{rng.randint(0, 500) if session_type == 'code' else 0},0\n"
+                )
+        written += count
+        index += 1
+
+
+def write_probe(input_dir: str, user_id: str):
+    """Write a single marker session for user_id"""
+    with open(os.path.join(input_dir, f"probe_{user_id}.csv"), "w") as f:
+        f.write(CSV_HEADER)
+        f.write(f"{user_id},code,{int(time.time())},60,50,50,0,python,1,0\n")
+
+
+def start_pipeline(workdir: str, persistence: bool = False, **env_overrides) -> subprocess.Popen:
+    """Start the standalone analytics pipeline in a subprocess pointed at workdir"""
+    env = dict(
+        os.environ,
+        INPUT_DIR=os.path.join(workdir, "input"),
+        OUTPUT_DIR=os.path.join(workdir, "output"),
+        PERSISTENCE_DIR=os.path.join(workdir, "state"),
+        PERSISTENCE_ENABLED="true" if persistence else "false",
+        SNAPSHOT_INTERVAL_MS="1000",
+        HISTORY_ENABLED="false",
+        **env_overrides,
+    )
+    return subprocess.Popen(
+        [sys.executable, "pathway_analytics.py"],
+        cwd=ENGINE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_for_user(output_file: str, user_id: str, timeout: float) -> float:
+    """Block until user_id appears in output_file, return elapsed seconds"""
+    start = time.perf_counter()
+    needle = f'"user_id":"{user_id}"'
+    position = 0
+    while time.perf_counter() - start < timeout:
+        if os.path.exists(output_file):
+            if os.path.getsize(output_file) < position:
+                position = 0  # Sink was truncated on restart
+            with open(output_file, "r") as f:
+                f.seek(position)
+                chunk = f.read()
+                position = f.tell()
+            if needle in chunk.replace(" ", ""):
+                return time.perf_counter() - start
+        time.sleep(0.05)
+    raise TimeoutError(f"{user_id} did not appear in {output_file} within {timeout}s")
+
+
+def stop_process(process: subprocess.Popen):
+    """Terminate a subprocess, killing it if it does not exit in time"""
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
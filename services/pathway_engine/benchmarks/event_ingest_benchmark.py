@@ -0,0 +1,122 @@
+"""
+Event ingestion throughput benchmark for the intervention engine
+
+Starts pathway_interventions.py with HTTP ingestion, posts synthetic event
+batches from several concurrent clients and reports accepted events per
+second.
+
+Usage:
+    python benchmarks/event_ingest_benchmark.py --events 1000000 --batch 1000 --clients 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+
+from common import ENGINE_DIR, stop_process
+
+EVENT_TYPES = ["keystroke"] * 8 + ["tab_switch", "blur", "focus"]
+
+
+def make_batch(rng: random.Random, users: int, size: int):
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            "user_id": f"user_{rng.randrange(users)}",
+            "space_type": "code",
+            "event_type": rng.choice(EVENT_TYPES),
+            "value": 1.0,
+            "timestamp": now
+        }
+        for _ in range(size)
+    ]
+
+
+async def wait_ready(url: str, timeout: float = 60.0):
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() - start < timeout:
+            try:
+                async with session.get(f"{url}/stats") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError("Event ingestion did not come up")
+
+
+async def send(url: str, events: int, batch: int, clients: int, users: int) -> dict:
+    per_client = events // clients
+    accepted = 0
+
+    async def client(index: int):
+        nonlocal accepted
+        rng = random.Random(index)
+        # Pre-serialize so the benchmark measures the server, not json.dumps
+        bodies = [json.dumps(make_batch(rng, users, batch)) for _ in range(8)]
+        sent = 0
+        async with aiohttp.ClientSession() as session:
+            while sent < per_client:
+                async with session.post(f"{url}/events", data=bodies[sent // batch % len(bodies)],
+                                        headers={"Content-Type": "application/json"}) as response:
+                    result = await response.json()
+                    accepted += result.get("accepted", 0)
+                sent += batch
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "accepted": accepted,
+        "seconds": round(elapsed, 3),
+        "events_per_second": round(accepted / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure intervention event ingestion throughput")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=18002)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pathway_event_ingest_")
+    env = dict(
+        os.environ,
+        INTERVENTION_EVENT_SOURCE="http",
+        INTERVENTION_PORT=str(args.port),
+        INTERVENTION_OUTPUT_DIR=os.path.join(workdir, "interventions"),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "pathway_interventions.py"],
+        cwd=ENGINE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_ready(url))
+        result = asyncio.run(send(url, args.events, args.batch, args.clients, args.users))
+        result.update(batch=args.batch, clients=args.clients)
+        print(json.dumps(result, indent=2))
+    finally:
+        stop_process(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+End-to-end latency benchmark for the Pathway analytics engine
+
+Starts the engine locally, sends synthetic SessionEvent traffic for N users
+at a target rate and measures:
+- ingest acceptance: share and rate of POST /ingest/session calls accepted
+- pipeline lag: time from acceptance until user_stats.jsonl reflects the session
+- read-your-write latency: time from acceptance until GET /analytics/{user_id}
+  reports the new session count
+
+Results are saved as JSON (tagged with the git revision) so runs can be
+compared across versions with --baseline.
+
+Usage:
+    python benchmarks/latency_benchmark.py --users 1000 --rate 200 --duration 60
+    python benchmarks/latency_benchmark.py --baseline benchmarks/results/latency_<rev>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+
+from common import ENGINE_DIR, stop_process
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentiles(values):
+    """p50/p90/p99/max of a list of seconds, reported in milliseconds"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ENGINE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+class OutputWatcher(threading.Thread):
+    """Record when each (user_id, total_sessions) first appears in user_stats.jsonl"""
+
+    def __init__(self, filepath: str):
+        super().__init__(daemon=True)
+        self.filepath = filepath
+        self.seen = {}
+        self.running = True
+
+    def run(self):
+        position = 0
+        while self.running:
+            if os.path.exists(self.filepath):
+                with open(self.filepath, "r") as f:
+                    f.seek(position)
+                    while True:
+                        line = f.readline()
+                        if not line.endswith("\n"):
+                            break
+                        position = f.tell()
+                        row = json.loads(line)
+                        if row.get("diff", 1) > 0:
+                            self.seen.setdefault((row["user_id"], row["total_sessions"]), time.perf_counter())
+            time.sleep(0.005)
+
+
+def start_engine(workdir: str, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        INPUT_DIR=os.path.join(workdir, "input"),
+        OUTPUT_DIR=os.path.join(workdir, "output"),
+        PERSISTENCE_DIR=os.path.join(workdir, "state"),
+        PERSISTENCE_ENABLED="false",
+        HISTORY_ENABLED="false",
+        PORT=str(port),
+    )
+    return subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=ENGINE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60.0):
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as http:
+        while time.perf_counter() - start < timeout:
+            try:
+                async with http.get(f"{base_url}/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("Engine did not become healthy")
+
+
+async def read_your_write(http, base_url: str, user_id: str, expected: int, accepted_at: float, timeout: float):
+    """Poll analytics until the user's session count reaches expected"""
+    while time.perf_counter() - accepted_at < timeout:
+        async with http.get(f"{base_url}/analytics/{user_id}") as response:
+            data = await response.json()
+        if data.get("overview", {}).get("total_sessions", 0) >= expected:
+            return time.perf_counter() - accepted_at
+        await asyncio.sleep(0.01)
+    return None
+
+
+async def generate_load(args, base_url: str):
+    rng = random.Random(7)
+    sent_per_user = {}
+    accepted = []  # (user_id, session_number, accepted_at)
+    rejected = 0
+    failed = 0
+    ryw_tasks = []
+    interval = 1.0 / args.rate
+    total = int(args.rate * args.duration)
+
+    async with aiohttp.ClientSession() as http:
+        async def send(user_id: str):
+            nonlocal rejected, failed
+            session_type = rng.choice(["code", "whiteboard"])
+            payload = {
+                "user_id": user_id,
+                "session_type": session_type,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "duration": rng.randint(300, 7200),
+                "focus_score": rng.randint(20, 100),
+                "quality_score": rng.randint(20, 100),
+                "distractions": rng.randint(0, 10),
+                "language": "python" if session_type == "code" else None,
+                "lines_of_code": rng.randint(0, 500) if session_type == "code" else None,
+            }
+            try:
+                async with http.post(f"{base_url}/ingest/session", json=payload) as response:
+                    if response.status != 200:
+                        rejected += 1
+                        return
+            except aiohttp.ClientError:
+                failed += 1
+                return
+            now = time.perf_counter()
+            sent_per_user[user_id] = sent_per_user.get(user_id, 0) + 1
+            accepted.append((user_id, sent_per_user[user_id], now))
+            if rng.random() < args.ryw_sample:
+                ryw_tasks.append(asyncio.create_task(
+                    read_your_write(http, base_url, user_id, sent_per_user[user_id], now, args.timeout)
+                ))
+
+        start = time.perf_counter()
+        pending = []
+        for i in range(total):
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(send(f"bench_user_{rng.randrange(args.users)}")))
+        await asyncio.gather(*pending)
+        send_seconds = time.perf_counter() - start
+        ryw = [r for r in await asyncio.gather(*ryw_tasks) if r is not None]
+
+    return {
+        "requested": total,
+        "accepted": len(accepted),
+        "rejected": rejected,
+        "failed": failed,
+        "send_seconds": send_seconds,
+        "accepted_sessions": accepted,
+        "ryw": ryw,
+        "ryw_sampled": len(ryw_tasks),
+    }
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline.get('revision')} ({baseline_path}):")
+    for metric in ["pipeline_lag", "read_your_write"]:
+        for key in ["p50_ms", "p90_ms", "p99_ms"]:
+            old = baseline.get(metric, {}).get(key)
+            new = current.get(metric, {}).get(key)
+            if old is not None and new is not None:
+                print(f"  {metric}.{key}: {old} -> {new} ({new - old:+.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ingest-to-analytics latency")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=100.0, help="Target sessions per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--ryw-sample", type=float, default=0.1, help="Share of sessions tracked for read-your-write")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a session after this many seconds")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/latency_<rev>_<time>.json)")
+    parser.add_argument("--baseline", help="Previous result file to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pathway_latency_")
+    base_url = f"http://127.0.0.1:{args.port}"
+    engine = start_engine(workdir, args.port)
+    watcher = OutputWatcher(os.path.join(workdir, "output", "user_stats.jsonl"))
+
+    try:
+        asyncio.run(wait_until_healthy(base_url))
+        watcher.start()
+        load = asyncio.run(generate_load(args, base_url))
+
+        # Allow the pipeline to drain before computing lag
+        deadline = time.perf_counter() + args.timeout
+        while time.perf_counter() < deadline:
+            if all((u, n) in watcher.seen for u, n, _ in load["accepted_sessions"]):
+                break
+            time.sleep(0.1)
+        lag = [
+            watcher.seen[(u, n)] - t
+            for u, n, t in load["accepted_sessions"]
+            if (u, n) in watcher.seen
+        ]
+    finally:
+        watcher.running = False
+        stop_process(engine)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "revision": git_revision(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "users": args.users,
+            "rate": args.rate,
+            "duration": args.duration,
+            "ryw_sample": args.ryw_sample,
+        },
+        "ingest": {
+            "requested": load["requested"],
+            "accepted": load["accepted"],
+            "rejected": load["rejected"],
+            "failed": load["failed"],
+            "acceptance_ratio": round(load["accepted"] / load["requested"], 4) if load["requested"] else 0,
+            "accepted_per_second": round(load["accepted"] / load["send_seconds"], 1),
+        },
+        "pipeline_lag": {**percentiles(lag), "missing": load["accepted"] - len(lag)},
+        "read_your_write": {**percentiles(load["ryw"]), "missing": load["ryw_sampled"] - len(load["ryw"])},
+    }
+
+    print(json.dumps(result, indent=2))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"latency_{result['revision']}_{int(time.time())}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.baseline:
+        compare(result, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
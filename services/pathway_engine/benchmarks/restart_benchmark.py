@@ -0,0 +1,84 @@
+"""
+Restart time benchmark for the Pathway analytics engine
+
+Loads a large session history (1M sessions by default), lets the engine
+checkpoint it, then restarts the engine and measures how long it takes until
+a session written after the restart shows up in the output.
+
+Usage:
+    python benchmarks/restart_benchmark.py --sessions 1000000 --compare-cold
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from common import start_pipeline, stop_process, wait_for_user, write_probe, write_sessions
+
+
+def measure(workdir: str, args, persistence: bool) -> dict:
+    input_dir = os.path.join(workdir, "input")
+    output_file = os.path.join(workdir, "output", "user_stats.jsonl")
+
+    # Initial load of the full history
+    write_probe(input_dir, "probe_initial")
+    engine = start_pipeline(workdir, persistence)
+    initial_load = wait_for_user(output_file, "probe_initial", args.timeout)
+    # Give the engine time to take a snapshot covering the history
+    time.sleep(args.settle)
+    stop_process(engine)
+
+    # Restart with one new session and time until it is reflected
+    write_probe(input_dir, "probe_restart")
+    engine = start_pipeline(workdir, persistence)
+    try:
+        restart = wait_for_user(output_file, "probe_restart", args.timeout)
+    finally:
+        stop_process(engine)
+
+    return {
+        "persistence": persistence,
+        "initial_load_seconds": round(initial_load, 3),
+        "restart_seconds": round(restart, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Pathway engine restart time")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--files", type=int, default=100, help="Number of history CSV files")
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to wait for a snapshot before stopping")
+    parser.add_argument("--timeout", type=float, default=1800.0)
+    parser.add_argument("--compare-cold", action="store_true", help="Also measure a restart without persistence")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {
+        "sessions": args.sessions,
+        "users": args.users,
+        "runs": [],
+    }
+
+    for persistence in ([True, False] if args.compare_cold else [True]):
+        workdir = tempfile.mkdtemp(prefix="pathway_restart_")
+        try:
+            os.makedirs(os.path.join(workdir, "input"))
+            print(f"Generating {args.sessions} sessions in {workdir}...")
+            write_sessions(os.path.join(workdir, "input"), args.sessions, args.users, args.files)
+            run = measure(workdir, args, persistence)
+            print(json.dumps(run))
+            results["runs"].append(run)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
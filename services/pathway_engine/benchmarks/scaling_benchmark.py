@@ -0,0 +1,106 @@
+"""
+Worker scaling benchmark for the Pathway analytics pipeline
+
+Runs the standalone pipeline in static mode over the same session history
+with 1, 2, 4 and 8 workers and reports sessions processed per second.
+Startup cost is measured once on an empty input and subtracted.
+
+Usage:
+    python benchmarks/scaling_benchmark.py --sessions 1000000
+    python benchmarks/scaling_benchmark.py --processes   # workers as processes
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ENGINE_DIR, write_sessions
+
+
+def run_static(workdir: str, workers: int, use_processes: bool) -> float:
+    """Run the pipeline to completion, return wall-clock seconds"""
+    output_dir = os.path.join(workdir, f"output_{workers}")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    env = dict(
+        os.environ,
+        INPUT_DIR=os.path.join(workdir, "input"),
+        OUTPUT_DIR=output_dir,
+        PIPELINE_INPUT_MODE="static",
+        PERSISTENCE_ENABLED="false",
+        HISTORY_ENABLED="false",
+    )
+    if use_processes:
+        command = ["pathway", "spawn", "--processes", str(workers), sys.executable, "pathway_analytics.py"]
+    else:
+        env["PATHWAY_THREADS"] = str(workers)
+        command = [sys.executable, "pathway_analytics.py"]
+
+    start = time.perf_counter()
+    subprocess.run(
+        command,
+        cwd=ENGINE_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure pipeline throughput across worker counts")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--files", type=int, default=64, help="Number of input CSV files")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--processes", action="store_true", help="Scale with processes instead of threads")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pathway_scaling_")
+    results = {
+        "sessions": args.sessions,
+        "users": args.users,
+        "unit": "processes" if args.processes else "threads",
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+
+    try:
+        # Baseline: engine startup and shutdown with no data
+        os.makedirs(os.path.join(workdir, "input"))
+        startup = run_static(workdir, 1, args.processes)
+        results["startup_seconds"] = round(startup, 3)
+
+        print(f"Generating {args.sessions} sessions in {workdir}...")
+        write_sessions(os.path.join(workdir, "input"), args.sessions, args.users, args.files)
+
+        for workers in args.workers:
+            elapsed = run_static(workdir, workers, args.processes)
+            processing = max(elapsed - startup, 1e-9)
+            run = {
+                "workers": workers,
+                "elapsed_seconds": round(elapsed, 3),
+                "sessions_per_second": round(args.sessions / processing),
+            }
+            print(json.dumps(run))
+            results["runs"].append(run)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = results["runs"][0]["sessions_per_second"] if results["runs"] else 0
+    for run in results["runs"]:
+        run["speedup"] = round(run["sessions_per_second"] / baseline, 2) if baseline else None
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Bounded-memory session_id deduplication for idempotent ingestion
+
+Recent IDs are kept exactly in an LRU set. IDs evicted from it move into a
+Bloom filter; once a filter reaches its capacity a fresh one is started and
+only the previous generation is kept, so memory stays fixed no matter how
+many sessions are ingested. A Bloom hit can be a false positive (bounded by
+error_rate), which is reported as a probable duplicate.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over blake2b"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+
+class SessionDeduplicator:
+    """Exact recent set plus two generations of Bloom filters"""
+
+    def __init__(self, recent_size: int = 100_000, filter_capacity: int = 1_000_000, error_rate: float = 1e-4):
+        self.recent_size = recent_size
+        self.filter_capacity = filter_capacity
+        self.error_rate = error_rate
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._current = BloomFilter(filter_capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.probable_duplicates = 0
+
+    def check_and_add(self, session_id: str) -> Optional[str]:
+        """
+        Record session_id, returning None if new,
+        'exact' if seen recently or 'probable' if a filter matched
+        """
+        with self._lock:
+            if session_id in self._recent:
+                self._recent.move_to_end(session_id)
+                self.duplicates += 1
+                return "exact"
+            if session_id in self._current or (self._previous is not None and session_id in self._previous):
+                self.probable_duplicates += 1
+                return "probable"
+
+            self._recent[session_id] = None
+            if len(self._recent) > self.recent_size:
+                evicted, _ = self._recent.popitem(last=False)
+                self._remember(evicted)
+            return None
+
+    def forget(self, session_id: str):
+        """Undo check_and_add for an ID whose ingestion failed"""
+        with self._lock:
+            self._recent.pop(session_id, None)
+
+    def _remember(self, session_id: str):
+        if self._current.full:
+            self._previous = self._current
+            self._current = BloomFilter(self.filter_capacity, self.error_rate)
+        self._current.add(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "recent_ids": len(self._recent),
+                "filtered_ids": self._current.count + (self._previous.count if self._previous else 0),
+                "duplicates": self.duplicates,
+                "probable_duplicates": self.probable_duplicates
+            }
+
+    def save(self, filepath: str):
+        """Snapshot the dedup state so it survives restarts"""
+        with self._lock:
+            state = (list(self._recent), self._current, self._previous)
+        tmp = f"{filepath}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp, filepath)
+
+    def load(self, filepath: str):
+        if not os.path.exists(filepath):
+            return
+        try:
+            with open(filepath, "rb") as f:
+                recent, current, previous = pickle.load(f)
+        except Exception as e:
+            logger.error(f"Could not load dedup state from {filepath}: {e}")
+            return
+        with self._lock:
+            self._recent = OrderedDict((session_id, None) for session_id in recent)
+            self._current = current
+            self._previous = previous
@@ -0,0 +1,117 @@
+"""
+Local stub receiver for intervention webhooks
+
+Accepts intervention batches on POST /hook, fails the first requests
+and/or a configurable share of them with 503 to exercise retries, and
+reports what it received on GET /received. With --register it subscribes
+itself to a running intervention engine.
+
+Usage:
+    python delivery_stub.py --port 9100 --fail-rate 0.2 --register http://localhost:8003
+    python delivery_stub.py --register http://localhost:8003 --types reduce_context_switching,slow_down
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Dict, Optional
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class StubReceiver:
+    """Counts received batches and interventions, failing some on purpose"""
+
+    def __init__(self, fail_rate: float = 0.0, seed: Optional[int] = None, fail_first: int = 0):
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.failed = 0
+        self.batches = 0
+        self.interventions = 0
+        self.largest_batch = 0
+        self.by_type: Dict[str, int] = {}
+        self.last: Optional[Dict[str, Any]] = None
+
+    async def hook(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.requests <= self.fail_first or self._random.random() < self.fail_rate:
+            self.failed += 1
+            return web.json_response({"error": "stub failure"}, status=503)
+        batch = await request.json()
+        self.batches += 1
+        self.interventions += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for intervention in batch:
+            name = intervention.get("intervention_type", "unknown")
+            self.by_type[name] = self.by_type.get(name, 0) + 1
+        if batch:
+            self.last = batch[-1]
+        logger.info(f"📬 Batch of {len(batch)} ({self.interventions} total)")
+        return web.json_response({"received": len(batch)})
+
+    async def received(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": self.requests,
+            "failed": self.failed,
+            "batches": self.batches,
+            "interventions": self.interventions,
+            "largest_batch": self.largest_batch,
+            "by_type": self.by_type,
+            "last": self.last
+        })
+
+
+async def register(hub: str, url: str, types: Optional[str], min_severity: Optional[str]) -> Dict[str, Any]:
+    spec = {"url": url, "intervention_types": types.split(",") if types else None, "min_severity": min_severity}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{hub}/subscriptions", json=spec) as response:
+            return await response.json()
+
+
+async def serve(args):
+    receiver = StubReceiver(args.fail_rate, args.seed, args.fail_first)
+    app = web.Application()
+    app.router.add_post("/hook", receiver.hook)
+    app.router.add_get("/received", receiver.received)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    url = f"http://{args.host}:{args.port}/hook"
+    logger.info(f"🧪 Stub receiver on {url}, failing {args.fail_rate:.0%} of requests")
+    if args.register:
+        subscription = await register(args.register, url, args.types, args.min_severity)
+        logger.info(f"📡 Registered: {json.dumps(subscription)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub webhook receiver for intervention delivery")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with 503")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--register", help="Delivery hub to subscribe to, e.g. http://localhost:8003")
+    parser.add_argument("--types", help="Comma-separated intervention types to subscribe to")
+    parser.add_argument("--min-severity", choices=["low", "medium", "high"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
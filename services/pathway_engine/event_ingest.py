@@ -0,0 +1,157 @@
+"""
+HTTP and WebSocket event ingestion for the intervention engine
+
+EventIngestSubject is a Pathway python connector that runs a small aiohttp
+server. Clients POST JSON arrays of events to /events, or send them as
+WebSocket messages on /ws/events, and every valid event goes straight into
+the pipeline with no intermediate files. Pathway commits the ingested
+events every autocommit interval, so large batches cost one request, not one
+file write per event.
+
+Event fields: user_id, event_type, timestamp (ISO 8601 or unix seconds),
+optional space_type and value. Malformed events, including unparseable
+timestamps, are counted as rejected; a batch is validated in full before
+any of it reaches the pipeline.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import pathway as pw
+from aiohttp import WSMsgType, web
+
+from intervention_gate import parse_event_time
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_event(event: Any) -> Optional[Dict[str, Any]]:
+    """Event as EventSchema columns, or None if it is malformed"""
+    if not isinstance(event, dict):
+        return None
+    user_id = event.get("user_id")
+    event_type = event.get("event_type")
+    if not isinstance(user_id, str) or not isinstance(event_type, str):
+        return None
+    # Validated here so a bad timestamp is rejected, not passed to the pipeline
+    timestamp = parse_event_time(event.get("timestamp"))
+    if timestamp is None:
+        return None
+    try:
+        value = float(event.get("value") or 0.0)
+    except (TypeError, ValueError):
+        return None
+    return {
+        "user_id": user_id,
+        "space_type": str(event.get("space_type") or "unknown"),
+        "event_type": event_type,
+        "value": value,
+        "timestamp": timestamp.isoformat()
+    }
+
+
+class EventIngestSubject(pw.io.python.ConnectorSubject):
+    """Feeds batched events received over HTTP/WebSocket into the pipeline"""
+
+    def __init__(self, host: str, port: int, max_batch: int = 10000):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def ingest(self, events: Any) -> Tuple[int, int]:
+        """Push a batch into the pipeline, return (accepted, rejected)"""
+        if isinstance(events, dict):
+            events = [events]
+        # Validate the whole batch before pushing any of it
+        rows: List[Dict[str, Any]] = [row for row in map(normalize_event, events) if row is not None]
+        for row in rows:
+            self.next(**row)
+        accepted = len(rows)
+        rejected = len(events) - accepted
+        with self._lock:
+            self.accepted += accepted
+            self.rejected += rejected
+            self.batches += 1
+        return accepted, rejected
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"accepted": self.accepted, "rejected": self.rejected, "batches": self.batches}
+
+    async def post_events(self, request: web.Request) -> web.Response:
+        try:
+            events = json.loads(await request.read())
+        except ValueError:
+            return web.json_response({"error": "body must be a JSON array of events"}, status=400)
+        if not isinstance(events, (list, dict)):
+            return web.json_response({"error": "body must be a JSON array of events"}, status=400)
+        if isinstance(events, list) and len(events) > self.max_batch:
+            return web.json_response({"error": f"at most {self.max_batch} events per batch"}, status=413)
+        accepted, rejected = self.ingest(events)
+        return web.json_response({"accepted": accepted, "rejected": rejected}, status=202)
+
+    async def events_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """One JSON array of events per message, acknowledged with the counts"""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            try:
+                events = json.loads(message.data)
+            except ValueError:
+                await ws.send_json({"error": "message must be a JSON array of events"})
+                continue
+            if isinstance(events, list) and len(events) > self.max_batch:
+                await ws.send_json({"error": f"at most {self.max_batch} events per message"})
+                continue
+            accepted, rejected = self.ingest(events if isinstance(events, (list, dict)) else [])
+            await ws.send_json({"accepted": accepted, "rejected": rejected})
+        return ws
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def run(self):
+        """Serve until the pipeline stops (called by Pathway on its own thread)"""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/events", self.post_events)
+        app.router.add_get("/ws/events", self.events_websocket)
+        app.router.add_get("/stats", self.get_stats)
+
+        async def serve():
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, self.host, self.port).start()
+            logger.info(f"📥 Event ingestion on http://{self.host}:{self.port}/events")
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(serve())
+
+
+def read_http_events(
+    schema: Type[pw.Schema],
+    host: str,
+    port: int,
+    max_batch: int = 10000,
+    autocommit_duration_ms: int = 50
+) -> Tuple[pw.Table, EventIngestSubject]:
+    """Table of events posted to the ingestion server, plus the subject for stats"""
+    subject = EventIngestSubject(host, port, max_batch)
+    events = pw.io.python.read(
+        subject,
+        schema=schema,
+        autocommit_duration_ms=autocommit_duration_ms
+    )
+    return events, subject
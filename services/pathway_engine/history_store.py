@@ -0,0 +1,241 @@
+"""
+Partitioned columnar history for long-range session analytics
+
+The pipeline appends sessions and comprehensive metric updates to Parquet
+files laid out as
+
+    {HISTORY_DIR}/{table}/date=YYYY-MM-DD/user_bucket=NN/part-*.parquet
+
+query_history() only opens the date partitions inside the requested range
+and, for a single user, only that user's hash bucket, and reads only the
+requested columns.
+
+Usage:
+    python history_store.py query sessions --user u1 --start 2025-01-01 --end 2025-01-31
+    python history_store.py compact sessions --before 2025-02-01
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "/app/history")
+HISTORY_BUCKETS = int(os.getenv("HISTORY_BUCKETS", "16"))
+
+
+def user_bucket(user_id: str, buckets: int = HISTORY_BUCKETS) -> int:
+    """Stable hash bucket for a user (independent of PYTHONHASHSEED)"""
+    return zlib.crc32(user_id.encode("utf-8")) % buckets
+
+
+def partition_path(root: str, table: str, day: str, bucket: int) -> str:
+    return os.path.join(root, table, f"date={day}", f"user_bucket={bucket:02d}")
+
+
+class HistoryWriter:
+    """
+    Buffers rows from pw.io.subscribe and writes them as Parquet partitions
+
+    Rows are flushed once flush_rows are buffered or flush_seconds have
+    passed, producing at most one file per touched partition per flush.
+    A failed write is logged and its rows dropped, history never stops the
+    pipeline. Small flushes leave many small files, compact() merges them.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        date_of: Callable[[Dict[str, Any]], str],
+        root: str = HISTORY_DIR,
+        buckets: int = HISTORY_BUCKETS,
+        flush_rows: int = 5000,
+        flush_seconds: float = 60.0
+    ):
+        self.table = table
+        self.date_of = date_of
+        self.root = root
+        self.buckets = buckets
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback, keeps additions and retractions as a diff column"""
+        record = dict(row)
+        record["diff"] = 1 if is_addition else -1
+        with self._lock:
+            self._buffer.append(record)
+
+    def on_time_end(self, time: int):
+        """pw.io.subscribe callback, flushes when a threshold is reached"""
+        with self._lock:
+            due = (
+                len(self._buffer) >= self.flush_rows
+                or (self._buffer and _elapsed(self._last_flush) >= self.flush_seconds)
+            )
+        if due:
+            self.flush()
+
+    def on_end(self):
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows:
+            return
+
+        partitions: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            part = (self.date_of(row), user_bucket(row["user_id"], self.buckets))
+            partitions.setdefault(part, []).append(row)
+
+        for (day, bucket), part_rows in partitions.items():
+            directory = partition_path(self.root, self.table, day, bucket)
+            filename = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+            try:
+                os.makedirs(directory, exist_ok=True)
+                pq.write_table(pa.Table.from_pylist(part_rows), os.path.join(directory, filename))
+            except Exception as e:
+                logger.error(f"Error writing history partition {directory}: {e}")
+
+
+def _elapsed(since: float) -> float:
+    return time.monotonic() - since
+
+
+def session_date(row: Dict[str, Any]) -> str:
+    """Partition sessions by the UTC date of their timestamp"""
+    return datetime.fromtimestamp(row["timestamp"], tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def processing_date(row: Dict[str, Any]) -> str:
+    """Partition metric updates by the UTC date they were written"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _dates(start: Optional[str], end: Optional[str], root: str, table: str) -> List[str]:
+    """Date partitions to read, pruned to [start, end]"""
+    table_dir = os.path.join(root, table)
+    if not os.path.isdir(table_dir):
+        return []
+    if start and end:
+        first = date.fromisoformat(start)
+        last = date.fromisoformat(end)
+        days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+        return [d for d in days if os.path.isdir(os.path.join(table_dir, f"date={d}"))]
+    days = sorted(
+        name[len("date="):] for name in os.listdir(table_dir) if name.startswith("date=")
+    )
+    return [d for d in days if (not start or d >= start) and (not end or d <= end)]
+
+
+def query_history(
+    table: str,
+    user_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    root: str = HISTORY_DIR,
+    buckets: int = HISTORY_BUCKETS
+) -> List[Dict[str, Any]]:
+    """
+    Read history rows with partition pruning and column projection
+    start/end are inclusive YYYY-MM-DD dates
+    """
+    read_columns = None
+    if columns:
+        read_columns = list(dict.fromkeys(list(columns) + (["user_id"] if user_id else [])))
+
+    results: List[Dict[str, Any]] = []
+    for day in _dates(start, end, root, table):
+        day_dir = os.path.join(root, table, f"date={day}")
+        if user_id is not None:
+            bucket_dirs = [partition_path(root, table, day, user_bucket(user_id, buckets))]
+        else:
+            bucket_dirs = [os.path.join(day_dir, name) for name in sorted(os.listdir(day_dir))]
+
+        for bucket_dir in bucket_dirs:
+            if not os.path.isdir(bucket_dir):
+                continue
+            for filename in sorted(os.listdir(bucket_dir)):
+                if not filename.endswith(".parquet"):
+                    continue
+                part = pq.read_table(
+                    os.path.join(bucket_dir, filename),
+                    columns=read_columns,
+                    filters=[("user_id", "=", user_id)] if user_id is not None else None
+                )
+                for row in part.to_pylist():
+                    if columns and user_id is not None and "user_id" not in columns:
+                        row.pop("user_id", None)
+                    row["date"] = day
+                    results.append(row)
+    return results
+
+
+def compact(table: str, before: str, root: str = HISTORY_DIR):
+    """Merge each partition older than `before` into a single Parquet file"""
+    for day in _dates(None, None, root, table):
+        if day >= before:
+            continue
+        day_dir = os.path.join(root, table, f"date={day}")
+        for name in os.listdir(day_dir):
+            bucket_dir = os.path.join(day_dir, name)
+            parts = sorted(f for f in os.listdir(bucket_dir) if f.endswith(".parquet"))
+            if len(parts) <= 1:
+                continue
+            merged = pa.concat_tables(
+                [pq.read_table(os.path.join(bucket_dir, f)) for f in parts]
+            )
+            target = os.path.join(bucket_dir, f"part-compacted-{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(merged, target)
+            for f in parts:
+                os.remove(os.path.join(bucket_dir, f))
+            logger.info(f"Compacted {len(parts)} files in {bucket_dir}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Query or compact the session history store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query_parser = commands.add_parser("query")
+    query_parser.add_argument("table", choices=["sessions", "comprehensive"])
+    query_parser.add_argument("--user")
+    query_parser.add_argument("--start")
+    query_parser.add_argument("--end")
+    query_parser.add_argument("--columns", help="Comma-separated columns to read")
+
+    compact_parser = commands.add_parser("compact")
+    compact_parser.add_argument("table", choices=["sessions", "comprehensive"])
+    compact_parser.add_argument("--before", default=date.today().isoformat())
+
+    args = parser.parse_args()
+    if args.command == "query":
+        rows = query_history(
+            args.table,
+            user_id=args.user,
+            start=args.start,
+            end=args.end,
+            columns=args.columns.split(",") if args.columns else None
+        )
+        for row in rows:
+            print(json.dumps(row, default=str))
+    else:
+        compact(args.table, args.before)
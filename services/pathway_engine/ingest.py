@@ -0,0 +1,264 @@
+"""
+Session ingestion for the Pathway analytics pipeline
+
+SessionIngestor owns everything that must exist exactly once per pipeline:
+session_id deduplication, admission control and the CSV files handed to
+the pipeline's input connector. It runs inside the API process in embedded
+mode, or inside pipeline_server.py when several API workers share one
+pipeline; those workers reach it through PipelineClient over a Unix socket.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from admission import AdmissionController
+from analytics_state import LatestRow
+from dedup import SessionDeduplicator
+from jsonl_follower import JsonlFollower
+from output_log import log_path
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# CONFIGURATION
+# ============================
+
+DEDUP_RECENT_SIZE = int(os.getenv("DEDUP_RECENT_SIZE", "100000"))
+DEDUP_FILTER_CAPACITY = int(os.getenv("DEDUP_FILTER_CAPACITY", "1000000"))
+DEDUP_ERROR_RATE = float(os.getenv("DEDUP_ERROR_RATE", "0.0001"))
+# At least as often as Pathway snapshots, so a crash never leaves sessions in
+# the pipeline's snapshot whose IDs were not saved
+DEDUP_SNAPSHOT_SECONDS = float(os.getenv("DEDUP_SNAPSHOT_SECONDS", str(int(os.getenv("SNAPSHOT_INTERVAL_MS", "5000")) / 1000)))
+INGEST_HIGH_WATER = int(os.getenv("INGEST_HIGH_WATER", "10000"))
+INGEST_LOW_WATER = int(os.getenv("INGEST_LOW_WATER", "5000"))
+INGEST_LAG_BUDGET_SECONDS = float(os.getenv("INGEST_LAG_BUDGET_SECONDS", "30"))
+INGEST_PENDING_TIMEOUT_SECONDS = float(os.getenv("INGEST_PENDING_TIMEOUT_SECONDS", "300"))
+USER_RATE_LIMIT = float(os.getenv("USER_RATE_LIMIT", "20"))
+USER_RATE_BURST = float(os.getenv("USER_RATE_BURST", "100"))
+PIPELINE_SOCKET = os.getenv("PIPELINE_SOCKET", "/tmp/flowstate_pipeline.sock")
+
+CSV_HEADER = "user_id,session_type,timestamp,duration,focus_score,quality_score,distractions,language,lines_of_code,creativity_score\n"
+
+# ============================
+# PYDANTIC MODELS
+# ============================
+
+class SessionEvent(BaseModel):
+    user_id: str
+    session_type: str  # 'code' or 'whiteboard'
+    timestamp: str
+    duration: int
+    focus_score: int
+    quality_score: int
+    distractions: int
+    language: Optional[str] = None
+    lines_of_code: Optional[int] = None
+    creativity_score: Optional[int] = None
+    session_id: Optional[str] = None
+
+# ============================
+# INGESTOR
+# ============================
+
+class SessionIngestor:
+    """Deduplicates, admits and writes sessions for the pipeline"""
+
+    def __init__(self, input_dir: str, dedup: SessionDeduplicator, admission: AdmissionController, dedup_state_file: Optional[str] = None):
+        self.input_dir = input_dir
+        os.makedirs(input_dir, exist_ok=True)
+        self.dedup = dedup
+        self.admission = admission
+        self.dedup_state_file = dedup_state_file
+        self.sessions_ingested = 0
+        self._lock = threading.Lock()
+
+        if dedup_state_file:
+            dedup.load(dedup_state_file)
+
+    def ingest(self, session: SessionEvent) -> Dict[str, Any]:
+        """
+        Ingest a session event for Pathway processing
+        Replays of an already ingested session_id are acknowledged but not written
+        Raises 429 with Retry-After when the pipeline is behind or the user is rate limited
+        """
+        retry_after = self.admission.check_backlog()
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Analytics pipeline is behind, retry later",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+        if session.session_id:
+            duplicate = self.dedup.check_and_add(session.session_id)
+            if duplicate:
+                return {
+                    "status": "duplicate",
+                    "session_id": session.session_id,
+                    "message": "Session already ingested",
+                    "match": duplicate,
+                    "pathway_processing": False
+                }
+
+        retry_after = self.admission.check_user(session.user_id)
+        if retry_after is not None:
+            if session.session_id:
+                self.dedup.forget(session.session_id)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many sessions for this user, retry later",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+        try:
+            csv_file = self.write_csv(session)
+        except Exception as e:
+            logger.error(f"Error ingesting session: {e}")
+            if session.session_id:
+                # Let the client retry this session
+                self.dedup.forget(session.session_id)
+            raise HTTPException(status_code=500, detail=str(e))
+
+        with self._lock:
+            self.sessions_ingested += 1
+        self.admission.on_accepted()
+        logger.info(f"✅ Session ingested: {csv_file}")
+
+        return {
+            "status": "accepted",
+            "session_id": session.session_id,
+            "message": "Session data ingested successfully",
+            "csv_file": csv_file,
+            "pathway_processing": True
+        }
+
+    def write_csv(self, session: SessionEvent) -> str:
+        """Write one session as a CSV file for the Pathway connector"""
+        # Convert timestamp to unix timestamp
+        dt = datetime.fromisoformat(session.timestamp.replace('Z', '+00:00'))
+        timestamp = int(dt.timestamp())
+
+        # Unique across processes, unlike a per-process counter
+        filename = f"session_{timestamp}_{uuid.uuid4().hex}.csv"
+        csv_file = os.path.join(self.input_dir, filename)
+        # Written under a name the connector ignores and renamed once complete,
+        # in input_dir itself so the rename never crosses a mount
+        staging_file = os.path.join(self.input_dir, f".{filename}.tmp")
+
+        with open(staging_file, 'w') as f:
+            f.write(CSV_HEADER)
+            f.write(f"{session.user_id},{session.session_type},{timestamp},{session.duration},{session.focus_score},{session.quality_score},{session.distractions},{session.language or 'unknown'},{session.lines_of_code or 0},{session.creativity_score or 0}\n")
+        os.replace(staging_file, csv_file)
+        return csv_file
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions_ingested": self.sessions_ingested,
+            "ingestion": self.admission.stats(),
+            "deduplication": self.dedup.stats()
+        }
+
+    def save_state(self):
+        if self.dedup_state_file:
+            self.dedup.save(self.dedup_state_file)
+
+    async def snapshot_state(self):
+        """Periodically save the session dedup state next to the Pathway snapshots"""
+        saved = self.sessions_ingested
+        while True:
+            await asyncio.sleep(DEDUP_SNAPSHOT_SECONDS)
+            if self.sessions_ingested == saved:
+                continue
+            saved = self.sessions_ingested
+            try:
+                await asyncio.to_thread(self.save_state)
+            except Exception as e:
+                logger.error(f"Error saving dedup state: {e}")
+
+
+def persisted_session_total(output_log_dir: str) -> int:
+    """Latest total_sessions in the global_stats output log, 0 if there is none"""
+    stats = LatestRow()
+    JsonlFollower(log_path(output_log_dir, "global_stats"), stats.on_change).poll()
+    return (stats.get() or {}).get("total_sessions", 0)
+
+
+def create_ingestor(input_dir: str, persistence_dir: Optional[str], output_log_dir: Optional[str] = None) -> SessionIngestor:
+    """
+    SessionIngestor configured from the environment
+
+    With persistence the pipeline resumes from its snapshot and its session
+    total keeps counting from there, so admission starts from the total in
+    the global_stats output log instead of 0. The sink cannot be used for
+    this, Pathway truncates it on resume.
+    """
+    ingestor = SessionIngestor(
+        input_dir,
+        SessionDeduplicator(DEDUP_RECENT_SIZE, DEDUP_FILTER_CAPACITY, DEDUP_ERROR_RATE),
+        AdmissionController(
+            high_water=INGEST_HIGH_WATER,
+            low_water=INGEST_LOW_WATER,
+            lag_budget_seconds=INGEST_LAG_BUDGET_SECONDS,
+            pending_timeout_seconds=INGEST_PENDING_TIMEOUT_SECONDS,
+            user_rate=USER_RATE_LIMIT,
+            user_burst=USER_RATE_BURST
+        ),
+        dedup_state_file=os.path.join(persistence_dir, "session_dedup.pkl") if persistence_dir else None
+    )
+    if persistence_dir and output_log_dir:
+        ingestor.admission.seed_total(persisted_session_total(output_log_dir))
+    return ingestor
+
+# ============================
+# CLIENT FOR API WORKERS
+# ============================
+
+class PipelineClient:
+    """Talks to pipeline_server.py over its Unix socket"""
+
+    def __init__(self, socket_path: str = PIPELINE_SOCKET):
+        self.socket_path = socket_path
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=self.socket_path),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._session
+
+    async def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Tuple[int, Any, Dict[str, str]]:
+        """(status, json body, headers) from the pipeline process"""
+        options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        try:
+            async with self._client().request(method, f"http://pipeline{path}", json=payload, **options) as response:
+                body = await response.json()
+                return response.status, body, dict(response.headers)
+        except aiohttp.ClientError as e:
+            logger.error(f"Pipeline process unreachable at {self.socket_path}: {e}")
+            raise HTTPException(status_code=503, detail="Analytics pipeline unavailable")
+
+    async def ingest(self, session: SessionEvent) -> Dict[str, Any]:
+        status, body, headers = await self.request("POST", "/ingest/session", session.model_dump())
+        if status != 200:
+            retry_after = headers.get("Retry-After")
+            raise HTTPException(
+                status_code=status,
+                detail=body.get("detail") if isinstance(body, dict) else body,
+                headers={"Retry-After": retry_after} if retry_after else None
+            )
+        return body
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,136 @@
+"""
+Inactivity and continuous-work detection on event time
+
+ActivityTracker follows each user's latest activity. A user is working
+continuously while the gaps between their events stay below
+`break_seconds`; once such a stretch reaches `continuous_work_seconds`, a
+continuous_work intervention fires (once per stretch). When the newest event
+time seen from any user is `inactivity_seconds` past a user's last activity,
+an inactivity intervention fires and the user is forgotten; a user who comes
+back starts a fresh stretch. Users are kept in last-activity order, so
+finding the idle ones only looks at the oldest entries and memory follows
+the users active within the inactivity threshold.
+
+Time only advances with events, so with no traffic at all nobody is
+reported idle until the next event arrives.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from intervention_gate import event_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class _UserActivity:
+    __slots__ = ("started", "last_active", "work_fired")
+
+    def __init__(self, at: float):
+        self.started = at  # start of the current continuous stretch
+        self.last_active = at
+        self.work_fired = False
+
+
+class ActivityTracker:
+    """Per-user activity stretches and idle detection, bounded to active users"""
+
+    def __init__(
+        self,
+        inactivity_seconds: float = 1800.0,
+        break_seconds: float = 300.0,
+        continuous_work_seconds: float = 5400.0,
+        on_fire: Optional[List[Callable[[Dict[str, Any]], None]]] = None
+    ):
+        self.inactivity_seconds = inactivity_seconds
+        self.break_seconds = break_seconds
+        self.continuous_work_seconds = continuous_work_seconds
+        self.on_fire = on_fire or []
+
+        # user_id -> activity, least recently active first
+        self._users: "OrderedDict[str, _UserActivity]" = OrderedDict()
+        self._watermark = 0.0  # newest event time seen
+        self._lock = threading.Lock()
+
+        self.fired = {"inactivity": 0, "continuous_work": 0}
+
+    def on_bucket_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the event count buckets"""
+        if is_addition:
+            for candidate in self.observe(row["user_id"], row["last_event"]):
+                for fire in self.on_fire:
+                    fire(candidate)
+
+    def observe(self, user_id: str, last_event: Any) -> List[Dict[str, Any]]:
+        """Record activity at last_event and return the interventions it fires"""
+        at = event_seconds(last_event)
+        candidates = []
+        with self._lock:
+            if at <= self._watermark - self.inactivity_seconds:
+                # Too late to matter, the user would be idle again right away
+                return candidates
+            user = self._users.get(user_id)
+            if user is None:
+                user = self._users[user_id] = _UserActivity(at)
+            elif at > user.last_active:
+                if at - user.last_active >= self.break_seconds:
+                    user.started = at
+                    user.work_fired = False
+                user.last_active = at
+                self._users.move_to_end(user_id)
+
+            if not user.work_fired and user.last_active - user.started >= self.continuous_work_seconds:
+                user.work_fired = True
+                candidates.append(self._continuous_work(user_id, user))
+
+            if at > self._watermark:
+                self._watermark = at
+                candidates.extend(self._expire())
+        return candidates
+
+    def _expire(self) -> List[Dict[str, Any]]:
+        """Fire inactivity for, and forget, users idle past the threshold"""
+        candidates = []
+        while self._users:
+            user_id, user = next(iter(self._users.items()))
+            if self._watermark - user.last_active < self.inactivity_seconds:
+                break
+            del self._users[user_id]
+            candidates.append(self._inactivity(user_id, user))
+        return candidates
+
+    def _continuous_work(self, user_id: str, user: _UserActivity) -> Dict[str, Any]:
+        self.fired["continuous_work"] += 1
+        minutes = int((user.last_active - user.started) // 60)
+        return {
+            "user_id": user_id,
+            "intervention_type": "continuous_work",
+            "severity": "medium",
+            "message": f"You've been working for {minutes} minutes without a break. Step away for a few minutes.",
+            "data": {"work_minutes": minutes, "started": _utc(user.started)},
+            "timestamp": _utc(user.last_active)
+        }
+
+    def _inactivity(self, user_id: str, user: _UserActivity) -> Dict[str, Any]:
+        self.fired["inactivity"] += 1
+        minutes = int(self.inactivity_seconds // 60)
+        return {
+            "user_id": user_id,
+            "intervention_type": "inactivity",
+            "severity": "low",
+            "message": f"No activity for {minutes} minutes.",
+            "data": {"last_activity": _utc(user.last_active), "inactive_minutes": minutes},
+            # Event time at which the gap crossed the threshold
+            "timestamp": _utc(user.last_active + self.inactivity_seconds)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tracked_users": len(self._users), "fired": dict(self.fired)}
+
+
+def _utc(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
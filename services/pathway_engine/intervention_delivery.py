@@ -0,0 +1,383 @@
+"""
+Batched push delivery of interventions to webhook and WebSocket subscribers
+
+DeliveryHub runs on its own thread with an aiohttp server. Subscribers
+either register a webhook (POST /subscriptions) or hold a WebSocket open on
+/ws/interventions, optionally filtered by intervention type, user and
+minimum severity, so consumers receive only what they asked for instead of
+tailing files. Each delivered intervention is serialized once and queued
+for every matching subscriber. Each subscriber has its own bounded queue,
+sent in order as JSON arrays of up to `batch_size` interventions, waiting
+`linger_ms` for a batch to fill.
+
+Failed webhook batches are retried with exponential backoff and jitter,
+honouring Retry-After, up to `max_attempts`; other subscribers are not
+held up. A subscriber that falls further behind than `queue_size` loses its
+oldest interventions. WebSocket subscribers are not retried, they
+reconnect. Subscriptions registered over HTTP live in memory, webhooks
+that must survive a restart go in INTERVENTION_WEBHOOKS.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from intervention_gate import SEVERITIES, json_default
+
+logger = logging.getLogger(__name__)
+
+
+def _as_set(value: Any) -> Optional[set]:
+    """List or comma-separated string into a set, None means no filter"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    return {str(item).strip() for item in value if str(item).strip()}
+
+
+class Subscriber:
+    """One webhook or WebSocket destination with its own filter and batch queue"""
+
+    def __init__(
+        self,
+        kind: str,
+        url: Optional[str] = None,
+        intervention_types: Any = None,
+        user_ids: Any = None,
+        min_severity: Optional[str] = None,
+        queue_size: int = 10000
+    ):
+        if min_severity is not None and min_severity not in SEVERITIES:
+            raise ValueError(f"unknown severity {min_severity}")
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.url = url
+        self.intervention_types = _as_set(intervention_types)
+        self.user_ids = _as_set(user_ids)
+        self.min_severity = SEVERITIES.index(min_severity) if min_severity else 0
+        self.queue: deque = deque()
+        self.queue_size = queue_size
+        self.wakeup = asyncio.Event()
+        self.in_flight = 0
+
+        self.delivered = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def matches(self, intervention: Dict[str, Any]) -> bool:
+        if self.intervention_types is not None and intervention["intervention_type"] not in self.intervention_types:
+            return False
+        if self.user_ids is not None and intervention["user_id"] not in self.user_ids:
+            return False
+        severity = intervention.get("severity")
+        return self.min_severity == 0 or (severity in SEVERITIES and SEVERITIES.index(severity) >= self.min_severity)
+
+    def put(self, payload: str):
+        if len(self.queue) >= self.queue_size:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(payload)
+        self.wakeup.set()
+
+    def take(self, batch_size: int) -> List[str]:
+        batch = [self.queue.popleft() for _ in range(min(batch_size, len(self.queue)))]
+        if not self.queue:
+            self.wakeup.clear()
+        self.in_flight = len(batch)
+        return batch
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "url": self.url,
+            "intervention_types": sorted(self.intervention_types) if self.intervention_types else None,
+            "user_ids": sorted(self.user_ids) if self.user_ids else None,
+            "min_severity": SEVERITIES[self.min_severity] if self.min_severity else None,
+            "queued": len(self.queue),
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+
+class DeliveryHub:
+    """Fans delivered interventions out to subscribers in per-destination batches"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        batch_size: int = 100,
+        linger_ms: int = 200,
+        max_attempts: int = 6,
+        backoff_ms: int = 500,
+        max_backoff_ms: int = 30000,
+        queue_size: int = 10000,
+        timeout_seconds: float = 10.0,
+        start_timeout_seconds: float = 10.0
+    ):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.max_attempts = max_attempts
+        self.backoff = backoff_ms / 1000
+        self.max_backoff = max_backoff_ms / 1000
+        self.queue_size = queue_size
+        self.timeout_seconds = timeout_seconds
+        self.start_timeout_seconds = start_timeout_seconds
+
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+
+        self.published = 0
+        self.unmatched = 0
+
+    # ============================
+    # PIPELINE SIDE
+    # ============================
+
+    def start(self, webhooks: Optional[List[str]] = None):
+        """
+        Start serving on a daemon thread, with webhooks that receive everything
+
+        Raises the server's error (e.g. the port is taken) instead of
+        waiting forever, or RuntimeError if it is not up within
+        start_timeout_seconds.
+        """
+        threading.Thread(target=self._run, name="intervention-delivery", daemon=True).start()
+        if not self._ready.wait(self.start_timeout_seconds):
+            raise RuntimeError(f"intervention delivery did not start on {self.host}:{self.port} within {self.start_timeout_seconds}s")
+        if self._error is not None:
+            raise self._error
+        for url in webhooks or []:
+            asyncio.run_coroutine_threadsafe(self._add_webhook(url), self._loop).result()
+
+    def publish(self, intervention: Dict[str, Any]):
+        """on_emit callback: queue an intervention for every matching subscriber"""
+        with self._lock:
+            self.published += 1
+            targets = [s for s in self._subscribers.values() if s.matches(intervention)]
+            if not targets:
+                self.unmatched += 1
+                return
+        payload = json.dumps(intervention, default=json_default)
+        for subscriber in targets:
+            self._loop.call_soon_threadsafe(subscriber.put, payload)
+
+    def drain(self, timeout: float = 10.0):
+        """Wait for queued interventions to be sent, e.g. before a static run exits"""
+        if self._loop is None:
+            return
+
+        async def wait_empty():
+            while any(s.queue or s.in_flight for s in list(self._subscribers.values())):
+                await asyncio.sleep(0.05)
+
+        try:
+            asyncio.run_coroutine_threadsafe(asyncio.wait_for(wait_empty(), timeout), self._loop).result()
+        except Exception:
+            logger.warning(f"⚠️ Intervention delivery not drained within {timeout}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "published": self.published,
+                "unmatched": self.unmatched,
+                "subscribers": [s.describe() for s in self._subscribers.values()]
+            }
+
+    # ============================
+    # SUBSCRIBERS
+    # ============================
+
+    def _register(self, subscriber: Subscriber) -> Subscriber:
+        with self._lock:
+            self._subscribers[subscriber.id] = subscriber
+        logger.info(f"📡 {subscriber.kind} subscriber {subscriber.id} registered ({subscriber.url or 'ws'})")
+        return subscriber
+
+    def _unregister(self, subscriber_id: str) -> bool:
+        with self._lock:
+            subscriber = self._subscribers.pop(subscriber_id, None)
+        task = self._tasks.pop(subscriber_id, None)
+        if task is not None:
+            task.cancel()
+        return subscriber is not None
+
+    async def _add_webhook(self, url: str, **filters) -> Subscriber:
+        subscriber = self._register(Subscriber("webhook", url=url, queue_size=self.queue_size, **filters))
+        self._tasks[subscriber.id] = asyncio.create_task(self._deliver_webhook(subscriber))
+        return subscriber
+
+    async def _next_batch(self, subscriber: Subscriber) -> List[str]:
+        await subscriber.wakeup.wait()
+        if len(subscriber.queue) < self.batch_size and self.linger:
+            await asyncio.sleep(self.linger)
+        return subscriber.take(self.batch_size)
+
+    async def _deliver_webhook(self, subscriber: Subscriber):
+        while True:
+            batch = await self._next_batch(subscriber)
+            body = "[" + ",".join(batch) + "]"
+            for attempt in range(1, self.max_attempts + 1):
+                retry_after = None
+                try:
+                    async with self._session.post(
+                        subscriber.url,
+                        data=body,
+                        headers={"Content-Type": "application/json"}
+                    ) as response:
+                        if response.status < 300:
+                            subscriber.delivered += len(batch)
+                            subscriber.batches += 1
+                            break
+                        error = f"HTTP {response.status}"
+                        if 400 <= response.status < 500 and response.status not in (408, 429):
+                            # The receiver rejected the batch, retrying will not help
+                            attempt = self.max_attempts
+                        retry_after = _retry_after(response.headers.get("Retry-After"))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = str(e) or type(e).__name__
+                if attempt == self.max_attempts:
+                    subscriber.failed += len(batch)
+                    logger.error(f"❌ Dropped {len(batch)} interventions for {subscriber.url} after {attempt} attempts: {error}")
+                    break
+                subscriber.retries += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                await asyncio.sleep(max(delay, retry_after or 0.0))
+            subscriber.in_flight = 0
+
+    async def _deliver_websocket(self, subscriber: Subscriber, ws: web.WebSocketResponse):
+        while not ws.closed:
+            batch = await self._next_batch(subscriber)
+            try:
+                await ws.send_str("[" + ",".join(batch) + "]")
+            except ConnectionError:
+                subscriber.failed += len(batch)
+                return
+            finally:
+                subscriber.in_flight = 0
+            subscriber.delivered += len(batch)
+            subscriber.batches += 1
+
+    # ============================
+    # HTTP API
+    # ============================
+
+    async def create_subscription(self, request: web.Request) -> web.Response:
+        try:
+            spec = await request.json()
+        except ValueError:
+            return web.json_response({"error": "body must be a JSON object"}, status=400)
+        if not isinstance(spec, dict) or not isinstance(spec.get("url"), str):
+            return web.json_response({"error": "url is required"}, status=400)
+        try:
+            subscriber = await self._add_webhook(
+                spec["url"],
+                intervention_types=spec.get("intervention_types"),
+                user_ids=spec.get("user_ids"),
+                min_severity=spec.get("min_severity")
+            )
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response(subscriber.describe(), status=201)
+
+    async def list_subscriptions(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def delete_subscription(self, request: web.Request) -> web.Response:
+        if not self._unregister(request.match_info["subscription_id"]):
+            return web.json_response({"error": "unknown subscription"}, status=404)
+        return web.json_response({"deleted": request.match_info["subscription_id"]})
+
+    async def interventions_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """Filters come from the query: ?types=a,b&user_ids=u1&min_severity=medium"""
+        try:
+            subscriber = Subscriber(
+                "websocket",
+                intervention_types=request.query.get("types"),
+                user_ids=request.query.get("user_ids"),
+                min_severity=request.query.get("min_severity"),
+                queue_size=self.queue_size
+            )
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._register(subscriber)
+        self._tasks[subscriber.id] = asyncio.create_task(self._deliver_websocket(subscriber, ws))
+        try:
+            async for _ in ws:
+                pass  # Nothing is expected from the client
+        finally:
+            self._unregister(subscriber.id)
+        return ws
+
+    def _run(self):
+        app = web.Application()
+        app.router.add_post("/subscriptions", self.create_subscription)
+        app.router.add_get("/subscriptions", self.list_subscriptions)
+        app.router.add_delete("/subscriptions/{subscription_id}", self.delete_subscription)
+        app.router.add_get("/ws/interventions", self.interventions_websocket)
+
+        async def serve():
+            self._loop = asyncio.get_running_loop()
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout_seconds))
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            try:
+                await web.TCPSite(runner, self.host, self.port).start()
+                logger.info(f"📡 Intervention delivery on http://{self.host}:{self.port}")
+                self._ready.set()
+                await asyncio.Event().wait()
+            finally:
+                await self._session.close()
+                await runner.cleanup()
+
+        try:
+            asyncio.run(serve())
+        except Exception as e:
+            logger.error(f"❌ Intervention delivery stopped: {e}")
+            self._error = e
+            self._ready.set()
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def create_delivery_hub(host: str) -> DeliveryHub:
+    """DeliveryHub configured from the environment"""
+    return DeliveryHub(
+        host=host,
+        port=int(os.getenv("INTERVENTION_DELIVERY_PORT", "8003")),
+        batch_size=int(os.getenv("INTERVENTION_DELIVERY_BATCH", "100")),
+        linger_ms=int(os.getenv("INTERVENTION_DELIVERY_LINGER_MS", "200")),
+        max_attempts=int(os.getenv("INTERVENTION_DELIVERY_MAX_ATTEMPTS", "6")),
+        backoff_ms=int(os.getenv("INTERVENTION_DELIVERY_BACKOFF_MS", "500")),
+        queue_size=int(os.getenv("INTERVENTION_DELIVERY_QUEUE", "10000"))
+    )
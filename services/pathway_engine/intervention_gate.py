@@ -0,0 +1,228 @@
+"""
+Cooldown, deduplication and escalation for emitted interventions
+
+The intervention pipeline produces candidate interventions; InterventionGate
+decides which of them are delivered. State is kept per (user_id,
+intervention_type) and is O(1) per key: after a delivery, candidates of the
+same type are suppressed for the type's cooldown. A user who keeps
+triggering the same intervention right after each cooldown is escalated:
+each level raises the severity and doubles the cooldown. Keys idle for
+longer than the cooldown and escalation window are evicted, so memory
+follows active users. All times are event times, so a replay makes the
+same decisions as the live run.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ["low", "medium", "high"]
+MAX_ESCALATION_LEVEL = 3
+
+
+def parse_cooldowns(spec: str) -> Dict[str, float]:
+    """'type=seconds,type=seconds' into a per-type cooldown map"""
+    cooldowns = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            cooldowns[name.strip()] = float(seconds)
+    return cooldowns
+
+
+def event_seconds(timestamp: Any) -> float:
+    """Unix seconds from a datetime, pandas Timestamp or ISO string"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    return timestamp.timestamp()
+
+
+def parse_event_time(timestamp: Any) -> Optional[datetime]:
+    """
+    Aware UTC datetime from an ISO 8601 string (naive means UTC) or unix
+    seconds, None if the value is not a usable timestamp
+    """
+    try:
+        if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+            if not math.isfinite(timestamp):
+                return None
+            return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        if isinstance(timestamp, str):
+            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            if dt.tzinfo is None:
+                return dt.replace(tzinfo=timezone.utc)
+            return dt.astimezone(timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+    return None
+
+
+class _KeyState:
+    __slots__ = ("last_delivered", "last_seen", "streak", "level", "suppressed")
+
+    def __init__(self):
+        self.last_delivered: Optional[float] = None
+        self.last_seen = 0.0
+        self.streak = 0  # consecutive deliveries, each within the escalation window of the last
+        self.level = 0
+        self.suppressed = 0  # candidates dropped since the last delivery
+
+
+class InterventionGate:
+    """Per-user, per-type cooldown and escalation in front of delivery"""
+
+    def __init__(
+        self,
+        cooldown_seconds: float = 600.0,
+        cooldowns: Optional[Dict[str, float]] = None,
+        escalation_window_seconds: float = 3600.0,
+        escalate_after: int = 3,
+        on_emit: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+        prune_every: int = 10000
+    ):
+        self.cooldown_seconds = cooldown_seconds
+        self.cooldowns = cooldowns or {}
+        self.escalation_window_seconds = escalation_window_seconds
+        self.escalate_after = escalate_after
+        self.on_emit = on_emit or []
+        self.prune_every = prune_every
+
+        self._state: Dict[Tuple[str, str], _KeyState] = {}
+        self._watermark = 0.0  # newest event time seen
+        self._lock = threading.Lock()
+
+        self.offered = 0
+        self.delivered = 0
+        self.suppressed = 0
+        self.escalated = 0
+        self.evicted = 0
+
+    def cooldown(self, intervention_type: str) -> float:
+        return self.cooldowns.get(intervention_type, self.cooldown_seconds)
+
+    def offer(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The intervention to deliver for a candidate row, or None if suppressed"""
+        intervention_type = row["intervention_type"]
+        at = event_seconds(row["timestamp"])
+        cooldown = self.cooldown(intervention_type)
+
+        with self._lock:
+            self.offered += 1
+            self._watermark = max(self._watermark, at)
+            key = (row["user_id"], intervention_type)
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = _KeyState()
+            state.last_seen = max(state.last_seen, at)
+
+            if state.last_delivered is not None and at < state.last_delivered + cooldown * 2 ** state.level:
+                # Includes replays of an already delivered candidate
+                state.suppressed += 1
+                self.suppressed += 1
+                return None
+
+            if state.last_delivered is not None and at - state.last_delivered <= cooldown * 2 ** state.level + self.escalation_window_seconds:
+                state.streak += 1
+            else:
+                state.streak = 0
+            state.last_delivered = at
+            suppressed, state.suppressed = state.suppressed, 0
+            level = state.level = min(state.streak // self.escalate_after, MAX_ESCALATION_LEVEL) if self.escalate_after > 0 else 0
+
+            self.delivered += 1
+            if level:
+                self.escalated += 1
+            if self.offered % self.prune_every == 0:
+                self._prune()
+
+        intervention = dict(row)
+        intervention["data"] = {**_as_dict(row.get("data")), "suppressed": suppressed, "escalation_level": level}
+        if level:
+            base = SEVERITIES.index(row["severity"]) if row["severity"] in SEVERITIES else 0
+            intervention["severity"] = SEVERITIES[min(base + level, len(SEVERITIES) - 1)]
+            intervention["message"] = f"{row['message']} (repeated {state.streak + 1} times recently)"
+        return intervention
+
+    def submit(self, candidate: Dict[str, Any]):
+        """Offer a candidate and pass it on to on_emit if delivered"""
+        intervention = self.offer(candidate)
+        if intervention is None:
+            return
+        for emit in self.on_emit:
+            emit(intervention)
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for candidate interventions"""
+        if is_addition:
+            self.submit(row)
+
+    def _prune(self):
+        # Beyond both horizons a key behaves exactly like a fresh one
+        horizon = self.escalation_window_seconds + max([self.cooldown_seconds, *self.cooldowns.values()]) * 2 ** MAX_ESCALATION_LEVEL
+        stale = [k for k, s in self._state.items() if self._watermark - s.last_seen > horizon]
+        for k in stale:
+            del self._state[k]
+        self.evicted += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "offered": self.offered,
+                "delivered": self.delivered,
+                "suppressed": self.suppressed,
+                "escalated": self.escalated,
+                "tracked_keys": len(self._state),
+                "evicted": self.evicted
+            }
+
+
+class InterventionWriter:
+    """Appends delivered interventions to a JSON Lines file, flushed per timestamp"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._file = open(filepath, "a")
+        self._lock = threading.Lock()
+
+    def write(self, intervention: Dict[str, Any]):
+        with self._lock:
+            self._file.write(json.dumps(intervention, default=json_default) + "\n")
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _as_dict(data: Any) -> Dict[str, Any]:
+    # pw.Json values wrap the parsed object in .value
+    data = getattr(data, "value", data)
+    return dict(data) if isinstance(data, dict) else {}
+
+
+def json_default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def create_gate(on_emit: List[Callable[[Dict[str, Any]], None]]) -> InterventionGate:
+    """InterventionGate configured from the environment"""
+    return InterventionGate(
+        cooldown_seconds=float(os.getenv("INTERVENTION_COOLDOWN_SECONDS", "600")),
+        cooldowns=parse_cooldowns(os.getenv("INTERVENTION_COOLDOWNS", "return_from_break=1800")),
+        escalation_window_seconds=float(os.getenv("INTERVENTION_ESCALATION_WINDOW_SECONDS", "3600")),
+        escalate_after=int(os.getenv("INTERVENTION_ESCALATE_AFTER", "3")),
+        on_emit=on_emit
+    )
@@ -0,0 +1,380 @@
+"""
+Declarative intervention rules evaluated over shared event-count buckets
+
+The pipeline counts every event once, into per-(user, event_type) buckets
+of WINDOW_HOP_SECONDS. RuleEngine keeps the most recent buckets per key and,
+whenever a bucket changes, evaluates every rule for that event type against
+the same counts: a rule fires when more than `threshold` events fell into
+its last `window_seconds`, and then stays quiet for that user until the
+window has passed. A bucket that arrives late is checked in every window
+that contains it, up to the newest one. Rules are read from a JSON file,
+for example
+
+    {"name": "slow_down", "event_type": "keystroke", "window_seconds": 60,
+     "threshold": 200, "severity": "high", "message": "Typing {count}/min"}
+
+and are reloaded when the file changes, without restarting the pipeline.
+State of users whose buckets have all left every rule window is dropped.
+
+Rules with "kind": "zscore" adapt to each user instead of using a fixed
+threshold. Every closed bucket feeds the user's window count into an
+exponentially weighted mean and variance (half-life `half_life_seconds`),
+and the rule fires when the current window is `z_threshold` standard
+deviations above that baseline and has at least `min_count` events. Until
+`warmup` samples have been seen, `threshold` (if given) is used instead.
+Idle stretches are folded in as zero samples in closed form, so a baseline
+is three numbers per user and rule regardless of history.
+
+`message` may use {count}, {threshold}, {window_seconds}, {window_minutes},
+and for zscore rules {z} and {baseline}.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from intervention_gate import SEVERITIES, event_seconds
+
+logger = logging.getLogger(__name__)
+
+RULE_FIELDS = ("name", "event_type", "window_seconds", "severity", "message")
+RULE_KINDS = {"threshold": ("threshold",), "zscore": ("z_threshold",)}
+# Floor for the baseline standard deviation, in events, so a perfectly
+# regular user does not fire on a single extra event
+MIN_STD = 1.0
+
+
+class Rule:
+    """One threshold or z-score rule over a sliding event-time window"""
+
+    __slots__ = (
+        "name", "kind", "event_type", "window_seconds", "threshold", "severity", "message", "buckets",
+        "z_threshold", "min_count", "warmup", "alpha"
+    )
+
+    def __init__(self, spec: Dict[str, Any], hop_seconds: int):
+        kind = spec.get("kind", "threshold")
+        if kind not in RULE_KINDS:
+            raise ValueError(f"rule {spec.get('name', '?')} has unknown kind {kind}")
+        missing = [field for field in RULE_FIELDS + RULE_KINDS[kind] if field not in spec]
+        if missing:
+            raise ValueError(f"rule {spec.get('name', '?')} is missing {', '.join(missing)}")
+        if spec["severity"] not in SEVERITIES:
+            raise ValueError(f"rule {spec['name']} has unknown severity {spec['severity']}")
+        self.name = spec["name"]
+        self.kind = kind
+        self.event_type = spec["event_type"]
+        self.window_seconds = float(spec["window_seconds"])
+        self.threshold = int(spec["threshold"]) if "threshold" in spec else None
+        self.severity = spec["severity"]
+        self.message = spec["message"]
+        # Windows are made of whole buckets
+        self.buckets = max(1, math.ceil(self.window_seconds / hop_seconds))
+
+        self.z_threshold = float(spec.get("z_threshold", 0.0))
+        self.min_count = int(spec.get("min_count", 0))
+        self.warmup = int(spec.get("warmup", 60))
+        # One baseline sample per bucket
+        half_life = float(spec.get("half_life_seconds", 3600))
+        self.alpha = 1 - 0.5 ** (hop_seconds / half_life)
+
+    def render(self, count: int, z: Optional[float] = None, baseline: Optional[float] = None) -> str:
+        return self.message.format(
+            count=count,
+            threshold=self.threshold,
+            window_seconds=int(self.window_seconds),
+            window_minutes=round(self.window_seconds / 60, 1),
+            z=round(z, 1) if z is not None else "",
+            baseline=round(baseline, 1) if baseline is not None else ""
+        )
+
+
+class Baseline:
+    """Exponentially weighted mean and variance of a user's window counts"""
+
+    __slots__ = ("mean", "var", "samples", "updated")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+        self.updated = 0.0  # event time of the last sample
+
+    def observe(self, x: float, alpha: float):
+        if self.samples == 0:
+            self.mean = x
+        else:
+            diff = x - self.mean
+            incr = alpha * diff
+            self.mean += incr
+            self.var = (1 - alpha) * (self.var + diff * incr)
+        self.samples += 1
+
+    def observe_zeros(self, k: int, alpha: float):
+        """k zero samples at once: mean' = r^k m, var' = r^k (v + m^2 (1 - r^k))"""
+        if k <= 0:
+            return
+        if self.samples == 0:
+            self.observe(0.0, alpha)
+            k -= 1
+        decay = (1 - alpha) ** k
+        self.var = decay * (self.var + self.mean ** 2 * (1 - decay))
+        self.mean *= decay
+        self.samples += k
+
+    def z(self, x: float) -> float:
+        return (x - self.mean) / max(math.sqrt(self.var), MIN_STD)
+
+
+def load_rules(path: str, hop_seconds: int) -> List[Rule]:
+    with open(path) as f:
+        specs = json.load(f)
+    rules = [Rule(spec, hop_seconds) for spec in specs]
+    names = [rule.name for rule in rules]
+    if len(set(names)) != len(names):
+        raise ValueError("rule names must be unique")
+    return rules
+
+
+class RuleEngine:
+    """Evaluates all rules against shared per-user bucket counts"""
+
+    def __init__(
+        self,
+        rules_file: str,
+        hop_seconds: int,
+        on_fire: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+        reload_seconds: float = 5.0,
+        prune_every: int = 10000
+    ):
+        self.rules_file = rules_file
+        self.hop_seconds = hop_seconds
+        self.on_fire = on_fire or []
+        self.reload_seconds = reload_seconds
+        self.prune_every = prune_every
+
+        self._rules_by_type: Dict[str, List[Rule]] = {}
+        self._max_buckets = 1
+        self._max_window = 0.0
+        self._max_half_life = 0.0
+        self._mtime: Optional[float] = None
+        self._last_reload_check = 0.0
+
+        # (user_id, event_type) -> deque of [bucket_start, count], oldest first
+        self._buckets: Dict[Tuple[str, str], deque] = {}
+        # (user_id, rule name) -> baseline of zscore rules
+        self._baselines: Dict[Tuple[str, str], Baseline] = {}
+        # (user_id, rule name) -> event time until which the rule stays quiet
+        self._quiet_until: Dict[Tuple[str, str], float] = {}
+        self._watermark = 0.0  # newest bucket start seen
+        self._updates = 0
+        self._lock = threading.Lock()
+
+        self.fired: Dict[str, int] = {}
+        self.reloads = 0
+        self.evicted = 0
+        self.reload()
+
+    # ============================
+    # RULES
+    # ============================
+
+    def reload(self):
+        """(Re)load the rules file; a broken file keeps the current rules"""
+        try:
+            mtime = os.path.getmtime(self.rules_file)
+            rules = load_rules(self.rules_file, self.hop_seconds)
+        except Exception as e:
+            logger.error(f"❌ Could not load intervention rules from {self.rules_file}: {e}")
+            return
+        by_type: Dict[str, List[Rule]] = {}
+        for rule in rules:
+            by_type.setdefault(rule.event_type, []).append(rule)
+        with self._lock:
+            self._rules_by_type = by_type
+            self._max_buckets = max([rule.buckets for rule in rules] or [1])
+            self._max_window = max([rule.buckets * self.hop_seconds for rule in rules] or [0.0])
+            self._max_half_life = max([math.log(0.5) / math.log(1 - rule.alpha) * self.hop_seconds for rule in rules] or [0.0])
+            self._mtime = mtime
+            for rule in rules:
+                self.fired.setdefault(rule.name, 0)
+        self.reloads += 1
+        logger.info(f"📜 Loaded {len(rules)} intervention rules from {self.rules_file}")
+
+    def maybe_reload(self):
+        """Reload if the rules file changed, checked at most every reload_seconds"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_seconds:
+            return
+        self._last_reload_check = now
+        try:
+            mtime = os.path.getmtime(self.rules_file)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def rules(self) -> List[Rule]:
+        with self._lock:
+            return [rule for rules in self._rules_by_type.values() for rule in rules]
+
+    # ============================
+    # EVALUATION
+    # ============================
+
+    def on_bucket_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the event count buckets"""
+        if not is_addition:
+            return
+        for candidate in self.update(
+            row["user_id"],
+            row["event_type"],
+            event_seconds(row["bucket_start"]),
+            row["event_count"],
+            row["last_event"]
+        ):
+            for fire in self.on_fire:
+                fire(candidate)
+
+    def update(self, user_id: str, event_type: str, bucket_start: float, count: int, last_event: Any) -> List[Dict[str, Any]]:
+        """Record a bucket's count and return the candidates it fires"""
+        with self._lock:
+            rules = self._rules_by_type.get(event_type)
+            if not rules:
+                return []
+            self._watermark = max(self._watermark, bucket_start)
+            self._updates += 1
+            if self._updates % self.prune_every == 0:
+                self._prune()
+            key = (user_id, event_type)
+            buckets = self._buckets.get(key)
+            if buckets is None:
+                buckets = self._buckets[key] = deque()
+            elif bucket_start > buckets[-1][0]:
+                # A new bucket opened, so the ones before it are closed
+                self._sample_closed(user_id, rules, buckets, bucket_start)
+            _set_bucket(buckets, bucket_start, count)
+            while len(buckets) > self._max_buckets:
+                buckets.popleft()
+
+            at = event_seconds(last_event)
+            newest = buckets[-1][0]
+            candidates = []
+            for rule in rules:
+                # A late bucket also changes the newer windows that contain it
+                last_end = min(newest, bucket_start + (rule.buckets - 1) * self.hop_seconds)
+                for step in range(int(round((last_end - bucket_start) / self.hop_seconds)) + 1):
+                    total = self._window_total(buckets, bucket_start + step * self.hop_seconds, rule)
+                    scored = self._exceeds(user_id, rule, total)
+                    if scored is not None:
+                        break
+                else:
+                    continue
+                z, baseline = scored
+                quiet_key = (user_id, rule.name)
+                if at < self._quiet_until.get(quiet_key, float("-inf")):
+                    continue
+                # One firing per window span, later buckets of the same burst are ignored
+                self._quiet_until[quiet_key] = at + rule.window_seconds
+                self.fired[rule.name] = self.fired.get(rule.name, 0) + 1
+                data = {
+                    "rule": rule.name,
+                    "event_type": event_type,
+                    "count": total,
+                    "threshold": rule.threshold,
+                    "window_seconds": rule.window_seconds
+                }
+                if z is not None:
+                    data.update(z=round(z, 2), baseline=round(baseline, 2))
+                candidates.append({
+                    "user_id": user_id,
+                    "intervention_type": rule.name,
+                    "severity": rule.severity,
+                    "message": rule.render(total, z, baseline),
+                    "data": data,
+                    "timestamp": last_event
+                })
+            return candidates
+
+    def _exceeds(self, user_id: str, rule: Rule, total: int) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        """(z, baseline) when a window total breaks the rule, both None for fixed thresholds"""
+        if rule.kind == "zscore":
+            state = self._baselines.get((user_id, rule.name))
+            if state is not None and state.samples >= rule.warmup:
+                z = state.z(total)
+                if z < rule.z_threshold or total < rule.min_count:
+                    return None
+                return z, state.mean
+            if rule.threshold is None or total <= rule.threshold:
+                return None
+        elif total <= rule.threshold:
+            return None
+        return None, None
+
+    def _window_total(self, buckets: deque, end: float, rule: Rule) -> int:
+        """Events in the rule window made of the buckets up to and including end"""
+        since = end - (rule.buckets - 1) * self.hop_seconds
+        return sum(c for start, c in buckets if since <= start <= end)
+
+    def _sample_closed(self, user_id: str, rules: List[Rule], buckets: deque, bucket_start: float):
+        """Feed the window counts at each bucket closed before bucket_start into the baselines"""
+        newest = buckets[-1][0]
+        closed = int(round((bucket_start - newest) / self.hop_seconds))
+        for rule in rules:
+            if rule.kind != "zscore":
+                continue
+            state = self._baselines.get((user_id, rule.name))
+            if state is None:
+                state = self._baselines[(user_id, rule.name)] = Baseline()
+            # Windows ending at the newest bucket and the empty ones after it;
+            # once the window has slid past the newest bucket every sample is zero
+            counted = min(closed, rule.buckets)
+            for step in range(counted):
+                state.observe(self._window_total(buckets, newest + step * self.hop_seconds, rule), rule.alpha)
+            state.observe_zeros(closed - counted, rule.alpha)
+            state.updated = bucket_start
+
+    def _prune(self):
+        # Buckets past every window no longer count, quiet periods are event
+        # time bounds, and after ten half-lives a baseline has decayed to zero
+        horizon = self._watermark - self._max_window
+        for key in [k for k, b in self._buckets.items() if b[-1][0] < horizon]:
+            del self._buckets[key]
+            self.evicted += 1
+        for key in [k for k, until in self._quiet_until.items() if until < horizon]:
+            del self._quiet_until[key]
+        baseline_horizon = self._watermark - 10 * self._max_half_life
+        for key in [k for k, b in self._baselines.items() if b.updated < baseline_horizon]:
+            del self._baselines[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rules": sum(len(rules) for rules in self._rules_by_type.values()),
+                "reloads": self.reloads,
+                "fired": dict(self.fired),
+                "tracked_keys": len(self._buckets),
+                "baselines": len(self._baselines),
+                "evicted": self.evicted
+            }
+
+
+def _set_bucket(buckets: deque, bucket_start: float, count: int):
+    """Insert or replace a bucket, keeping the deque ordered by start"""
+    for bucket in reversed(buckets):
+        if bucket[0] == bucket_start:
+            bucket[1] = count
+            return
+        if bucket[0] < bucket_start:
+            break
+    buckets.append([bucket_start, count])
+    if len(buckets) > 1 and buckets[-2][0] > bucket_start:
+        # Late bucket, restore order
+        ordered = sorted(buckets, key=lambda b: b[0])
+        buckets.clear()
+        buckets.extend(ordered)
@@ -0,0 +1,60 @@
+"""
+Incremental reader for Pathway JSON Lines output
+
+Lets a process that does not run the pipeline itself replay the pipeline's
+update stream (rows with time/diff columns) into the same on_change
+callbacks used with pw.io.subscribe, reading only bytes appended since the
+last poll.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlFollower:
+    """Tail a jsonlines sink and forward each update to on_change"""
+
+    def __init__(self, filepath: str, on_change: Callable[..., Any]):
+        self.filepath = filepath
+        self.on_change = on_change
+        self._position = 0
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def poll(self) -> int:
+        """Apply updates appended since the last poll, return how many"""
+        with self._lock:
+            try:
+                stat = os.stat(self.filepath)
+            except FileNotFoundError:
+                return 0
+            if stat.st_ino != self._inode or stat.st_size < self._position:
+                # File was recreated or compacted, replay from the start
+                self._inode = stat.st_ino
+                self._position = 0
+
+            applied = 0
+            with open(self.filepath, "r") as f:
+                f.seek(self._position)
+                while True:
+                    line = f.readline()
+                    if not line.endswith("\n"):
+                        break  # Partial line, pick it up on the next poll
+                    self._position = f.tell()
+                    if line.strip():
+                        self._apply(json.loads(line))
+                        applied += 1
+            return applied
+
+    def _apply(self, data: Dict[str, Any]):
+        time = data.pop("time", 0)
+        diff = data.pop("diff", 1)
+        try:
+            self.on_change(key=None, row=data, time=time, is_addition=diff > 0)
+        except Exception as e:
+            logger.error(f"Error applying update from {self.filepath}: {e}")
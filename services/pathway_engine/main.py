@@ -12,17 +12,46 @@ Features:
 """
 
 import pathway as pw
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 import uvicorn
 import os
-from datetime import datetime, timedelta
+import asyncio
 import logging
 import json
 import threading
+import time
+import uuid
 from typing import Optional, Dict, List, Any
 from pydantic import BaseModel
-import pandas as pd
+
+from rollups import DailyRollupStore
+from analytics_push import AnalyticsBroadcaster
+from analytics_state import LatestRow, UserAnalyticsState, VersionedResponseCache
+from sketches import SketchStore, summarize
+from history_store import query_history
+from jsonl_follower import JsonlFollower
+from ingest import PipelineClient, SessionEvent, SessionIngestor, create_ingestor
+from metrics import (
+    EndpointMetrics,
+    PipelineMetrics,
+    directory_usage,
+    process_stats,
+    sample_profile,
+    sink_sizes,
+)
+from pathway_analytics import (
+    INPUT_DIR,
+    OUTPUT_DIR,
+    OUTPUT_LOG_DIR,
+    PERSISTENCE_DIR,
+    PERSISTENCE_ENABLED,
+    attach_output_log,
+    create_pathway_pipeline,
+    get_persistence_config,
+)
+from output_log import log_path
 
 # Setup logging
 logging.basicConfig(
@@ -35,295 +64,92 @@ logger = logging.getLogger(__name__)
 # CONFIGURATION
 # ============================
 
-INPUT_DIR = os.getenv("INPUT_DIR", "/app/input_stream")
-OUTPUT_DIR = os.getenv("OUTPUT_DIR", "/app/output")
-os.makedirs(INPUT_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# 'embedded' runs the dataflow on a thread inside this process,
+# 'external' expects it to run separately (see pipeline_server.py)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "embedded")
+PORT = int(os.getenv("PORT", "8001"))
+# API worker processes, only honoured in external mode since each
+# embedded worker would start its own pipeline
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+PUSH_KEEPALIVE_SECONDS = float(os.getenv("PUSH_KEEPALIVE_SECONDS", "15"))
+FOLLOWER_POLL_SECONDS = float(os.getenv("FOLLOWER_POLL_SECONDS", "0.05"))
+DEFAULT_QUANTILES = "0.5,0.75,0.9,0.99"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
 
 logger.info("🚀 Starting FlowState Pathway Analytics Engine")
 logger.info(f"📂 Input Directory: {INPUT_DIR}")
 logger.info(f"📤 Output Directory: {OUTPUT_DIR}")
 logger.info(f"🐍 Python Version: 3.11+")
 logger.info(f"⚡ Pathway Real-time Streaming: ENABLED")
+logger.info(f"🧵 Pipeline Mode: {PIPELINE_MODE}")
+logger.info(f"💾 Persistence: {PERSISTENCE_DIR if PERSISTENCE_ENABLED else 'DISABLED'}")
 
 # ============================
 # PYDANTIC MODELS
 # ============================
 
-class SessionEvent(BaseModel):
-    user_id: str
-    session_type: str  # 'code' or 'whiteboard'
-    timestamp: str
-    duration: int
-    focus_score: int
-    quality_score: int
-    distractions: int
-    language: Optional[str] = None
-    lines_of_code: Optional[int] = None
-    creativity_score: Optional[int] = None
-    session_id: Optional[str] = None
-
 class AnalyticsQuery(BaseModel):
     user_id: str
     time_range: str = "7d"  # 7d, 30d, 90d
     session_type: Optional[str] = None  # 'code', 'whiteboard', or None for all
 
 # ============================
-# PATHWAY SCHEMA DEFINITION
+# SHARED STATE
 # ============================
 
-class SessionSchema(pw.Schema):
-    user_id: str
-    session_type: str
-    timestamp: int
-    duration: int
-    focus_score: int
-    quality_score: int
-    distractions: int
-    language: str
-    lines_of_code: int
-    creativity_score: int
+# Daily buckets fed by the pipeline, used for time-range queries
+rollup_store = DailyRollupStore()
 
-# ============================
-# PATHWAY STREAMING PIPELINE
-# ============================
+# Pushes comprehensive row changes to stream/websocket subscribers
+broadcaster = AnalyticsBroadcaster()
 
-def create_pathway_pipeline():
-    """
-    Create comprehensive Pathway streaming pipeline for analytics
-    Processes session data in real-time and generates insights
-    """
-    
-    logger.info("🔧 Creating Pathway streaming pipeline...")
-    
-    # INPUT: CSV Streaming Connector
-    # Monitors input directory for new session data
-    sessions = pw.io.csv.read(
-        INPUT_DIR,
-        schema=SessionSchema,
-        mode="streaming",
-        autocommit_duration_ms=1000  # Process every second
-    )
-    
-    logger.info("✅ CSV streaming connector initialized")
-    
-    # ============================
-    # BASIC AGGREGATIONS
-    # ============================
-    
-    # Overall user statistics
-    user_stats = sessions.groupby(sessions.user_id).reduce(
-        user_id=pw.this.user_id,
-        total_sessions=pw.reducers.count(),
-        avg_focus_score=pw.reducers.avg(pw.this.focus_score),
-        avg_quality_score=pw.reducers.avg(pw.this.quality_score),
-        total_duration=pw.reducers.sum(pw.this.duration),
-        total_distractions=pw.reducers.sum(pw.this.distractions),
-        max_focus=pw.reducers.max(pw.this.focus_score),
-        min_focus=pw.reducers.min(pw.this.focus_score)
-    )
-    
-    # Session type breakdown
-    type_stats = sessions.groupby(
-        sessions.user_id, 
-        sessions.session_type
-    ).reduce(
-        user_id=pw.this.user_id,
-        session_type=pw.this.session_type,
-        count=pw.reducers.count(),
-        avg_focus=pw.reducers.avg(pw.this.focus_score),
-        avg_duration=pw.reducers.avg(pw.this.duration)
-    )
-    
-    # Language statistics (for code sessions)
-    code_sessions = sessions.filter(pw.this.session_type == "code")
-    language_stats = code_sessions.groupby(
-        code_sessions.user_id,
-        code_sessions.language
-    ).reduce(
-        user_id=pw.this.user_id,
-        language=pw.this.language,
-        sessions=pw.reducers.count(),
-        avg_focus=pw.reducers.avg(pw.this.focus_score),
-        total_lines=pw.reducers.sum(pw.this.lines_of_code)
-    )
-    
-    logger.info("✅ Basic aggregations configured")
-    
-    # ============================
-    # PRODUCTIVITY ANALYSIS
-    # ============================
-    
-    # Calculate productivity level
-    productivity = user_stats.select(
-        user_id=pw.this.user_id,
-        total_sessions=pw.this.total_sessions,
-        avg_focus_score=pw.this.avg_focus_score,
-        productivity_level=pw.apply(
-            lambda focus, dist, sessions: (
-                "excellent" if focus >= 85 and dist / sessions < 3 else
-                "good" if focus >= 70 and dist / sessions < 5 else
-                "moderate" if focus >= 55 else
-                "needs_improvement"
-            ),
-            pw.this.avg_focus_score,
-            pw.this.total_distractions,
-            pw.this.total_sessions
-        ),
-        focus_consistency=pw.apply(
-            lambda max_f, min_f: "consistent" if (max_f - min_f) < 20 else "variable",
-            pw.this.max_focus,
-            pw.this.min_focus
-        )
-    )
-    
-    # ============================
-    # BURNOUT RISK DETECTION
-    # ============================
-    
-    burnout_analysis = user_stats.select(
-        user_id=pw.this.user_id,
-        burnout_risk=pw.apply(
-            lambda sessions, focus, duration: (
-                "high" if sessions > 15 and focus < 50 and duration > 36000 else
-                "medium" if sessions > 10 and focus < 60 else
-                "low"
-            ),
-            pw.this.total_sessions,
-            pw.this.avg_focus_score,
-            pw.this.total_duration
-        ),
-        avg_session_duration=pw.apply(
-            lambda total_dur, sessions: total_dur / sessions if sessions > 0 else 0,
-            pw.this.total_duration,
-            pw.this.total_sessions
-        ),
-        distraction_rate=pw.apply(
-            lambda dist, sessions: dist / sessions if sessions > 0 else 0,
-            pw.this.total_distractions,
-            pw.this.total_sessions
-        )
-    )
-    
-    # ============================
-    # PATTERN DETECTION
-    # ============================
-    
-    # Detect productivity patterns
-    patterns = productivity.select(
-        user_id=pw.this.user_id,
-        pattern_type=pw.apply(
-            lambda level, consistency: (
-                "peak_performer" if level == "excellent" and consistency == "consistent" else
-                "improving" if level in ["good", "excellent"] else
-                "struggling" if level == "needs_improvement" else
-                "inconsistent"
-            ),
-            pw.this.productivity_level,
-            pw.this.focus_consistency
-        ),
-        recommendation=pw.apply(
-            lambda level: (
-                "Keep up the great work! Consider mentoring others." if level == "excellent" else
-                "You're doing well. Try to maintain consistency." if level == "good" else
-                "Focus on reducing distractions and taking regular breaks." if level == "moderate" else
-                "Consider adjusting your work environment and schedule."
-            ),
-            pw.this.productivity_level
-        )
-    )
-    
-    logger.info("✅ Pattern detection configured")
-    
-    # ============================
-    # INSIGHTS GENERATION
-    # ============================
-    
-    # Combine all analytics
-    comprehensive_analytics = user_stats.join(
-        productivity,
-        user_stats.user_id == productivity.user_id
-    ).join(
-        burnout_analysis,
-        user_stats.user_id == burnout_analysis.user_id
-    ).join(
-        patterns,
-        user_stats.user_id == patterns.user_id
-    ).select(
-        user_id=user_stats.user_id,
-        # Basic stats
-        total_sessions=user_stats.total_sessions,
-        avg_focus_score=user_stats.avg_focus_score,
-        avg_quality_score=user_stats.avg_quality_score,
-        total_duration=user_stats.total_duration,
-        total_distractions=user_stats.total_distractions,
-        # Productivity
-        productivity_level=productivity.productivity_level,
-        focus_consistency=productivity.focus_consistency,
-        # Burnout
-        burnout_risk=burnout_analysis.burnout_risk,
-        avg_session_duration=burnout_analysis.avg_session_duration,
-        distraction_rate=burnout_analysis.distraction_rate,
-        # Patterns
-        pattern_type=patterns.pattern_type,
-        recommendation=patterns.recommendation
-    )
-    
-    logger.info("✅ Comprehensive analytics configured")
-    
-    # ============================
-    # OUTPUT CONNECTORS
-    # ============================
-    
-    # Output 1: User Statistics
-    pw.io.jsonlines.write(
-        user_stats,
-        f"{OUTPUT_DIR}/user_stats.jsonl"
-    )
-    
-    # Output 2: Session Type Breakdown
-    pw.io.jsonlines.write(
-        type_stats,
-        f"{OUTPUT_DIR}/type_stats.jsonl"
-    )
-    
-    # Output 3: Language Statistics
-    pw.io.jsonlines.write(
-        language_stats,
-        f"{OUTPUT_DIR}/language_stats.jsonl"
-    )
-    
-    # Output 4: Productivity Analysis
-    pw.io.jsonlines.write(
-        productivity,
-        f"{OUTPUT_DIR}/productivity.jsonl"
-    )
-    
-    # Output 5: Burnout Analysis
-    pw.io.jsonlines.write(
-        burnout_analysis,
-        f"{OUTPUT_DIR}/burnout.jsonl"
-    )
-    
-    # Output 6: Patterns
-    pw.io.jsonlines.write(
-        patterns,
-        f"{OUTPUT_DIR}/patterns.jsonl"
-    )
-    
-    # Output 7: Comprehensive Analytics
-    pw.io.jsonlines.write(
-        comprehensive_analytics,
-        f"{OUTPUT_DIR}/comprehensive.jsonl"
-    )
-    
-    logger.info("✅ Output connectors configured")
-    logger.info(f"📤 Writing to: {OUTPUT_DIR}")
-    logger.info("=" * 60)
-    logger.info("🎯 Pathway pipeline ready for real-time processing")
-    logger.info("=" * 60)
-    
-    return comprehensive_analytics
+# Latest per-user rows and change versions, fed by the pipeline
+analytics_state = UserAnalyticsState()
+
+# Per-user and global quantile sketches
+sketch_store = SketchStore()
+
+# Single-row global stats and leaderboards
+global_stats = LatestRow()
+
+# Dedup, backpressure and CSV writes live next to the pipeline: in this
+# process when embedded, behind pipeline_client otherwise
+ingestor: Optional[SessionIngestor] = None
+pipeline_client: Optional[PipelineClient] = None
+if PIPELINE_MODE == "embedded":
+    ingestor = create_ingestor(INPUT_DIR, PERSISTENCE_DIR if PERSISTENCE_ENABLED else None, OUTPUT_LOG_DIR)
+else:
+    pipeline_client = PipelineClient()
+
+# Row counts and commit latency of the embedded pipeline
+pipeline_metrics = PipelineMetrics()
+
+# Per-route API latency histograms
+endpoint_metrics = EndpointMetrics()
+
+# Formatted responses cached per user version
+response_cache = VersionedResponseCache(RESPONSE_CACHE_SIZE)
+
+# Distinguishes ETags issued by different process lifetimes; shared by
+# API workers, whose versions all come from replaying the same output files
+RESPONSE_EPOCH = os.getenv("RESPONSE_EPOCH") or uuid.uuid4().hex[:8]
+
+# Set when the pipeline runs in a separate process
+rollup_follower: Optional[JsonlFollower] = None
+output_followers: List[JsonlFollower] = []
+
+def on_global_stats_change(key, row: Dict[str, Any], time: int, is_addition: bool):
+    """Keep the latest global stats row and its population sketches, track pipeline progress"""
+    global_stats.on_change(key=key, row=row, time=time, is_addition=is_addition)
+    sketch_store.on_global_change(key=key, row=row, time=time, is_addition=is_addition)
+    if ingestor is not None:
+        ingestor.admission.on_global_stats_change(key=key, row=row, time=time, is_addition=is_addition)
+
+def on_comprehensive_change(key, row: Dict[str, Any], time: int, is_addition: bool):
+    """Apply a comprehensive row change to the analytics state, then push it"""
+    analytics_state.on_comprehensive_change(key=key, row=row, time=time, is_addition=is_addition)
+    broadcaster.on_change(key=key, row=row, time=time, is_addition=is_addition)
 
 # ============================
 # FASTAPI APPLICATION
@@ -344,10 +170,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global state
 pathway_thread = None
-event_counter = 0
-session_counter = 0
+
+@app.middleware("http")
+async def record_endpoint_latency(request: Request, call_next):
+    """Time every request into the histogram of its route template"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint_metrics.observe(
+            f"{request.method} {route.path if route else 'unmatched'}",
+            status,
+            (time.perf_counter() - start) * 1000
+        )
 
 # ============================
 # HELPER FUNCTIONS
@@ -375,17 +215,18 @@ def read_latest_from_jsonl(filepath: str, user_id: Optional[str] = None) -> List
 def get_user_analytics(user_id: str) -> Dict[str, Any]:
     """Get comprehensive analytics for a user"""
     try:
-        # Read from all output files
-        user_stats = read_latest_from_jsonl(f"{OUTPUT_DIR}/user_stats.jsonl", user_id)
-        type_stats = read_latest_from_jsonl(f"{OUTPUT_DIR}/type_stats.jsonl", user_id)
-        language_stats = read_latest_from_jsonl(f"{OUTPUT_DIR}/language_stats.jsonl", user_id)
-        productivity = read_latest_from_jsonl(f"{OUTPUT_DIR}/productivity.jsonl", user_id)
-        burnout = read_latest_from_jsonl(f"{OUTPUT_DIR}/burnout.jsonl", user_id)
-        patterns = read_latest_from_jsonl(f"{OUTPUT_DIR}/patterns.jsonl", user_id)
-        comprehensive = read_latest_from_jsonl(f"{OUTPUT_DIR}/comprehensive.jsonl", user_id)
-        
-        # Get latest comprehensive data
-        latest_comprehensive = comprehensive[-1] if comprehensive else None
+        snapshot = analytics_state.snapshot(user_id)
+        if snapshot is not None:
+            # Rows mirrored from the pipeline's update stream
+            _, latest_comprehensive, type_stats, language_stats = snapshot
+        else:
+            # Not updated since this process started, fall back to the output log
+            type_stats = read_latest_from_jsonl(log_path(OUTPUT_LOG_DIR, "type_stats"), user_id)
+            language_stats = read_latest_from_jsonl(log_path(OUTPUT_LOG_DIR, "language_stats"), user_id)
+            comprehensive = read_latest_from_jsonl(log_path(OUTPUT_LOG_DIR, "comprehensive"), user_id)
+            
+            # Get latest comprehensive data
+            latest_comprehensive = comprehensive[-1] if comprehensive else None
         
         if not latest_comprehensive:
             return {
@@ -446,6 +287,33 @@ def get_user_analytics(user_id: str) -> Dict[str, Any]:
             "has_data": False
         }
 
+def versioned_response(request: Request, user_id: str, view: str, build) -> Response:
+    """
+    Serve a per-user view with ETag support
+    The body is rebuilt only when the user's pipeline version has advanced,
+    and a matching If-None-Match is answered with 304
+    """
+    version = analytics_state.version(user_id)
+    etag = f'W/"{RESPONSE_EPOCH}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    
+    body = response_cache.get_or_build((user_id, view), version, build)
+    return JSONResponse(body, headers=headers)
+
+def cached_user_analytics(user_id: str) -> Dict[str, Any]:
+    """get_user_analytics, reused across views until the user's version changes"""
+    return response_cache.get_or_build(
+        (user_id, "analytics"),
+        analytics_state.version(user_id),
+        lambda: get_user_analytics(user_id)
+    )
+
 # ============================
 # API ENDPOINTS
 # ============================
@@ -453,171 +321,352 @@ def get_user_analytics(user_id: str) -> Dict[str, Any]:
 @app.get("/")
 def health_check():
     """Health check endpoint"""
-    return {
+    health = {
         "status": "healthy",
         "service": "FlowState Pathway Analytics Engine",
         "version": "2.0.0",
         "python_version": "3.11+",
         "streaming": True,
-        "sessions_processed": session_counter,
-        "events_received": event_counter,
+        "pipeline_mode": PIPELINE_MODE,
+        "worker_pid": os.getpid(),
+        # Counted by the pipeline, so every API worker reports the same figure
+        "sessions_processed": (global_stats.get() or {}).get("total_sessions", 0),
         "input_dir": INPUT_DIR,
         "output_dir": OUTPUT_DIR
     }
+    if ingestor is not None:
+        health.update(ingestor.stats())
+    return health
 
 @app.post("/ingest/session")
-async def ingest_session(session: SessionEvent, background_tasks: BackgroundTasks):
+async def ingest_session(session: SessionEvent):
     """
     Ingest a session event for Pathway processing
     Pathway will automatically detect and process the new data
+    Replays of an already ingested session_id are acknowledged but not written
+    Returns 429 with Retry-After when the pipeline is behind or the user is rate limited
     """
-    global session_counter
-    session_counter += 1
-    
-    try:
-        # Convert timestamp to unix timestamp
-        if isinstance(session.timestamp, str):
-            dt = datetime.fromisoformat(session.timestamp.replace('Z', '+00:00'))
-            timestamp = int(dt.timestamp())
-        else:
-            timestamp = int(session.timestamp)
-        
-        # Write to CSV for Pathway streaming
-        csv_file = f"{INPUT_DIR}/session_{session_counter}_{timestamp}.csv"
-        
-        # Create CSV with header if first file
-        with open(csv_file, 'w') as f:
-            f.write("user_id,session_type,timestamp,duration,focus_score,quality_score,distractions,language,lines_of_code,creativity_score\n")
-            f.write(f"{session.user_id},{session.session_type},{timestamp},{session.duration},{session.focus_score},{session.quality_score},{session.distractions},{session.language or 'unknown'},{session.lines_of_code or 0},{session.creativity_score or 0}\n")
-        
-        logger.info(f"✅ Session ingested: {csv_file}")
-        
-        return {
-            "status": "accepted",
-            "session_id": session.session_id,
-            "message": "Session data ingested successfully",
-            "csv_file": csv_file,
-            "pathway_processing": True
-        }
-    except Exception as e:
-        logger.error(f"Error ingesting session: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    if ingestor is not None:
+        return ingestor.ingest(session)
+    return await pipeline_client.ingest(session)
+
+@app.get("/ingest/stats")
+async def get_ingest_stats():
+    """Ingestion queue depth, pipeline progress and rejection counters"""
+    if ingestor is not None:
+        return ingestor.stats()
+    status, body, _ = await pipeline_client.request("GET", "/ingest/stats")
+    if status != 200:
+        raise HTTPException(status_code=status, detail=body)
+    return body
 
 @app.get("/analytics/{user_id}")
-async def get_analytics(user_id: str):
+async def get_analytics(user_id: str, request: Request):
     """Get comprehensive analytics for a user"""
     try:
-        analytics = get_user_analytics(user_id)
-        return analytics
+        return versioned_response(request, user_id, "analytics", lambda: get_user_analytics(user_id))
     except Exception as e:
         logger.error(f"Error fetching analytics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_overview(user_id: str) -> Dict[str, Any]:
+    analytics = cached_user_analytics(user_id)
+    if not analytics.get("has_data"):
+        return analytics
+    return {
+        "user_id": user_id,
+        "overview": analytics.get("overview", {}),
+        "productivity": analytics.get("productivity", {}),
+        "burnout": analytics.get("burnout", {})
+    }
+
 @app.get("/analytics/{user_id}/overview")
-async def get_overview(user_id: str):
+async def get_overview(user_id: str, request: Request):
     """Get overview statistics for a user"""
     try:
-        analytics = get_user_analytics(user_id)
-        if not analytics.get("has_data"):
-            return analytics
-        return {
-            "user_id": user_id,
-            "overview": analytics.get("overview", {}),
-            "productivity": analytics.get("productivity", {}),
-            "burnout": analytics.get("burnout", {})
-        }
+        return versioned_response(request, user_id, "overview", lambda: build_overview(user_id))
     except Exception as e:
         logger.error(f"Error fetching overview: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_breakdown(user_id: str) -> Dict[str, Any]:
+    analytics = cached_user_analytics(user_id)
+    if not analytics.get("has_data"):
+        return analytics
+    return {
+        "user_id": user_id,
+        "breakdown": analytics.get("breakdown", {})
+    }
+
 @app.get("/analytics/{user_id}/breakdown")
-async def get_breakdown(user_id: str):
+async def get_breakdown(user_id: str, request: Request):
     """Get detailed breakdown by type and language"""
     try:
-        analytics = get_user_analytics(user_id)
-        if not analytics.get("has_data"):
-            return analytics
-        return {
-            "user_id": user_id,
-            "breakdown": analytics.get("breakdown", {})
-        }
+        return versioned_response(request, user_id, "breakdown", lambda: build_breakdown(user_id))
     except Exception as e:
         logger.error(f"Error fetching breakdown: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_insights(user_id: str) -> Dict[str, Any]:
+    analytics = cached_user_analytics(user_id)
+    if not analytics.get("has_data"):
+        return analytics
+    
+    productivity = analytics.get("productivity", {})
+    burnout = analytics.get("burnout", {})
+    overview = analytics.get("overview", {})
+    
+    # Generate insights
+    insights = []
+    
+    # Focus insights
+    avg_focus = overview.get("avg_focus_score", 0)
+    if avg_focus >= 80:
+        insights.append({
+            "type": "positive",
+            "category": "focus",
+            "message": f"Excellent focus! Your average score of {avg_focus:.0f} is outstanding.",
+            "icon": "🎯"
+        })
+    elif avg_focus < 60:
+        insights.append({
+            "type": "warning",
+            "category": "focus",
+            "message": f"Focus score of {avg_focus:.0f} could be improved. Try reducing distractions.",
+            "icon": "⚠️"
+        })
+    
+    # Burnout insights
+    if burnout.get("risk_level") == "high":
+        insights.append({
+            "type": "alert",
+            "category": "burnout",
+            "message": "High burnout risk detected. Consider taking breaks and reducing session length.",
+            "icon": "🚨"
+        })
+    
+    # Productivity insights
+    pattern = productivity.get("pattern")
+    if pattern == "peak_performer":
+        insights.append({
+            "type": "positive",
+            "category": "productivity",
+            "message": "You're a peak performer! Keep up the excellent work.",
+            "icon": "⭐"
+        })
+    
+    return {
+        "user_id": user_id,
+        "insights": insights,
+        "recommendation": productivity.get("recommendation", ""),
+        "productivity_level": productivity.get("level", "unknown")
+    }
+
 @app.get("/analytics/{user_id}/insights")
-async def get_insights(user_id: str):
+async def get_insights(user_id: str, request: Request):
     """Get AI-powered insights and recommendations"""
     try:
-        analytics = get_user_analytics(user_id)
-        if not analytics.get("has_data"):
-            return analytics
-        
-        productivity = analytics.get("productivity", {})
-        burnout = analytics.get("burnout", {})
-        overview = analytics.get("overview", {})
-        
-        # Generate insights
-        insights = []
-        
-        # Focus insights
-        avg_focus = overview.get("avg_focus_score", 0)
-        if avg_focus >= 80:
-            insights.append({
-                "type": "positive",
-                "category": "focus",
-                "message": f"Excellent focus! Your average score of {avg_focus:.0f} is outstanding.",
-                "icon": "🎯"
-            })
-        elif avg_focus < 60:
-            insights.append({
-                "type": "warning",
-                "category": "focus",
-                "message": f"Focus score of {avg_focus:.0f} could be improved. Try reducing distractions.",
-                "icon": "⚠️"
-            })
-        
-        # Burnout insights
-        if burnout.get("risk_level") == "high":
-            insights.append({
-                "type": "alert",
-                "category": "burnout",
-                "message": "High burnout risk detected. Consider taking breaks and reducing session length.",
-                "icon": "🚨"
-            })
-        
-        # Productivity insights
-        pattern = productivity.get("pattern")
-        if pattern == "peak_performer":
-            insights.append({
-                "type": "positive",
-                "category": "productivity",
-                "message": "You're a peak performer! Keep up the excellent work.",
-                "icon": "⭐"
-            })
-        
-        return {
-            "user_id": user_id,
-            "insights": insights,
-            "recommendation": productivity.get("recommendation", ""),
-            "productivity_level": productivity.get("level", "unknown")
-        }
+        return versioned_response(request, user_id, "insights", lambda: build_insights(user_id))
     except Exception as e:
         logger.error(f"Error fetching insights: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def query_time_range(query: AnalyticsQuery) -> Dict[str, Any]:
+    """Answer a time-range query from the daily rollup buckets"""
+    if rollup_follower is not None:
+        rollup_follower.poll()
+    try:
+        return rollup_store.query(query.user_id, query.time_range, query.session_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/analytics/{user_id}/range")
+def get_time_range(user_id: str, time_range: str = "7d", session_type: Optional[str] = None):
+    """Get analytics for the last 7, 30 or 90 days, optionally per session type"""
+    return query_time_range(AnalyticsQuery(
+        user_id=user_id,
+        time_range=time_range,
+        session_type=session_type
+    ))
+
+@app.post("/analytics/query")
+def post_analytics_query(query: AnalyticsQuery):
+    """Time-range analytics query using the AnalyticsQuery model"""
+    return query_time_range(query)
+
+# ============================
+# HISTORY
+# ============================
+
+@app.get("/analytics/{user_id}/history")
+def get_history(
+    user_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    table: str = "sessions",
+    columns: Optional[str] = None
+):
+    """
+    Read a user's session or metric history from the columnar store
+    Only the date partitions in [start, end] and the user's hash bucket are read
+    """
+    if table not in ("sessions", "comprehensive"):
+        raise HTTPException(status_code=400, detail="table must be 'sessions' or 'comprehensive'")
+    try:
+        rows = query_history(
+            table,
+            user_id=user_id,
+            start=start,
+            end=end,
+            columns=columns.split(",") if columns else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "user_id": user_id,
+        "table": table,
+        "start": start,
+        "end": end,
+        "count": len(rows),
+        "rows": rows
+    }
+
+# ============================
+# DISTRIBUTIONS
+# ============================
+
+def parse_quantiles(quantiles: str) -> List[float]:
+    """Parse a comma-separated list of quantiles in (0, 1)"""
+    try:
+        values = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid quantiles '{quantiles}'")
+    if not values or any(not 0 <= q <= 1 for q in values):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    return values
+
+@app.get("/analytics/{user_id}/percentiles")
+def get_percentiles(user_id: str, quantiles: str = DEFAULT_QUANTILES):
+    """Percentiles of a user's focus scores and session durations"""
+    qs = parse_quantiles(quantiles)
+    user = sketch_store.user(user_id)
+    population = sketch_store.population()
+    return {
+        "user_id": user_id,
+        "has_data": bool(user),
+        "focus_score": summarize(user.get("focus_sketch"), qs),
+        "duration": summarize(user.get("duration_sketch"), qs),
+        "all_sessions": {
+            "focus_score": summarize(population.get("focus_sketch"), qs),
+            "duration": summarize(population.get("duration_sketch"), qs)
+        }
+    }
+
+@app.get("/analytics/{user_id}/rank")
+def get_rank(user_id: str):
+    """Where a user's average focus and session length rank among all users"""
+    analytics = cached_user_analytics(user_id)
+    if not analytics.get("has_data"):
+        return analytics
+    
+    overview = analytics["overview"]
+    population = sketch_store.population()
+    
+    def percentile_rank(sketch_name: str, value: float) -> Optional[float]:
+        sketch = population.get(sketch_name)
+        rank = sketch.rank(value) if sketch is not None else None
+        return round(rank * 100, 1) if rank is not None else None
+    
+    return {
+        "user_id": user_id,
+        "avg_focus_score": overview["avg_focus_score"],
+        "focus_percentile_rank": percentile_rank("user_avg_focus_sketch", overview["avg_focus_score"]),
+        "avg_session_duration": overview["avg_session_duration"],
+        "duration_percentile_rank": percentile_rank("user_avg_duration_sketch", overview["avg_session_duration"])
+    }
+
+# ============================
+# PUSH UPDATES
+# ============================
+
+def latest_comprehensive_row(user_id: str) -> Optional[Dict[str, Any]]:
+    """Latest comprehensive row for a user, without the time/diff columns"""
+    snapshot = analytics_state.snapshot(user_id)
+    if snapshot is not None:
+        return snapshot[1]
+    rows = read_latest_from_jsonl(log_path(OUTPUT_LOG_DIR, "comprehensive"), user_id)
+    if not rows:
+        return None
+    return {k: v for k, v in rows[-1].items() if k not in ("time", "diff")}
+
+@app.get("/analytics/{user_id}/stream")
+async def stream_analytics(user_id: str, request: Request):
+    """
+    Server-Sent Events stream of analytics changes for a user
+    Sends a full snapshot first, then one 'update' event per pipeline change
+    """
+    queue = broadcaster.subscribe(user_id, latest_comprehensive_row(user_id))
+    
+    async def event_stream():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(get_user_analytics(user_id))}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=PUSH_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            broadcaster.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/analytics/{user_id}")
+async def analytics_websocket(websocket: WebSocket, user_id: str):
+    """WebSocket variant of the analytics stream"""
+    await websocket.accept()
+    queue = broadcaster.subscribe(user_id, latest_comprehensive_row(user_id))
+    try:
+        await websocket.send_json({
+            "type": "snapshot",
+            "user_id": user_id,
+            "analytics": get_user_analytics(user_id)
+        })
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=PUSH_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                message = {"type": "keepalive"}
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(user_id, queue)
+
 @app.get("/stats")
 def get_stats():
     """Get overall system statistics"""
     try:
-        # Count unique users
-        all_stats = read_latest_from_jsonl(f"{OUTPUT_DIR}/user_stats.jsonl")
-        unique_users = len(set(stat.get('user_id') for stat in all_stats))
+        # Maintained by the pipeline as a single row, no output scan needed
+        stats = global_stats.get() or {}
         
         return {
-            "total_sessions_processed": session_counter,
-            "total_events_received": event_counter,
-            "active_users": unique_users,
+            "total_sessions_processed": stats.get("total_sessions", 0),
+            # Every received event is a session the pipeline counts
+            "total_events_received": stats.get("total_sessions", 0),
+            "active_users": stats.get("active_users", 0),
+            "pipeline_sessions": stats.get("total_sessions", 0),
+            "total_duration": stats.get("total_duration", 0),
+            "mean_focus_score": round(stats.get("mean_focus", 0), 2),
+            "leaderboards": {
+                "focus": json.loads(stats.get("top_focus", "[]")),
+                "total_duration": json.loads(stats.get("top_duration", "[]"))
+            },
             "streaming_active": True,
             "python_version": "3.11+",
             "pathway_version": "0.13.0+"
@@ -625,40 +674,183 @@ def get_stats():
     except Exception as e:
         logger.error(f"Error fetching stats: {e}")
         return {
-            "total_sessions_processed": session_counter,
-            "total_events_received": event_counter,
             "error": str(e)
         }
 
+# ============================
+# METRICS AND PROFILING
+# ============================
+
+def pipeline_resource_metrics(pipeline: Dict[str, Any]) -> Dict[str, Any]:
+    """Input backlog and sink sizes, read from the shared input/output directories"""
+    return {
+        **pipeline,
+        "input_backlog": {
+            "input_dir": directory_usage(INPUT_DIR, ".csv"),
+            "unprocessed_sessions": ingestor.admission.stats()["queue_depth"] if ingestor is not None else None
+        },
+        "sinks": sink_sizes(OUTPUT_DIR)
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Pipeline row counts, commit latency, backlog, sink sizes, RSS and endpoint latencies"""
+    if ingestor is not None:
+        pipeline = pipeline_resource_metrics(pipeline_metrics.snapshot())
+    else:
+        status, body, _ = await pipeline_client.request("GET", "/metrics")
+        pipeline = body if status == 200 else {"error": body}
+    return {
+        "pipeline_mode": PIPELINE_MODE,
+        "pipeline": pipeline,
+        "process": process_stats(),
+        "endpoints": endpoint_metrics.snapshot(),
+        "response_cache": {"hits": response_cache.hits, "misses": response_cache.misses}
+    }
+
+@app.get("/debug/profile")
+async def get_profile(seconds: float = 5.0, interval_ms: float = 10.0, target: str = "api"):
+    """
+    Sample where threads spend CPU time for `seconds`
+    target=pipeline profiles the pipeline process when it runs externally;
+    in embedded mode the pipeline thread is part of the 'api' profile
+    """
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or interval_ms <= 0:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}] and interval_ms positive")
+    if target not in ("api", "pipeline"):
+        raise HTTPException(status_code=400, detail="target must be 'api' or 'pipeline'")
+    if target == "pipeline" and pipeline_client is not None:
+        status, body, _ = await pipeline_client.request(
+            "GET", f"/debug/profile?seconds={seconds}&interval_ms={interval_ms}",
+            timeout=seconds + 10
+        )
+        if status != 200:
+            raise HTTPException(status_code=status, detail=body)
+        return body
+    return await asyncio.to_thread(sample_profile, seconds, interval_ms / 1000)
+
 # ============================
 # RUN PATHWAY IN BACKGROUND
 # ============================
 
+def replay_outputs():
+    """
+    Rebuild the in-memory mirrors from the output log before a resumed run
+
+    A run restored from a checkpoint only emits changes made after it, and
+    Pathway truncates the sinks, so without this the mirrors would start
+    empty. Admission and push updates are left out, admission is seeded
+    separately and nobody is connected yet.
+    """
+    replayed = 0
+    for name, on_change in [
+        ("daily_rollups", rollup_store.on_change),
+        ("comprehensive", analytics_state.on_comprehensive_change),
+        ("type_stats", analytics_state.on_type_change),
+        ("language_stats", analytics_state.on_language_change),
+        ("user_distributions", sketch_store.on_user_change),
+        ("session_distribution", sketch_store.on_global_change),
+        ("global_stats", global_stats.on_change),
+        ("global_stats", sketch_store.on_global_change),
+    ]:
+        replayed += JsonlFollower(log_path(OUTPUT_LOG_DIR, name), on_change).poll()
+    logger.info(f"♻️ Replayed {replayed} output updates from {OUTPUT_LOG_DIR}")
+
 def run_pathway():
     """Run Pathway pipeline in background thread"""
     try:
         logger.info("🚀 Starting Pathway streaming pipeline...")
-        create_pathway_pipeline()
-        pw.run()  # This runs forever, processing streaming data
+        outputs = create_pathway_pipeline()
+        attach_output_log(outputs)
+        if PERSISTENCE_ENABLED:
+            replay_outputs()
+        # Keep the in-memory rollup store in sync for time-range queries
+        pw.io.subscribe(outputs["daily_rollups"], on_change=rollup_store.on_change)
+        # Mirror per-user rows for versioned responses and push updates
+        pw.io.subscribe(outputs["comprehensive"], on_change=on_comprehensive_change)
+        pw.io.subscribe(outputs["type_stats"], on_change=analytics_state.on_type_change)
+        pw.io.subscribe(outputs["language_stats"], on_change=analytics_state.on_language_change)
+        # Quantile sketches for percentile queries
+        pw.io.subscribe(outputs["user_distributions"], on_change=sketch_store.on_user_change)
+        pw.io.subscribe(outputs["session_distribution"], on_change=sketch_store.on_global_change)
+        # Global stats, leaderboards and population sketches
+        pw.io.subscribe(outputs["global_stats"], on_change=on_global_stats_change)
+        # Row counts per table and commit latency for /metrics
+        pipeline_metrics.attach(outputs)
+        # This runs forever, processing streaming data
+        pw.run(persistence_config=get_persistence_config())
     except Exception as e:
         logger.error(f"❌ Pathway error: {e}")
         import traceback
         traceback.print_exc()
 
-# Start Pathway in background thread
-pathway_thread = threading.Thread(target=run_pathway, daemon=True)
-pathway_thread.start()
-logger.info("✅ Pathway thread started")
+if PIPELINE_MODE == "embedded":
+    # Start Pathway in background thread
+    pathway_thread = threading.Thread(target=run_pathway, name="pathway-pipeline", daemon=True)
+    pathway_thread.start()
+    logger.info("✅ Pathway thread started")
+else:
+    # Follow the external pipeline's output log instead, it survives
+    # pipeline restarts while the sinks are truncated
+    rollup_follower = JsonlFollower(
+        log_path(OUTPUT_LOG_DIR, "daily_rollups"),
+        rollup_store.on_change
+    )
+    output_followers = [
+        JsonlFollower(log_path(OUTPUT_LOG_DIR, "comprehensive"), on_comprehensive_change),
+        JsonlFollower(log_path(OUTPUT_LOG_DIR, "type_stats"), analytics_state.on_type_change),
+        JsonlFollower(log_path(OUTPUT_LOG_DIR, "language_stats"), analytics_state.on_language_change),
+        JsonlFollower(log_path(OUTPUT_LOG_DIR, "user_distributions"), sketch_store.on_user_change),
+        JsonlFollower(log_path(OUTPUT_LOG_DIR, "session_distribution"), sketch_store.on_global_change),
+        JsonlFollower(log_path(OUTPUT_LOG_DIR, "global_stats"), on_global_stats_change),
+    ]
+    logger.info("✅ Using external Pathway pipeline")
+
+async def follow_pipeline_output():
+    """Poll the external pipeline's outputs for state changes and push updates"""
+    while True:
+        try:
+            for follower in output_followers:
+                follower.poll()
+        except Exception as e:
+            logger.error(f"Error following pipeline output: {e}")
+        await asyncio.sleep(FOLLOWER_POLL_SECONDS)
+
+@app.on_event("startup")
+async def start_output_followers():
+    if output_followers:
+        asyncio.create_task(follow_pipeline_output())
+
+@app.on_event("startup")
+async def start_dedup_snapshots():
+    if ingestor is not None and ingestor.dedup_state_file:
+        asyncio.create_task(ingestor.snapshot_state())
+
+@app.on_event("shutdown")
+async def shutdown_ingestion():
+    if ingestor is not None:
+        ingestor.save_state()
+    if pipeline_client is not None:
+        await pipeline_client.close()
 
 # ============================
 # RUN FASTAPI
 # ============================
 
 if __name__ == "__main__":
-    logger.info("🚀 Starting FastAPI server on port 8001...")
+    logger.info(f"🚀 Starting FastAPI server on port {PORT}...")
     logger.info("=" * 60)
     logger.info("PATHWAY REAL-TIME ANALYTICS ENGINE")
     logger.info("Python 3.11+ Compatible")
     logger.info("Streaming: ENABLED")
     logger.info("=" * 60)
-    uvicorn.run(app, host="0.0.0.0", port=8001, log_level="info")
+    if PIPELINE_MODE == "external" and API_WORKERS > 1:
+        # Workers import this module themselves; they share the pipeline
+        # through pipeline_server.py's socket and its output files
+        os.environ["RESPONSE_EPOCH"] = RESPONSE_EPOCH
+        uvicorn.run("main:app", host="0.0.0.0", port=PORT, workers=API_WORKERS, log_level="info")
+    else:
+        if API_WORKERS > 1:
+            logger.warning("⚠️ API_WORKERS ignored in embedded mode, use PIPELINE_MODE=external with pipeline_server.py")
+        uvicorn.run(app, host="0.0.0.0", port=PORT, log_level="info")
+
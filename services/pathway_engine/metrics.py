@@ -0,0 +1,282 @@
+"""
+Pipeline and API metrics for the Pathway engine
+
+PipelineMetrics counts rows flowing out of the dataflow by subscribing to
+its output tables, takes rows in from the pipeline's session total and
+measures commit latency, i.e. how far behind wall-clock time each closed
+Pathway timestamp is. EndpointMetrics keeps per-route latency histograms
+for the API. sample_profile() is a
+stdlib sampling profiler over all Python threads, including the one
+running pw.run (time spent inside the Rust engine shows up as that
+thread's pw.run frame).
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import pathway as pw
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with quantile estimates"""
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self.sum_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def _quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation
+        if self.count == 0:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+                "p50_ms": self._quantile(0.5),
+                "p90_ms": self._quantile(0.9),
+                "p99_ms": self._quantile(0.99),
+                "max_ms": round(self.max_ms, 3),
+                "buckets": {
+                    **{f"le_{bound}": count for bound, count in zip(self.buckets_ms, self.counts)},
+                    "le_inf": self.counts[-1]
+                }
+            }
+
+
+class TableCounter:
+    """Additions and retractions seen on one pipeline table"""
+
+    def __init__(self):
+        self.additions = 0
+        self.retractions = 0
+        self.last_change: Optional[float] = None
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback"""
+        if is_addition:
+            self.additions += 1
+        else:
+            self.retractions += 1
+        self.last_change = _now()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "additions": self.additions,
+            "retractions": self.retractions,
+            "seconds_since_change": round(_now() - self.last_change, 3) if self.last_change else None
+        }
+
+
+class PipelineMetrics:
+    """Row counts per table and commit latency for a running pipeline"""
+
+    def __init__(self, input_table: str = "sessions", stats_table: str = "global_stats"):
+        self.input_table = input_table
+        self.stats_table = stats_table
+        self.tables: Dict[str, TableCounter] = {}
+        self.rows_in = 0
+        self.commit_latency = LatencyHistogram()
+        self.commits = 0
+        self.last_commit: Optional[float] = None
+        self.started = _now()
+
+    def attach(self, outputs: Dict[str, pw.Table]):
+        """
+        Subscribe to the tables returned by create_pathway_pipeline()
+        The raw input table is not subscribed, a Python callback per input
+        row would slow the dataflow down; rows in come from the session
+        total of the single-row stats table instead
+        """
+        for name, table in outputs.items():
+            if name == self.input_table:
+                continue
+            counter = self.tables[name] = TableCounter()
+            if name == self.stats_table:
+                pw.io.subscribe(table, on_change=self.on_stats_change, on_time_end=self.on_time_end)
+            else:
+                pw.io.subscribe(table, on_change=counter.on_change)
+
+    def on_stats_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the stats table"""
+        self.tables[self.stats_table].on_change(key, row, time, is_addition)
+        if is_addition:
+            self.rows_in = row.get("total_sessions", 0)
+
+    def on_time_end(self, time: int):
+        """pw.io.subscribe callback, called once a Pathway timestamp is closed"""
+        now = _now()
+        self.commits += 1
+        self.last_commit = now
+        # Streaming timestamps are milliseconds since the epoch
+        lag_ms = now * 1000 - time
+        if 0 <= lag_ms < 86_400_000:
+            self.commit_latency.observe(lag_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": round(_now() - self.started, 3),
+            "rows_in": self.rows_in,
+            "tables": {name: counter.snapshot() for name, counter in self.tables.items()},
+            "commits": self.commits,
+            "seconds_since_commit": round(_now() - self.last_commit, 3) if self.last_commit else None,
+            "commit_latency": self.commit_latency.snapshot()
+        }
+
+
+class EndpointMetrics:
+    """Per-route latency histograms and status code counts"""
+
+    def __init__(self):
+        self._routes: Dict[str, LatencyHistogram] = {}
+        self._statuses: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, status: int, ms: float):
+        with self._lock:
+            histogram = self._routes.get(route)
+            if histogram is None:
+                histogram = self._routes[route] = LatencyHistogram()
+                self._statuses[route] = Counter()
+            self._statuses[route][str(status)] += 1
+        histogram.observe(ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = list(self._routes.items())
+            statuses = {route: dict(counts) for route, counts in self._statuses.items()}
+        return {
+            route: {**histogram.snapshot(), "status": statuses[route]}
+            for route, histogram in routes
+        }
+
+
+def _now() -> float:
+    return time.time()
+
+
+def process_stats() -> Dict[str, Any]:
+    """RSS, CPU time and thread count of this process"""
+    rss_bytes = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_bytes = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux
+        rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    times = os.times()
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes,
+        "cpu_user_seconds": round(times.user, 3),
+        "cpu_system_seconds": round(times.system, 3),
+        "threads": threading.active_count()
+    }
+
+
+def directory_usage(directory: str, suffix: str = "") -> Dict[str, Any]:
+    """Number and total size of the files in a directory"""
+    files = 0
+    size = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(suffix):
+                    files += 1
+                    size += entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return {"files": files, "bytes": size}
+
+
+def sink_sizes(output_dir: str) -> Dict[str, int]:
+    """Size in bytes of each JSON Lines output"""
+    sizes = {}
+    try:
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".jsonl"):
+                    sizes[entry.name] = entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return sizes
+
+
+def sample_profile(seconds: float = 5.0, interval: float = 0.01, limit: int = 25) -> Dict[str, Any]:
+    """
+    Sample every thread's Python stack for `seconds`
+    Returns the hottest functions (by samples on top of the stack) and the
+    most frequent collapsed stacks, per thread
+    """
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    functions: Dict[str, Counter] = {}
+    stacks: Dict[str, Counter] = {}
+    samples = 0
+
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            name = names.get(ident, str(ident))
+            summary = traceback.extract_stack(frame)
+            if not summary:
+                continue
+            frames = [f"{os.path.basename(f.filename)}:{f.name}:{f.lineno}" for f in summary]
+            functions.setdefault(name, Counter())[frames[-1]] += 1
+            stacks.setdefault(name, Counter())[";".join(frames)] += 1
+        samples += 1
+        time.sleep(interval)
+
+    return {
+        "seconds": seconds,
+        "interval_ms": interval * 1000,
+        "samples": samples,
+        "threads": {
+            name: {
+                "samples": sum(functions[name].values()),
+                "top_functions": [
+                    {"frame": frame, "samples": count, "share": round(count / samples, 3)}
+                    for frame, count in functions[name].most_common(limit)
+                ],
+                "top_stacks": [
+                    {"stack": stack, "samples": count}
+                    for stack, count in stacks[name].most_common(limit)
+                ]
+            }
+            for name in functions
+        }
+    }
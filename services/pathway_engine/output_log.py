@@ -0,0 +1,106 @@
+"""
+Append-only log of the pipeline outputs the API mirrors in memory
+
+Pathway truncates its jsonlines sinks when it resumes from a persistence
+snapshot, so after a restart they only hold the changes made since. The
+pipeline therefore also appends the update streams of the mirrored tables
+to files of its own under OUTPUT_LOG_DIR, in the same time/diff format,
+and the API rebuilds its in-memory state from those with JsonlFollower.
+
+On startup each log is compacted to the rows it currently holds, so it
+stays the size of the state plus one run's updates. Updates that Pathway
+re-emits after resuming from an older snapshot are already in the log and
+leave the compacted state unchanged. Without persistence the pipeline recomputes everything and
+the logs start empty.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pipeline outputs mirrored by the API, by their create_pathway_pipeline() name
+MIRRORED_OUTPUTS = [
+    "daily_rollups",
+    "comprehensive",
+    "type_stats",
+    "language_stats",
+    "user_distributions",
+    "session_distribution",
+    "global_stats",
+]
+
+
+def log_path(log_dir: str, name: str) -> str:
+    return os.path.join(log_dir, f"{name}.jsonl")
+
+
+def compact(filepath: str) -> int:
+    """Rewrite a log as one addition per row it currently holds, return how many"""
+    if not os.path.exists(filepath):
+        return 0
+    # Current row -> (line of its last addition, time), keeps the update order.
+    # Rows are unique within a table, so an addition or retraction replayed
+    # after resuming from an older snapshot leaves the set unchanged.
+    present: Dict[str, Tuple[int, Any]] = {}
+    with open(filepath, "r") as f:
+        for position, line in enumerate(f):
+            if not line.endswith("\n") or not line.strip():
+                continue  # Partial line written before a crash
+            data = json.loads(line)
+            time = data.pop("time", 0)
+            diff = data.pop("diff", 1)
+            row = json.dumps(data, sort_keys=True)
+            if diff > 0:
+                present[row] = (position, time)
+            else:
+                present.pop(row, None)
+
+    rows = sorted(present, key=lambda row: present[row][0])
+    tmp = f"{filepath}.tmp"
+    with open(tmp, "w") as f:
+        for row in rows:
+            f.write(json.dumps({**json.loads(row), "time": present[row][1], "diff": 1}) + "\n")
+    os.replace(tmp, filepath)
+    return len(rows)
+
+
+def prepare(log_dir: str, resume: bool, names: List[str] = MIRRORED_OUTPUTS) -> int:
+    """
+    Compact the logs before a run resumed from a snapshot, or clear them
+    before a run that recomputes everything; returns the rows kept
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    kept = 0
+    for name in names:
+        filepath = log_path(log_dir, name)
+        if resume:
+            kept += compact(filepath)
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+    return kept
+
+
+class OutputLogWriter:
+    """Appends one table's updates from pw.io.subscribe to its log, flushed per Pathway timestamp"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._file = open(filepath, "a")
+        self._lock = threading.Lock()
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        line = json.dumps({**row, "time": time, "diff": 1 if is_addition else -1}, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def on_time_end(self, time: int):
+        with self._lock:
+            self._file.flush()
+
+    def on_end(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,535 @@
+"""
+FlowState Pathway Analytics Pipeline
+Session analytics dataflow, runnable embedded in the API or standalone
+
+Run standalone with several workers (state is sharded by user_id):
+    PATHWAY_THREADS=4 python pathway_analytics.py
+    pathway spawn --processes 4 python pathway_analytics.py
+"""
+
+import pathway as pw
+import os
+import json
+import logging
+
+from rollups import SECONDS_PER_DAY
+from sketches import Leaderboard, QuantileSketch
+from history_store import HISTORY_DIR, HistoryWriter, processing_date, session_date
+from output_log import MIRRORED_OUTPUTS, OutputLogWriter, log_path, prepare
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# CONFIGURATION
+# ============================
+
+INPUT_DIR = os.getenv("INPUT_DIR", "/app/input_stream")
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "/app/output")
+INPUT_MODE = os.getenv("PIPELINE_INPUT_MODE", "streaming")  # 'streaming' or 'static'
+PERSISTENCE_ENABLED = os.getenv("PERSISTENCE_ENABLED", "true").lower() == "true"
+PERSISTENCE_DIR = os.getenv("PERSISTENCE_DIR", "/app/pathway_state")
+SNAPSHOT_INTERVAL_MS = int(os.getenv("SNAPSHOT_INTERVAL_MS", "5000"))
+# Copy of the mirrored outputs that survives restarts, unlike the sinks (see output_log.py)
+OUTPUT_LOG_DIR = os.getenv("OUTPUT_LOG_DIR", os.path.join(PERSISTENCE_DIR, "outputs"))
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() == "true"
+os.makedirs(INPUT_DIR, exist_ok=True)
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+if PERSISTENCE_ENABLED:
+    os.makedirs(PERSISTENCE_DIR, exist_ok=True)
+
+# ============================
+# PATHWAY SCHEMA DEFINITION
+# ============================
+
+class SessionSchema(pw.Schema):
+    user_id: str
+    session_type: str
+    timestamp: int
+    duration: int
+    focus_score: int
+    quality_score: int
+    distractions: int
+    language: str
+    lines_of_code: int
+    creativity_score: int
+
+# ============================
+# CUSTOM REDUCERS
+# ============================
+
+class QuantileAccumulator(pw.BaseCustomAccumulator):
+    """Maintains a QuantileSketch incrementally, including retractions"""
+    
+    def __init__(self, sketch: QuantileSketch):
+        self.sketch = sketch
+    
+    @classmethod
+    def from_row(cls, row):
+        [value] = row
+        sketch = QuantileSketch()
+        sketch.add(value)
+        return cls(sketch)
+    
+    def update(self, other):
+        self.sketch.merge(other.sketch)
+    
+    def retract(self, other):
+        self.sketch.subtract(other.sketch)
+    
+    def compute_result(self) -> str:
+        return self.sketch.to_json()
+
+# Serialized sketch of a numeric column, bounded size per group
+quantile_sketch = pw.reducers.udf_reducer(QuantileAccumulator)
+
+class TopKAccumulator(pw.BaseCustomAccumulator):
+    """
+    Reports the LEADERBOARD_SIZE users with the largest values
+
+    Retractions are matched by (user_id, value), see Leaderboard; state is
+    one entry per user in the group.
+    """
+    
+    def __init__(self, leaderboard: Leaderboard):
+        self.leaderboard = leaderboard
+    
+    @classmethod
+    def from_row(cls, row):
+        [user_id, value] = row
+        leaderboard = Leaderboard()
+        leaderboard.add(user_id, value)
+        return cls(leaderboard)
+    
+    def update(self, other):
+        self.leaderboard.merge(other.leaderboard)
+    
+    def retract(self, other):
+        self.leaderboard.subtract(other.leaderboard)
+    
+    def compute_result(self) -> str:
+        top = self.leaderboard.top(LEADERBOARD_SIZE)
+        return json.dumps([{"user_id": user_id, "value": value} for user_id, value in top])
+
+# Serialized top-K (user_id, value) leaderboard
+top_k = pw.reducers.udf_reducer(TopKAccumulator)
+
+# ============================
+# ANALYTICS RULES
+# ============================
+
+def classify_productivity(focus: float, dist: int, sessions: int) -> str:
+    """Classify a user's productivity from focus and distraction rate"""
+    return (
+        "excellent" if focus >= 85 and dist / sessions < 3 else
+        "good" if focus >= 70 and dist / sessions < 5 else
+        "moderate" if focus >= 55 else
+        "needs_improvement"
+    )
+
+def classify_consistency(max_f: int, min_f: int) -> str:
+    """Classify the spread between best and worst focus scores"""
+    return "consistent" if (max_f - min_f) < 20 else "variable"
+
+def classify_burnout(sessions: int, focus: float, duration: int) -> str:
+    """Estimate burnout risk from session volume, focus and total time"""
+    return (
+        "high" if sessions > 15 and focus < 50 and duration > 36000 else
+        "medium" if sessions > 10 and focus < 60 else
+        "low"
+    )
+
+def classify_pattern(level: str, consistency: str) -> str:
+    """Map productivity level and consistency to a behaviour pattern"""
+    return (
+        "peak_performer" if level == "excellent" and consistency == "consistent" else
+        "improving" if level in ["good", "excellent"] else
+        "struggling" if level == "needs_improvement" else
+        "inconsistent"
+    )
+
+def recommend(level: str) -> str:
+    """Recommendation text for a productivity level"""
+    return (
+        "Keep up the great work! Consider mentoring others." if level == "excellent" else
+        "You're doing well. Try to maintain consistency." if level == "good" else
+        "Focus on reducing distractions and taking regular breaks." if level == "moderate" else
+        "Consider adjusting your work environment and schedule."
+    )
+
+# ============================
+# PATHWAY STREAMING PIPELINE
+# ============================
+
+def create_pathway_pipeline(
+    input_dir: str = INPUT_DIR,
+    output_dir: str = OUTPUT_DIR,
+    mode: str = INPUT_MODE,
+    input_format: str = "csv",
+    history: bool = HISTORY_ENABLED
+):
+    """
+    Create comprehensive Pathway streaming pipeline for analytics
+    Processes session data in real-time and generates insights
+    
+    input_dir may also be a single file; input_format is 'csv' or 'jsonl'.
+    Returns the output tables by name so callers can attach extra
+    subscribers before pw.run()
+    """
+    
+    logger.info("🔧 Creating Pathway streaming pipeline...")
+    
+    # INPUT: CSV Streaming Connector
+    # Monitors input directory for new session data
+    reader = pw.io.jsonlines.read if input_format == "jsonl" else pw.io.csv.read
+    sessions = reader(
+        input_dir,
+        schema=SessionSchema,
+        mode=mode,
+        # Skips files the ingestor is still writing
+        object_pattern=f"*.{input_format}" if os.path.isdir(input_dir) else "*",
+        autocommit_duration_ms=1000,  # Process every second
+        persistent_id="sessions"  # Lets restarts skip already-read files
+    )
+    
+    logger.info(f"✅ {input_format.upper()} {mode} connector initialized")
+    
+    # ============================
+    # BASIC AGGREGATIONS
+    # ============================
+    
+    # Overall user statistics
+    user_stats = sessions.groupby(sessions.user_id).reduce(
+        user_id=pw.this.user_id,
+        total_sessions=pw.reducers.count(),
+        avg_focus_score=pw.reducers.avg(pw.this.focus_score),
+        avg_quality_score=pw.reducers.avg(pw.this.quality_score),
+        total_duration=pw.reducers.sum(pw.this.duration),
+        total_distractions=pw.reducers.sum(pw.this.distractions),
+        max_focus=pw.reducers.max(pw.this.focus_score),
+        min_focus=pw.reducers.min(pw.this.focus_score),
+        focus_sketch=quantile_sketch(pw.this.focus_score),
+        duration_sketch=quantile_sketch(pw.this.duration)
+    )
+    
+    # Per-user distributions, sketched in the same groupby as user_stats
+    user_distributions = user_stats.select(
+        pw.this.user_id,
+        pw.this.focus_sketch,
+        pw.this.duration_sketch
+    )
+    user_stats = user_stats.without(pw.this.focus_sketch, pw.this.duration_sketch)
+    
+    # Global distribution of per-session values
+    session_distribution = sessions.reduce(
+        focus_sketch=quantile_sketch(pw.this.focus_score),
+        duration_sketch=quantile_sketch(pw.this.duration)
+    )
+    
+    # Global stats: one row updated in place as users change
+    global_stats = user_stats.reduce(
+        active_users=pw.reducers.count(),
+        total_sessions=pw.reducers.sum(pw.this.total_sessions),
+        total_duration=pw.reducers.sum(pw.this.total_duration),
+        focus_sum=pw.reducers.sum(pw.this.avg_focus_score * pw.this.total_sessions),
+        top_focus=top_k(pw.this.user_id, pw.this.avg_focus_score),
+        top_duration=top_k(pw.this.user_id, pw.this.total_duration),
+        user_avg_focus_sketch=quantile_sketch(pw.this.avg_focus_score),
+        user_avg_duration_sketch=quantile_sketch(
+            pw.this.total_duration / pw.this.total_sessions
+        )
+    ).with_columns(
+        mean_focus=pw.this.focus_sum / pw.this.total_sessions
+    ).without(pw.this.focus_sum)
+    
+    # Session type breakdown
+    type_stats = sessions.groupby(
+        sessions.user_id, 
+        sessions.session_type
+    ).reduce(
+        user_id=pw.this.user_id,
+        session_type=pw.this.session_type,
+        count=pw.reducers.count(),
+        avg_focus=pw.reducers.avg(pw.this.focus_score),
+        avg_duration=pw.reducers.avg(pw.this.duration)
+    )
+    
+    # Language statistics (for code sessions)
+    code_sessions = sessions.filter(pw.this.session_type == "code")
+    language_stats = code_sessions.groupby(
+        code_sessions.user_id,
+        code_sessions.language
+    ).reduce(
+        user_id=pw.this.user_id,
+        language=pw.this.language,
+        sessions=pw.reducers.count(),
+        avg_focus=pw.reducers.avg(pw.this.focus_score),
+        total_lines=pw.reducers.sum(pw.this.lines_of_code)
+    )
+    
+    # Daily rollups per user and session type
+    # Time-range queries merge these buckets instead of rescanning sessions
+    daily_rollups = sessions.with_columns(
+        day=pw.this.timestamp // SECONDS_PER_DAY
+    ).groupby(
+        pw.this.user_id,
+        pw.this.day,
+        pw.this.session_type
+    ).reduce(
+        user_id=pw.this.user_id,
+        day=pw.this.day,
+        session_type=pw.this.session_type,
+        sessions=pw.reducers.count(),
+        sum_focus=pw.reducers.sum(pw.this.focus_score),
+        sum_quality=pw.reducers.sum(pw.this.quality_score),
+        total_duration=pw.reducers.sum(pw.this.duration),
+        total_distractions=pw.reducers.sum(pw.this.distractions),
+        max_focus=pw.reducers.max(pw.this.focus_score),
+        min_focus=pw.reducers.min(pw.this.focus_score)
+    )
+    
+    logger.info("✅ Basic aggregations configured")
+    
+    # ============================
+    # DERIVED USER METRICS
+    # ============================
+    
+    # Productivity, burnout and pattern metrics are all row-wise functions of
+    # user_stats, so compute them in a single projection instead of joining
+    # user_stats back against three derived tables.
+    comprehensive_analytics = user_stats.select(
+        user_id=pw.this.user_id,
+        # Basic stats
+        total_sessions=pw.this.total_sessions,
+        avg_focus_score=pw.this.avg_focus_score,
+        avg_quality_score=pw.this.avg_quality_score,
+        total_duration=pw.this.total_duration,
+        total_distractions=pw.this.total_distractions,
+        # Productivity
+        productivity_level=pw.apply(
+            classify_productivity,
+            pw.this.avg_focus_score,
+            pw.this.total_distractions,
+            pw.this.total_sessions
+        ),
+        focus_consistency=pw.apply(
+            classify_consistency,
+            pw.this.max_focus,
+            pw.this.min_focus
+        ),
+        # Burnout
+        burnout_risk=pw.apply(
+            classify_burnout,
+            pw.this.total_sessions,
+            pw.this.avg_focus_score,
+            pw.this.total_duration
+        ),
+        avg_session_duration=pw.apply(
+            lambda total_dur, sessions: total_dur / sessions if sessions > 0 else 0,
+            pw.this.total_duration,
+            pw.this.total_sessions
+        ),
+        distraction_rate=pw.apply(
+            lambda dist, sessions: dist / sessions if sessions > 0 else 0,
+            pw.this.total_distractions,
+            pw.this.total_sessions
+        ),
+        # Patterns
+        pattern_type=pw.apply(
+            lambda focus, dist, sessions, max_f, min_f: classify_pattern(
+                classify_productivity(focus, dist, sessions),
+                classify_consistency(max_f, min_f)
+            ),
+            pw.this.avg_focus_score,
+            pw.this.total_distractions,
+            pw.this.total_sessions,
+            pw.this.max_focus,
+            pw.this.min_focus
+        ),
+        recommendation=pw.apply(
+            lambda focus, dist, sessions: recommend(
+                classify_productivity(focus, dist, sessions)
+            ),
+            pw.this.avg_focus_score,
+            pw.this.total_distractions,
+            pw.this.total_sessions
+        )
+    )
+    
+    # Per-topic views are plain projections of the fused table
+    productivity = comprehensive_analytics.select(
+        pw.this.user_id,
+        pw.this.total_sessions,
+        pw.this.avg_focus_score,
+        pw.this.productivity_level,
+        pw.this.focus_consistency
+    )
+    
+    burnout_analysis = comprehensive_analytics.select(
+        pw.this.user_id,
+        pw.this.burnout_risk,
+        pw.this.avg_session_duration,
+        pw.this.distraction_rate
+    )
+    
+    patterns = comprehensive_analytics.select(
+        pw.this.user_id,
+        pw.this.pattern_type,
+        pw.this.recommendation
+    )
+    
+    logger.info("✅ Comprehensive analytics configured")
+    
+    # ============================
+    # OUTPUT CONNECTORS
+    # ============================
+    
+    # Output 1: User Statistics
+    pw.io.jsonlines.write(
+        user_stats,
+        f"{output_dir}/user_stats.jsonl"
+    )
+    
+    # Output 2: Session Type Breakdown
+    pw.io.jsonlines.write(
+        type_stats,
+        f"{output_dir}/type_stats.jsonl"
+    )
+    
+    # Output 3: Language Statistics
+    pw.io.jsonlines.write(
+        language_stats,
+        f"{output_dir}/language_stats.jsonl"
+    )
+    
+    # Output 4: Productivity Analysis
+    pw.io.jsonlines.write(
+        productivity,
+        f"{output_dir}/productivity.jsonl"
+    )
+    
+    # Output 5: Burnout Analysis
+    pw.io.jsonlines.write(
+        burnout_analysis,
+        f"{output_dir}/burnout.jsonl"
+    )
+    
+    # Output 6: Patterns
+    pw.io.jsonlines.write(
+        patterns,
+        f"{output_dir}/patterns.jsonl"
+    )
+    
+    # Output 7: Comprehensive Analytics
+    pw.io.jsonlines.write(
+        comprehensive_analytics,
+        f"{output_dir}/comprehensive.jsonl"
+    )
+    
+    # Output 8: Daily Rollups
+    pw.io.jsonlines.write(
+        daily_rollups,
+        f"{output_dir}/daily_rollups.jsonl"
+    )
+    
+    # Output 9: Quantile Sketches
+    pw.io.jsonlines.write(
+        user_distributions,
+        f"{output_dir}/user_distributions.jsonl"
+    )
+    pw.io.jsonlines.write(
+        session_distribution,
+        f"{output_dir}/session_distribution.jsonl"
+    )
+    
+    # Output 10: Global Stats and Leaderboards
+    pw.io.jsonlines.write(
+        global_stats,
+        f"{output_dir}/global_stats.jsonl"
+    )
+    
+    # Output 11: Columnar history (Parquet, partitioned by date and user hash)
+    if history:
+        for name, table, date_of in [
+            ("sessions", sessions, session_date),
+            ("comprehensive", comprehensive_analytics, processing_date),
+        ]:
+            writer = HistoryWriter(name, date_of)
+            pw.io.subscribe(
+                table,
+                on_change=writer.on_change,
+                on_time_end=writer.on_time_end,
+                on_end=writer.on_end
+            )
+        logger.info(f"🗄️ History store: {HISTORY_DIR}")
+    
+    logger.info("✅ Output connectors configured")
+    logger.info(f"📤 Writing to: {output_dir}")
+    logger.info("=" * 60)
+    logger.info("🎯 Pathway pipeline ready for real-time processing")
+    logger.info("=" * 60)
+    
+    return {
+        "sessions": sessions,
+        "user_stats": user_stats,
+        "type_stats": type_stats,
+        "language_stats": language_stats,
+        "comprehensive": comprehensive_analytics,
+        "daily_rollups": daily_rollups,
+        "user_distributions": user_distributions,
+        "session_distribution": session_distribution,
+        "global_stats": global_stats
+    }
+
+# ============================
+# RUN
+# ============================
+
+def get_persistence_config():
+    """
+    Build the Pathway persistence config
+    Snapshots operator state and input offsets under PERSISTENCE_DIR so a
+    restart resumes from the last checkpoint instead of rereading INPUT_DIR
+    """
+    if not PERSISTENCE_ENABLED:
+        return None
+    
+    backend = pw.persistence.Backend.filesystem(PERSISTENCE_DIR)
+    if hasattr(pw.persistence.Config, "simple_config"):
+        return pw.persistence.Config.simple_config(
+            backend,
+            snapshot_interval_ms=SNAPSHOT_INTERVAL_MS
+        )
+    return pw.persistence.Config(
+        backend,
+        snapshot_interval_ms=SNAPSHOT_INTERVAL_MS
+    )
+
+def attach_output_log(outputs, log_dir: str = OUTPUT_LOG_DIR):
+    """
+    Append the mirrored outputs to their logs in log_dir, after compacting
+    them (or clearing them when the run does not resume from a snapshot)
+    """
+    kept = prepare(log_dir, resume=PERSISTENCE_ENABLED)
+    for name in MIRRORED_OUTPUTS:
+        writer = OutputLogWriter(log_path(log_dir, name))
+        pw.io.subscribe(
+            outputs[name],
+            on_change=writer.on_change,
+            on_time_end=writer.on_time_end,
+            on_end=writer.on_end
+        )
+    logger.info(f"📒 Output log: {log_dir} ({kept} rows kept)")
+
+def run():
+    """Build the pipeline and run it until the input is exhausted (forever when streaming)"""
+    attach_output_log(create_pathway_pipeline())
+    pw.run(persistence_config=get_persistence_config())
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger.info(f"🧵 Workers: {os.getenv('PATHWAY_THREADS', '1')} thread(s) x {os.getenv('PATHWAY_PROCESSES', '1')} process(es)")
+    run()
@@ -7,10 +7,158 @@ Monitors flow scores and triggers personalized interventions
 
 import pathway as pw
 import os
+import json
 import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from metrics import LatencyHistogram
+from intervention_gate import InterventionWriter, create_gate, event_seconds, json_default, parse_event_time
+from intervention_rules import RuleEngine
+from intervention_activity import ActivityTracker
+from intervention_delivery import create_delivery_hub
+from event_ingest import read_http_events
 
 logger = logging.getLogger(__name__)
 
+# ============================
+# CONFIGURATION
+# ============================
+
+# 'http' serves batched event ingestion, 'csv' polls INPUT_DIR for event files
+EVENT_SOURCE = os.getenv("INTERVENTION_EVENT_SOURCE", "http")
+EVENT_HOST = os.getenv("INTERVENTION_HOST", "0.0.0.0")
+EVENT_PORT = int(os.getenv("INTERVENTION_PORT", "8002"))
+EVENT_MAX_BATCH = int(os.getenv("INTERVENTION_MAX_BATCH", "10000"))
+EVENT_AUTOCOMMIT_MS = int(os.getenv("INTERVENTION_AUTOCOMMIT_MS", "50"))
+INPUT_DIR = os.getenv("INTERVENTION_INPUT_DIR", "/app/input_stream")
+OUTPUT_DIR = os.getenv("INTERVENTION_OUTPUT_DIR", "/app/interventions")
+# Webhooks that receive every delivered intervention, more can be registered at runtime
+WEBHOOKS = [url.strip() for url in os.getenv("INTERVENTION_WEBHOOKS", "").split(",") if url.strip()]
+RULES_FILE = os.getenv("INTERVENTION_RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intervention_rules.json"))
+RULES_RELOAD_SECONDS = float(os.getenv("INTERVENTION_RULES_RELOAD_SECONDS", "5"))
+# Size of the event count buckets rule windows are built from; rules slide by this much
+WINDOW_HOP_SECONDS = int(os.getenv("INTERVENTION_WINDOW_HOP_SECONDS", "5"))
+# No events for this long fires 'inactivity' and drops the user's activity state
+INACTIVITY_SECONDS = float(os.getenv("INTERVENTION_INACTIVITY_SECONDS", "1800"))
+# A gap this long ends a continuous work stretch
+BREAK_SECONDS = float(os.getenv("INTERVENTION_BREAK_SECONDS", "300"))
+CONTINUOUS_WORK_SECONDS = float(os.getenv("INTERVENTION_CONTINUOUS_WORK_SECONDS", "5400"))
+DELAY_REPORT_SECONDS = float(os.getenv("INTERVENTION_DELAY_REPORT_SECONDS", "60"))
+# Events may arrive this late (event time behind the newest event seen) and
+# still update their windows; after that a window's state is released
+ALLOWED_LATENESS_SECONDS = int(os.getenv("INTERVENTION_ALLOWED_LATENESS_SECONDS", "30"))
+# Optional buffering of window results to absorb reordering, at the cost of firing later
+WINDOW_DELAY_SECONDS = int(os.getenv("INTERVENTION_WINDOW_DELAY_SECONDS", "0"))
+
+# ============================
+# EVENT SCHEMA
+# ============================
+
+class EventSchema(pw.Schema):
+    user_id: str
+    space_type: str
+    event_type: str
+    value: float
+    timestamp: str
+
+# ============================
+# HELPERS
+# ============================
+
+def parse_timestamp(timestamp: str) -> Optional[datetime]:
+    """ISO 8601 event timestamp to an aware UTC datetime, naive timestamps are UTC"""
+    return parse_event_time(timestamp)
+
+def parse_events(raw_events: pw.Table) -> pw.Table:
+    """
+    Events with timestamp parsed once into pw.DateTimeUtc; rows with an
+    unparseable timestamp (e.g. a bad line in a CSV file) are dropped
+    rather than stopping the pipeline
+    """
+    parsed = raw_events.with_columns(
+        timestamp=pw.apply_with_type(parse_timestamp, Optional[pw.DateTimeUtc], pw.this.timestamp)
+    )
+    return parsed.filter(pw.this.timestamp.is_not_none()).with_columns(
+        timestamp=pw.unwrap(pw.this.timestamp)
+    )
+
+def window_behavior() -> pw.temporal.CommonBehavior:
+    """
+    Emit window updates immediately (unless WINDOW_DELAY_SECONDS is set) and
+    ignore events arriving more than ALLOWED_LATENESS_SECONDS after their
+    window ended, so closed windows do not keep state
+    """
+    return pw.temporal.common_behavior(
+        delay=pw.Duration(seconds=WINDOW_DELAY_SECONDS) if WINDOW_DELAY_SECONDS else None,
+        cutoff=pw.Duration(seconds=ALLOWED_LATENESS_SECONDS),
+        keep_results=True
+    )
+
+def count_buckets(events: pw.Table, hop_seconds: int = WINDOW_HOP_SECONDS, bounded: bool = True) -> pw.Table:
+    """
+    Count every event once into per-(user, event_type) buckets of
+    hop_seconds; all rules are evaluated over these shared counts
+
+    Bucket counts are updated as events arrive, so a rule can fire on the
+    event that crosses its threshold rather than when a window closes.
+    bounded=False keeps late events, for replays of unordered logs.
+    """
+    keyed = events.with_columns(
+        bucket_key=pw.this.user_id + "|" + pw.this.event_type
+    )
+    return keyed.windowby(
+        keyed.timestamp,
+        window=pw.temporal.tumbling(duration=pw.Duration(seconds=hop_seconds)),
+        behavior=window_behavior() if bounded else None,
+        instance=keyed.bucket_key
+    ).reduce(
+        user_id=pw.reducers.any(pw.this.user_id),
+        event_type=pw.reducers.any(pw.this.event_type),
+        bucket_start=pw.this._pw_window_start,
+        event_count=pw.reducers.count(),
+        # Time of the latest event, the one a firing is attributed to
+        last_event=pw.reducers.max(pw.this.timestamp)
+    )
+
+class NotificationDelay:
+    """
+    Wall-clock delay between the event that triggered an intervention
+    and its delivery, reported periodically
+    """
+
+    def __init__(self, output_file: str, report_seconds: float = DELAY_REPORT_SECONDS):
+        self.output_file = output_file
+        self.report_seconds = report_seconds
+        self.histograms = {}
+        self._last_report = time.monotonic()
+
+    def observe(self, intervention):
+        """Record a delivered intervention"""
+        histogram = self.histograms.setdefault(intervention["intervention_type"], LatencyHistogram())
+        histogram.observe(max(0.0, (_wall_clock() - event_seconds(intervention["timestamp"])) * 1000))
+
+    def due(self) -> bool:
+        return _monotonic() - self._last_report >= self.report_seconds
+
+    def report(self, counters=None):
+        """Log the delay per intervention type and save it, with counters, to output_file"""
+        self._last_report = _monotonic()
+        delay = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        for name, stats in delay.items():
+            logger.info(f"⏱️ {name}: {stats['count']} fired, delay p50 {stats['p50_ms']}ms p99 {stats['p99_ms']}ms")
+        tmp = f"{self.output_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"delay": delay, "counters": counters or {}}, f, default=json_default)
+        os.replace(tmp, self.output_file)
+
+def _wall_clock() -> float:
+    return time.time()
+
+def _monotonic() -> float:
+    return time.monotonic()
+
 # ============================
 # INTERVENTION RULES ENGINE
 # ============================
@@ -21,140 +169,102 @@ def create_intervention_pipeline():
     Automatically triggers when patterns are detected
     """
     
-    INPUT_DIR = "/app/input_stream"
-    OUTPUT_DIR = "/app/interventions"
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     logger.info("🎯 Initializing Pathway Intervention Engine...")
     
-    # Schema for events
-    class EventSchema(pw.Schema):
-        user_id: str
-        space_type: str
-        event_type: str
-        value: float
-        timestamp: str
-    
-    # INPUT: Stream events
-    events = pw.io.csv.read(
-        INPUT_DIR,
-        schema=EventSchema,
-        mode="streaming",
-        autocommit_duration_ms=100
-    )
+    # INPUT: Stream events, timestamps typed from here on
+    ingest = None
+    if EVENT_SOURCE == "http":
+        raw_events, ingest = read_http_events(
+            EventSchema,
+            EVENT_HOST,
+            EVENT_PORT,
+            max_batch=EVENT_MAX_BATCH,
+            autocommit_duration_ms=EVENT_AUTOCOMMIT_MS
+        )
+    else:
+        raw_events = pw.io.csv.read(
+            INPUT_DIR,
+            schema=EventSchema,
+            mode="streaming",
+            autocommit_duration_ms=100
+        )
+    events = parse_events(raw_events)
     
     # ============================
     # PATTERN DETECTION
     # ============================
     
-    # Pattern 1: Rapid context switching (multiple tab switches in short time)
-    tab_switches = events.filter(pw.this.event_type == "tab_switch")
-    
-    # Count switches per user in 2-minute window
-    switch_counts = tab_switches.windowby(
-        tab_switches.timestamp,
-        window=pw.temporal.tumbling(pw.Duration("2m")),
-        instance=tab_switches.user_id
-    ).reduce(
-        user_id=pw.this._pw_instance,
-        switch_count=pw.reducers.count(),
-        window_end=pw.this._pw_window_end
-    )
-    
-    # Trigger intervention if > 10 switches in 2 minutes
-    context_switch_interventions = switch_counts.filter(
-        pw.this.switch_count > 10
-    ).select(
-        user_id=pw.this.user_id,
-        intervention_type=pw.const("reduce_context_switching"),
-        severity=pw.const("medium"),
-        message=pw.const("You've switched contexts 10+ times. Try focusing on one task."),
-        data=pw.apply(lambda c: {"switch_count": c}, pw.this.switch_count),
-        timestamp=pw.this.window_end
-    )
-    
-    # Pattern 2: Extended blur (user away from app for > 5 minutes)
-    blur_events = events.filter(pw.this.event_type == "blur")
-    
-    # Detect long absences
-    long_blur_interventions = blur_events.select(
-        user_id=pw.this.user_id,
-        intervention_type=pw.const("return_from_break"),
-        severity=pw.const("low"),
-        message=pw.const("Welcome back! Ready to resume your flow?"),
-        timestamp=pw.this.timestamp
-    )
-    
-    # Pattern 3: No activity for extended period (burnout risk)
-    # Group all events by user
-    user_activity = events.groupby(events.user_id).reduce(
-        user_id=pw.this.user_id,
-        last_activity=pw.reducers.max(pw.this.timestamp),
-        total_events=pw.reducers.count()
-    )
-    
-    # Pattern 4: High keystroke velocity (potential stress)
-    keystrokes = events.filter(pw.this.event_type == "keystroke")
-    
-    keystroke_velocity = keystrokes.windowby(
-        keystrokes.timestamp,
-        window=pw.temporal.tumbling(pw.Duration("1m")),
-        instance=keystrokes.user_id
-    ).reduce(
-        user_id=pw.this._pw_instance,
-        keystrokes_per_minute=pw.reducers.count(),
-        window_end=pw.this._pw_window_end
-    )
-    
-    # Trigger if > 200 keystrokes per minute (very high)
-    high_velocity_interventions = keystroke_velocity.filter(
-        pw.this.keystrokes_per_minute > 200
-    ).select(
-        user_id=pw.this.user_id,
-        intervention_type=pw.const("slow_down"),
-        severity=pw.const("high"),
-        message=pw.const("You're typing very fast. Take a breath and slow down."),
-        data=pw.apply(lambda k: {"kpm": k}, pw.this.keystrokes_per_minute),
-        timestamp=pw.this.window_end
-    )
+    # Single pass: each event lands in exactly one bucket, and every rule
+    # in RULES_FILE reads the same bucket counts
+    # Inactivity and continuous work are also read from the buckets, by the
+    # ActivityTracker below, instead of a per-user groupby that never forgets
+    buckets = count_buckets(events)
     
     # ============================
-    # COMBINE ALL INTERVENTIONS
+    # OUTPUT
     # ============================
     
-    # Union all intervention streams
-    all_interventions = context_switch_interventions.concat(
-        long_blur_interventions
-    ).concat(
-        high_velocity_interventions
+    # Rule firings pass the per-user cooldown/escalation gate, only
+    # delivered interventions are written and pushed to subscribers, which
+    # filter by type server-side
+    delay = NotificationDelay(f"{OUTPUT_DIR}/notification_delay.json")
+    writer = InterventionWriter(f"{OUTPUT_DIR}/interventions.jsonl")
+    delivery = create_delivery_hub(EVENT_HOST)
+    delivery.start(webhooks=WEBHOOKS)
+    
+    gate = create_gate(on_emit=[writer.write, delivery.publish, delay.observe])
+    rule_engine = RuleEngine(RULES_FILE, WINDOW_HOP_SECONDS, on_fire=[gate.submit], reload_seconds=RULES_RELOAD_SECONDS)
+    activity = ActivityTracker(
+        inactivity_seconds=INACTIVITY_SECONDS,
+        break_seconds=BREAK_SECONDS,
+        continuous_work_seconds=CONTINUOUS_WORK_SECONDS,
+        on_fire=[gate.submit]
     )
     
-    # ============================
-    # OUTPUT
-    # ============================
+    def on_bucket_change(key, row, time, is_addition):
+        rule_engine.on_bucket_change(key, row, time, is_addition)
+        activity.on_bucket_change(key, row, time, is_addition)
     
-    # Write interventions to output
-    pw.io.jsonlines.write(
-        all_interventions,
-        f"{OUTPUT_DIR}/interventions.jsonl"
-    )
+    def counters():
+        return {
+            "rules": rule_engine.stats(),
+            "activity": activity.stats(),
+            "gate": gate.stats(),
+            "delivery": delivery.stats(),
+            "ingest": ingest.stats() if ingest else None
+        }
     
-    # Also write by type for easier filtering
-    pw.io.jsonlines.write(
-        context_switch_interventions,
-        f"{OUTPUT_DIR}/context_switch_interventions.jsonl"
-    )
+    def on_time_end(time):
+        writer.flush()
+        rule_engine.maybe_reload()
+        if delay.due():
+            delay.report(counters())
+            logger.info(f"🚦 {counters()}")
     
-    pw.io.jsonlines.write(
-        high_velocity_interventions,
-        f"{OUTPUT_DIR}/high_velocity_interventions.jsonl"
+    def on_end():
+        writer.close()
+        delivery.drain()
+        delay.report(counters())
+    
+    pw.io.subscribe(
+        buckets,
+        on_change=on_bucket_change,
+        on_time_end=on_time_end,
+        on_end=on_end
     )
     
     logger.info("✅ Intervention engine configured")
+    logger.info(f"📜 Rules: {RULES_FILE}")
     logger.info(f"📤 Interventions output: {OUTPUT_DIR}")
     
-    return all_interventions
+    return buckets
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
     create_intervention_pipeline()
     pw.run()
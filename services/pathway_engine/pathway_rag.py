@@ -6,26 +6,105 @@ This demonstrates Pathway's document indexing capabilities
 """
 
 import pathway as pw
-from pathway.xpacks.llm import embedders, splitters, parsers
+from pathway.xpacks.llm import splitters
 import os
+import re
 import logging
+import unicodedata
 
 logger = logging.getLogger(__name__)
 
+# ============================
+# CONFIGURATION
+# ============================
+
+RAG_INPUT_DIR = os.getenv("RAG_INPUT_DIR", "/app/sessions_stream")
+RAG_OUTPUT_DIR = os.getenv("RAG_OUTPUT_DIR", "/app/rag_index")
+# Chunk size bounds in tokens; short sessions stay one chunk
+RAG_CHUNK_MIN_TOKENS = int(os.getenv("RAG_CHUNK_MIN_TOKENS", "50"))
+RAG_CHUNK_MAX_TOKENS = int(os.getenv("RAG_CHUNK_MAX_TOKENS", "300"))
+RAG_TOKEN_ENCODING = os.getenv("RAG_TOKEN_ENCODING", "cl100k_base")
+
+# ============================
+# HELPERS
+# ============================
+
+def number_chunks(chunks) -> list:
+    """Splitter output (text, metadata) pairs as (chunk index, text) pairs"""
+    return [(index, chunk[0]) for index, chunk in enumerate(chunks)]
+
+
+class LocalTokenizer:
+    """
+    Offline stand-in for a tiktoken encoding
+    Pieces of at most four characters with their leading whitespace; BPE
+    tokens are usually longer, so counts err high and chunks stay within
+    max_tokens
+    """
+
+    PIECE = re.compile(r"\s*\S{1,4}|\s+")
+
+    def encode_ordinary(self, text: str) -> list:
+        return self.PIECE.findall(text)
+
+    def decode(self, tokens: list) -> str:
+        return "".join(tokens)
+
+
+def load_tokenizer(encoding_name: str = RAG_TOKEN_ENCODING):
+    """The tiktoken encoding, or LocalTokenizer when it cannot be loaded"""
+    try:
+        import tiktoken
+        # Downloaded on first use unless cached in TIKTOKEN_CACHE_DIR
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"⚠️ Token encoding {encoding_name} unavailable ({e}), approximating token counts")
+        return LocalTokenizer()
+
+
+class SessionSplitter(splitters.TokenCountSplitter):
+    """TokenCountSplitter over a tokenizer loaded once, so it also works offline"""
+
+    def __init__(self, min_tokens: int, max_tokens: int, tokenizer=None):
+        super().__init__(min_tokens=min_tokens, max_tokens=max_tokens)
+        self.tokenizer = tokenizer or load_tokenizer()
+
+    def chunk(self, text: str, metadata: dict = {}, **kwargs) -> list:
+        """Same chunking as TokenCountSplitter.chunk: up to max_tokens, cut after punctuation"""
+        min_tokens = kwargs.get("min_tokens", self.kwargs["min_tokens"])
+        max_tokens = kwargs.get("max_tokens", self.kwargs["max_tokens"])
+        text = unicodedata.normalize("NFKC", text)
+        tokens = self.tokenizer.encode_ordinary(text)
+
+        output = []
+        i = 0
+        while i < len(tokens):
+            chunk = self.tokenizer.decode(tokens[i:i + max_tokens])
+            last_punctuation = max(chunk.rfind(p) for p in self.PUNCTUATION)
+            if last_punctuation > self.CHARS_PER_TOKEN * min_tokens:
+                chunk = chunk[:last_punctuation + 1]
+            i += len(self.tokenizer.encode_ordinary(chunk))
+            output.append((chunk, metadata))
+        return output
+
 # ============================
 # PATHWAY RAG PIPELINE
 # ============================
 
-def create_rag_pipeline():
+def create_rag_pipeline(input_dir: str = RAG_INPUT_DIR, output_dir: str = RAG_OUTPUT_DIR):
     """
     Create a real-time RAG index for user sessions
     Automatically updates when new session data arrives
+    
+    A session is identified by user_id and timestamp. Resubmitting it
+    replaces the earlier version, so the index holds one version of every
+    session, split into size-bounded chunks. The index file is Pathway's
+    update stream: each change appends only the chunks added (diff 1) and
+    retracted (diff -1), which JsonlFollower can apply incrementally.
     """
     
-    INPUT_DIR = "/app/sessions_stream"
-    OUTPUT_DIR = "/app/rag_index"
-    os.makedirs(INPUT_DIR, exist_ok=True)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(input_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
     
     logger.info("🧠 Initializing Pathway RAG pipeline...")
     
@@ -40,13 +119,24 @@ def create_rag_pipeline():
     
     # INPUT: Stream session documents
     sessions = pw.io.csv.read(
-        INPUT_DIR,
+        input_dir,
         schema=SessionSchema,
         mode="streaming",
         autocommit_duration_ms=1000
     )
     
-    logger.info(f"📂 RAG monitoring: {INPUT_DIR}")
+    logger.info(f"📂 RAG monitoring: {input_dir}")
+    
+    # Upsert: the latest submission of a session wins. An identical
+    # resubmission produces no output at all.
+    sessions = sessions.groupby(pw.this.user_id, pw.this.timestamp).reduce(
+        user_id=pw.this.user_id,
+        timestamp=pw.this.timestamp,
+        session_type=pw.reducers.latest(pw.this.session_type),
+        content=pw.reducers.latest(pw.this.content),
+        duration=pw.reducers.latest(pw.this.duration),
+        flow_score=pw.reducers.latest(pw.this.flow_score)
+    )
     
     # Add metadata for better retrieval
     sessions = sessions.with_columns(
@@ -66,21 +156,34 @@ def create_rag_pipeline():
     )
     
     # Text chunking for better retrieval
-    # Split long sessions into smaller chunks
-    chunked_sessions = sessions.select(
+    # Split long sessions into chunks of at most RAG_CHUNK_MAX_TOKENS
+    splitter = SessionSplitter(
+        min_tokens=RAG_CHUNK_MIN_TOKENS,
+        max_tokens=RAG_CHUNK_MAX_TOKENS
+    )
+    chunks = sessions.select(
+        doc_id=pw.this.doc_id,
+        metadata=pw.this.metadata,
+        chunk=pw.apply_with_type(number_chunks, list, splitter(pw.this.content))
+    ).flatten(pw.this.chunk)
+    
+    # Chunk ids are stable across versions, so downstream retrieval can
+    # replace a session's chunks by id
+    chunked_sessions = chunks.select(
         doc_id=pw.this.doc_id,
-        text=pw.this.content,
+        chunk_id=pw.this.doc_id + "#" + pw.apply_with_type(lambda c: str(c[0]), str, pw.this.chunk),
+        text=pw.apply_with_type(lambda c: c[1], str, pw.this.chunk),
         metadata=pw.this.metadata
     )
     
-    # Output: Write indexed documents
+    # Output: Write indexed chunks as an update stream
     pw.io.jsonlines.write(
         chunked_sessions,
-        f"{OUTPUT_DIR}/session_index.jsonl"
+        f"{output_dir}/session_index.jsonl"
     )
     
     logger.info("✅ RAG pipeline configured")
-    logger.info("📤 Index output: {OUTPUT_DIR}/session_index.jsonl")
+    logger.info(f"📤 Index output: {output_dir}/session_index.jsonl")
     
     return chunked_sessions
 
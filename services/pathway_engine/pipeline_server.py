@@ -0,0 +1,118 @@
+"""
+FlowState Pathway Pipeline Server
+The single pipeline process behind one or more stateless API workers
+
+Runs the analytics dataflow and owns session ingestion (dedup, admission
+control, CSV writes). API workers started with PIPELINE_MODE=external
+forward ingestion here over a Unix socket and serve reads from the
+pipeline's output log (see output_log.py), so no state is duplicated
+between workers.
+
+Usage:
+    python pipeline_server.py
+    PIPELINE_MODE=external API_WORKERS=4 python main.py
+"""
+
+import asyncio
+import logging
+import os
+import threading
+
+import pathway as pw
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+from ingest import PIPELINE_SOCKET, SessionEvent, create_ingestor
+from metrics import PipelineMetrics, directory_usage, process_stats, sample_profile, sink_sizes
+from pathway_analytics import (
+    INPUT_DIR,
+    OUTPUT_DIR,
+    OUTPUT_LOG_DIR,
+    PERSISTENCE_DIR,
+    PERSISTENCE_ENABLED,
+    attach_output_log,
+    create_pathway_pipeline,
+    get_persistence_config,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+ingestor = create_ingestor(INPUT_DIR, PERSISTENCE_DIR if PERSISTENCE_ENABLED else None, OUTPUT_LOG_DIR)
+pipeline_metrics = PipelineMetrics()
+
+# ============================
+# INTERNAL API
+# ============================
+
+app = FastAPI(title="FlowState Pathway Pipeline", version="2.0.0")
+
+@app.post("/ingest/session")
+def ingest_session(session: SessionEvent):
+    """Ingest a session forwarded by an API worker"""
+    return ingestor.ingest(session)
+
+@app.get("/ingest/stats")
+def get_ingest_stats():
+    """Ingestion queue depth, pipeline progress and rejection counters"""
+    return ingestor.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Pipeline row counts, commit latency, backlog, sink sizes and RSS"""
+    return {
+        **pipeline_metrics.snapshot(),
+        "input_backlog": {
+            "input_dir": directory_usage(INPUT_DIR, ".csv"),
+            "unprocessed_sessions": ingestor.admission.stats()["queue_depth"]
+        },
+        "sinks": sink_sizes(OUTPUT_DIR),
+        "process": process_stats()
+    }
+
+@app.get("/debug/profile")
+def get_profile(seconds: float = 5.0, interval_ms: float = 10.0):
+    """Sample where the pipeline process spends CPU time for `seconds`"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or interval_ms <= 0:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}] and interval_ms positive")
+    return sample_profile(seconds, interval_ms / 1000)
+
+@app.on_event("startup")
+async def start_dedup_snapshots():
+    if ingestor.dedup_state_file:
+        asyncio.create_task(ingestor.snapshot_state())
+
+@app.on_event("shutdown")
+def save_dedup_state():
+    ingestor.save_state()
+
+# ============================
+# RUN PATHWAY
+# ============================
+
+def run_pathway():
+    """Run the pipeline, feeding its progress back into admission control"""
+    try:
+        logger.info("🚀 Starting Pathway streaming pipeline...")
+        outputs = create_pathway_pipeline()
+        # API workers read the output log, which survives restarts
+        attach_output_log(outputs)
+        pw.io.subscribe(outputs["global_stats"], on_change=ingestor.admission.on_global_stats_change)
+        pipeline_metrics.attach(outputs)
+        pw.run(persistence_config=get_persistence_config())
+    except Exception as e:
+        logger.error(f"❌ Pathway error: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    pathway_thread = threading.Thread(target=run_pathway, name="pathway-pipeline", daemon=True)
+    pathway_thread.start()
+    logger.info("✅ Pathway thread started")
+    logger.info(f"🔌 Serving ingestion on {PIPELINE_SOCKET} (pid {os.getpid()})")
+    uvicorn.run(app, uds=PIPELINE_SOCKET, log_level="info")
@@ -0,0 +1,150 @@
+"""
+Daily rollup store for time-range analytics
+
+Holds the per-user daily buckets emitted by the Pathway pipeline so that
+7d/30d/90d queries merge a bounded number of pre-aggregated rows instead of
+rescanning raw sessions.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SECONDS_PER_DAY = 86400
+
+# Supported time ranges (in days)
+TIME_RANGES = {
+    "7d": 7,
+    "30d": 30,
+    "90d": 90,
+}
+
+MAX_RANGE_DAYS = max(TIME_RANGES.values())
+
+
+def current_day() -> int:
+    """Current UTC day number (days since the unix epoch)"""
+    return int(time.time()) // SECONDS_PER_DAY
+
+
+class DailyRollupStore:
+    """
+    Per-user daily buckets kept in sync with the pipeline's rollup table
+
+    Buckets are indexed as user_id -> day -> session_type -> row. Days older
+    than MAX_RANGE_DAYS are dropped, so memory per user stays bounded.
+    """
+
+    def __init__(self, max_days: int = MAX_RANGE_DAYS):
+        self.max_days = max_days
+        self._buckets: Dict[str, Dict[int, Dict[str, Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the daily rollup table"""
+        user_id = row["user_id"]
+        day = row["day"]
+        session_type = row["session_type"]
+
+        if is_addition and day <= current_day() - self.max_days:
+            return  # Outside the retention window, never stored
+
+        with self._lock:
+            if is_addition:
+                days = self._buckets.setdefault(user_id, {})
+                days.setdefault(day, {})[session_type] = row
+                self._prune(days)
+            else:
+                days = self._buckets.get(user_id, {})
+                # Only drop the bucket if it has not already been replaced
+                types = days.get(day)
+                if types and types.get(session_type) == row:
+                    del types[session_type]
+                    if not types:
+                        del days[day]
+            if not days:
+                self._buckets.pop(user_id, None)
+
+    def _prune(self, days: Dict[int, Dict[str, Dict[str, Any]]]):
+        cutoff = current_day() - self.max_days
+        for day in [d for d in days if d <= cutoff]:
+            del days[day]
+
+    def query(
+        self,
+        user_id: str,
+        time_range: str = "7d",
+        session_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Merge the user's buckets covering the requested range"""
+        if time_range not in TIME_RANGES:
+            raise ValueError(
+                f"Unsupported time_range '{time_range}'. "
+                f"Use one of: {', '.join(TIME_RANGES)}"
+            )
+
+        first_day = current_day() - TIME_RANGES[time_range] + 1
+
+        with self._lock:
+            days = self._buckets.get(user_id, {})
+            selected = [
+                (day, dict(types)) for day, types in days.items()
+                if day >= first_day
+            ]
+
+        total_sessions = 0
+        sum_focus = 0
+        sum_quality = 0
+        total_duration = 0
+        total_distractions = 0
+        max_focus = None
+        min_focus = None
+        daily = []
+
+        for day, types in sorted(selected):
+            day_sessions = 0
+            day_focus = 0
+            day_duration = 0
+            for name, bucket in types.items():
+                if session_type is not None and name != session_type:
+                    continue
+                day_sessions += bucket["sessions"]
+                day_focus += bucket["sum_focus"]
+                day_duration += bucket["total_duration"]
+                sum_quality += bucket["sum_quality"]
+                total_distractions += bucket["total_distractions"]
+                max_focus = bucket["max_focus"] if max_focus is None else max(max_focus, bucket["max_focus"])
+                min_focus = bucket["min_focus"] if min_focus is None else min(min_focus, bucket["min_focus"])
+
+            if day_sessions == 0:
+                continue
+
+            total_sessions += day_sessions
+            sum_focus += day_focus
+            total_duration += day_duration
+            daily.append({
+                "date": time.strftime("%Y-%m-%d", time.gmtime(day * SECONDS_PER_DAY)),
+                "sessions": day_sessions,
+                "avg_focus": round(day_focus / day_sessions, 2),
+                "total_duration": day_duration
+            })
+
+        return {
+            "user_id": user_id,
+            "time_range": time_range,
+            "session_type": session_type,
+            "has_data": total_sessions > 0,
+            "buckets_merged": len(selected),
+            "overview": {
+                "total_sessions": total_sessions,
+                "avg_focus_score": round(sum_focus / total_sessions, 2) if total_sessions else 0,
+                "avg_quality_score": round(sum_quality / total_sessions, 2) if total_sessions else 0,
+                "total_duration": total_duration,
+                "total_distractions": total_distractions,
+                "avg_session_duration": round(total_duration / total_sessions, 2) if total_sessions else 0,
+                "distraction_rate": round(total_distractions / total_sessions, 2) if total_sessions else 0,
+                "max_focus": max_focus,
+                "min_focus": min_focus
+            },
+            "daily": daily
+        }
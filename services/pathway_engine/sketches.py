@@ -0,0 +1,230 @@
+"""
+Mergeable quantile sketches for focus and duration distributions
+
+QuantileSketch is a DDSketch-style log-bucketed histogram: quantiles carry a
+bounded relative error, two sketches merge by adding bucket counts, and the
+number of buckets per sketch is capped, so memory per key stays bounded.
+
+Leaderboard is the retractable state behind the top-K leaderboards.
+"""
+
+import heapq
+import json
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class QuantileSketch:
+    """Log-bucketed histogram with relative-accuracy quantiles"""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.zero_count = 0
+        self.buckets: Dict[int, int] = {}
+        # Once buckets are collapsed, every lower index lands in this bucket
+        self.min_index: Optional[int] = None
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def _index(self, value: float) -> int:
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index: int) -> float:
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def _key(self, index: int) -> int:
+        """Bucket an index is counted in, after any collapsing"""
+        return index if self.min_index is None or index > self.min_index else self.min_index
+
+    def add(self, value: float, count: int = 1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = self._key(self._index(value))
+            self.buckets[index] = self.buckets.get(index, 0) + count
+            self._collapse()
+
+    def merge(self, other: "QuantileSketch"):
+        self.zero_count += other.zero_count
+        if other.min_index is not None:
+            self._fold(other.min_index)
+        for index, count in other.buckets.items():
+            index = self._key(index)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self._collapse()
+
+    def subtract(self, other: "QuantileSketch"):
+        """
+        Remove another sketch's counts (used to retract rows)
+
+        Counts are taken from the bucket they were folded into, so retracting
+        works after a collapse; a bucket never goes below zero.
+        """
+        self.zero_count = max(0, self.zero_count - other.zero_count)
+        for index, count in other.buckets.items():
+            index = self._key(index)
+            remaining = self.buckets.get(index, 0) - count
+            if remaining > 0:
+                self.buckets[index] = remaining
+            else:
+                self.buckets.pop(index, None)
+
+    def _fold(self, floor: int):
+        """Move every bucket below floor into floor"""
+        if self.min_index is not None and floor <= self.min_index:
+            return
+        self.min_index = floor
+        folded = sum(self.buckets.pop(index) for index in [i for i in self.buckets if i < floor])
+        if folded:
+            self.buckets[floor] = self.buckets.get(floor, 0) + folded
+
+    def _collapse(self):
+        # Fold the lowest buckets together once the cap is exceeded
+        while len(self.buckets) > self.max_buckets:
+            self._fold(sorted(self.buckets)[1])
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q (0-1), None if empty"""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def rank(self, value: float) -> Optional[float]:
+        """Share of recorded values at or below value (0-1), None if empty"""
+        total = self.count
+        if total == 0:
+            return None
+        if value <= 0:
+            return self.zero_count / total
+        limit = self._index(value)
+        below = self.zero_count + sum(
+            count for index, count in self.buckets.items() if index <= limit
+        )
+        return below / total
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "z": self.zero_count,
+            "m": self.min_index,
+            "b": {str(index): count for index, count in self.buckets.items()}
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "QuantileSketch":
+        raw = json.loads(data)
+        sketch = cls(relative_accuracy=raw["a"])
+        sketch.zero_count = raw["z"]
+        sketch.min_index = raw.get("m")
+        sketch.buckets = {int(index): count for index, count in raw["b"].items()}
+        return sketch
+
+
+class Leaderboard:
+    """
+    Multiset of (user_id, value) entries that reports the largest current
+    value per user
+
+    Additions and retractions are counted per (user_id, value), so a
+    retraction only cancels the exact entry it retracts, in whatever order
+    the pair arrives; a count may go negative until its addition shows up.
+    An exact top-K under retractions has to remember every user, since a
+    retracted leader is replaced by the next best user: memory is one entry
+    per user with a current value (plus in-flight update pairs), and top()
+    is O(users log k).
+    """
+
+    def __init__(self):
+        self.counts: Dict[Tuple[str, float], int] = {}
+
+    def add(self, user_id: str, value: float, count: int = 1):
+        key = (user_id, value)
+        remaining = self.counts.get(key, 0) + count
+        if remaining:
+            self.counts[key] = remaining
+        else:
+            self.counts.pop(key, None)
+
+    def merge(self, other: "Leaderboard"):
+        for (user_id, value), count in other.counts.items():
+            self.add(user_id, value, count)
+
+    def subtract(self, other: "Leaderboard"):
+        """Remove another leaderboard's entries (used to retract rows)"""
+        for (user_id, value), count in other.counts.items():
+            self.add(user_id, value, -count)
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """The k users with the largest current values, largest first"""
+        best: Dict[str, float] = {}
+        for (user_id, value), count in self.counts.items():
+            if count > 0 and (user_id not in best or value > best[user_id]):
+                best[user_id] = value
+        return heapq.nlargest(k, best.items(), key=lambda item: item[1])
+
+
+def summarize(sketch: Optional[QuantileSketch], quantiles: List[float]) -> Dict[str, Any]:
+    """Quantile summary of a sketch, e.g. {"count": 10, "p50": 61.2, "p90": 80.5}"""
+    if sketch is None or sketch.count == 0:
+        return {"count": 0}
+    summary: Dict[str, Any] = {"count": sketch.count}
+    for q in quantiles:
+        value = sketch.quantile(q)
+        summary[f"p{q * 100:g}"] = round(value, 2) if value is not None else None
+    return summary
+
+
+class SketchStore:
+    """Latest per-user and global sketches, fed by the pipeline"""
+
+    GLOBAL = "__global__"
+
+    def __init__(self):
+        self._users: Dict[str, Dict[str, QuantileSketch]] = {}
+        self._global: Dict[str, QuantileSketch] = {}
+        self._lock = threading.Lock()
+
+    def on_user_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the per-user distributions table"""
+        if not is_addition:
+            return
+        sketches = {
+            name: QuantileSketch.from_json(value)
+            for name, value in row.items() if name.endswith("_sketch")
+        }
+        with self._lock:
+            self._users[row["user_id"]] = sketches
+
+    def on_global_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """pw.io.subscribe callback for the single-row global distribution tables"""
+        if not is_addition:
+            return
+        sketches = {
+            name: QuantileSketch.from_json(value)
+            for name, value in row.items() if name.endswith("_sketch")
+        }
+        with self._lock:
+            self._global.update(sketches)
+
+    def user(self, user_id: str) -> Dict[str, QuantileSketch]:
+        with self._lock:
+            return dict(self._users.get(user_id, {}))
+
+    def population(self) -> Dict[str, QuantileSketch]:
+        with self._lock:
+            return dict(self._global)
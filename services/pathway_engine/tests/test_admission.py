@@ -0,0 +1,84 @@
+import admission
+from admission import AdmissionController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_controller(monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return AdmissionController(**kwargs), clock
+
+
+def test_first_global_stats_row_marks_sessions_processed(monkeypatch):
+    controller, clock = make_controller(monkeypatch, lag_budget_seconds=30)
+    controller.on_accepted()
+
+    controller.on_global_stats_change(None, {"total_sessions": 1}, 0, True)
+
+    assert controller.stats()["queue_depth"] == 0
+    clock.now += 60
+    assert controller.check_backlog() is None
+
+
+def test_seeded_total_only_counts_new_sessions(monkeypatch):
+    controller, _ = make_controller(monkeypatch)
+    controller.seed_total(500)
+    controller.on_accepted()
+    controller.on_accepted()
+
+    controller.on_total_sessions(501)
+
+    assert controller.stats()["queue_depth"] == 1
+    assert controller.processed == 1
+
+
+def test_lag_budget_rejects_until_backlog_drains(monkeypatch):
+    controller, clock = make_controller(monkeypatch, lag_budget_seconds=30, low_water=0)
+    controller.on_accepted()
+    clock.now += 31
+
+    assert controller.check_backlog() is not None
+    assert controller.rejected_lag == 1
+
+    controller.on_total_sessions(1)
+    assert controller.check_backlog() is None
+
+
+def test_high_water_has_hysteresis(monkeypatch):
+    controller, _ = make_controller(monkeypatch, high_water=3, low_water=1)
+    for _ in range(3):
+        controller.on_accepted()
+    assert controller.check_backlog() is not None
+
+    controller.on_total_sessions(1)  # depth 2, still above low water
+    assert controller.check_backlog() is not None
+
+    controller.on_total_sessions(2)  # depth 1
+    assert controller.check_backlog() is None
+
+
+def test_pending_sessions_expire(monkeypatch):
+    controller, clock = make_controller(monkeypatch, lag_budget_seconds=30, pending_timeout_seconds=300)
+    controller.on_accepted()
+    clock.now += 301
+
+    assert controller.check_backlog() is None
+    assert controller.expired == 1
+
+
+def test_user_rate_limit(monkeypatch):
+    controller, clock = make_controller(monkeypatch, user_rate=1.0, user_burst=2.0)
+    assert controller.check_user("u1") is None
+    assert controller.check_user("u1") is None
+    assert controller.check_user("u1") == 1
+    assert controller.check_user("u2") is None
+
+    clock.now += 1
+    assert controller.check_user("u1") is None
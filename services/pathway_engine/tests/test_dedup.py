@@ -0,0 +1,53 @@
+from dedup import SessionDeduplicator
+
+
+def test_exact_duplicates_in_recent_set():
+    dedup = SessionDeduplicator(recent_size=10, filter_capacity=100)
+
+    assert dedup.check_and_add("s1") is None
+    assert dedup.check_and_add("s2") is None
+    assert dedup.check_and_add("s1") == "exact"
+    assert dedup.stats()["duplicates"] == 1
+
+
+def test_evicted_ids_are_probable_duplicates():
+    dedup = SessionDeduplicator(recent_size=2, filter_capacity=100)
+    for session_id in ("s1", "s2", "s3"):
+        dedup.check_and_add(session_id)
+
+    assert dedup.check_and_add("s1") == "probable"
+    assert dedup.stats()["recent_ids"] == 2
+
+
+def test_filters_rotate_keeping_one_previous_generation():
+    dedup = SessionDeduplicator(recent_size=1, filter_capacity=2, error_rate=1e-6)
+    for index in range(8):
+        dedup.check_and_add(f"s{index}")
+
+    # s0..s6 were evicted into filters of two IDs each, only the last two
+    # filters are kept
+    assert dedup.check_and_add("s6") == "probable"
+    assert dedup.check_and_add("s0") is None
+    assert dedup.stats()["filtered_ids"] <= 4
+
+
+def test_forget_allows_retry():
+    dedup = SessionDeduplicator(recent_size=10, filter_capacity=100)
+    dedup.check_and_add("s1")
+    dedup.forget("s1")
+
+    assert dedup.check_and_add("s1") is None
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "dedup.pkl")
+    dedup = SessionDeduplicator(recent_size=1, filter_capacity=100)
+    dedup.check_and_add("s1")
+    dedup.check_and_add("s2")
+    dedup.save(path)
+
+    restored = SessionDeduplicator(recent_size=1, filter_capacity=100)
+    restored.load(path)
+
+    assert restored.check_and_add("s2") == "exact"
+    assert restored.check_and_add("s1") == "probable"
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp import web
+
+from delivery_stub import StubReceiver
+from intervention_delivery import DeliveryHub
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(receiver: StubReceiver) -> str:
+    """Serve receiver on a daemon thread, return its hook URL"""
+    port = free_port()
+    ready = threading.Event()
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/hook", receiver.hook)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    assert ready.wait(10)
+    return f"http://127.0.0.1:{port}/hook"
+
+
+def start_hub(**options) -> DeliveryHub:
+    hub = DeliveryHub("127.0.0.1", free_port(), **options)
+    hub.start()
+    return hub
+
+
+def subscribe(hub: DeliveryHub, spec) -> dict:
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{hub.port}/subscriptions",
+        data=json.dumps(spec).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+
+def intervention(name: str, user_id: str = "u1", severity: str = "medium") -> dict:
+    return {
+        "intervention_type": name,
+        "user_id": user_id,
+        "severity": severity,
+        "timestamp": "2025-01-01T10:00:00+00:00"
+    }
+
+
+def test_batches_and_filters_server_side():
+    receiver = StubReceiver()
+    hub = start_hub(batch_size=3, linger_ms=200)
+    subscribe(hub, {"url": start_stub(receiver), "intervention_types": ["slow_down"]})
+
+    for _ in range(7):
+        hub.publish(intervention("slow_down"))
+    for _ in range(2):
+        hub.publish(intervention("take_break"))
+    hub.drain()
+
+    assert receiver.by_type == {"slow_down": 7}
+    assert receiver.largest_batch == 3
+    assert receiver.batches == 3
+    assert hub.stats()["unmatched"] == 2
+
+
+def test_retries_failed_post():
+    receiver = StubReceiver(fail_first=1)
+    hub = start_hub(batch_size=10, linger_ms=50, backoff_ms=10)
+    subscribe(hub, {"url": start_stub(receiver)})
+
+    for _ in range(4):
+        hub.publish(intervention("slow_down"))
+    hub.drain()
+
+    assert receiver.failed == 1
+    assert receiver.interventions == 4
+    subscriber = hub.stats()["subscribers"][0]
+    assert (subscriber["delivered"], subscriber["retries"], subscriber["failed"]) == (4, 1, 0)
+
+
+def test_start_raises_when_port_is_taken():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        hub = DeliveryHub("127.0.0.1", sock.getsockname()[1])
+
+        with pytest.raises(OSError):
+            hub.start()
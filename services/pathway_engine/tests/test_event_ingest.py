@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from intervention_gate import parse_event_time
+
+
+def test_parse_event_time_formats():
+    expected = datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc)
+
+    assert parse_event_time("2025-01-01T10:00:00Z") == expected
+    assert parse_event_time("2025-01-01T11:00:00+01:00") == expected
+    assert parse_event_time("2025-01-01T10:00:00") == expected  # naive is UTC
+    assert parse_event_time(expected.timestamp()) == expected
+
+
+@pytest.mark.parametrize("value", [None, "", "yesterday", "2025-13-01T00:00:00", 1e20, float("nan"), float("inf"), True, [], {}])
+def test_parse_event_time_rejects(value):
+    assert parse_event_time(value) is None
+
+
+def test_ingest_validates_batch_before_pushing():
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("pathway")
+    from event_ingest import EventIngestSubject
+
+    subject = EventIngestSubject("127.0.0.1", 0)
+    pushed = []
+    subject.next = lambda **row: pushed.append(row)
+
+    accepted, rejected = subject.ingest([
+        {"user_id": "u1", "event_type": "keystroke", "timestamp": "2025-01-01T10:00:00Z"},
+        {"user_id": "u1", "event_type": "keystroke", "timestamp": "not a time"},
+        {"user_id": "u1", "event_type": "keystroke", "timestamp": 1e20},
+        {"user_id": "u2", "event_type": "blur", "timestamp": 1735725600},
+    ])
+
+    assert (accepted, rejected) == (2, 2)
+    assert [row["user_id"] for row in pushed] == ["u1", "u2"]
+    assert pushed[1]["timestamp"] == "2025-01-01T10:00:00+00:00"
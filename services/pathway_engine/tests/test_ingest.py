@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_ingestor(input_dir):
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("fastapi")
+    from admission import AdmissionController
+    from dedup import SessionDeduplicator
+    from ingest import SessionIngestor
+
+    return SessionIngestor(str(input_dir), SessionDeduplicator(1000, 10000), AdmissionController())
+
+
+def session(user_id="u1", **fields):
+    from ingest import SessionEvent
+
+    return SessionEvent(**{
+        "user_id": user_id, "session_type": "code", "timestamp": "2025-01-01T10:00:00Z",
+        "duration": 600, "focus_score": 70, "quality_score": 60, "distractions": 1,
+        **fields
+    })
+
+
+def test_write_csv_stages_inside_input_dir(tmp_path):
+    input_dir = tmp_path / "input"
+    ingestor = make_ingestor(input_dir)
+
+    csv_file = ingestor.write_csv(session())
+
+    assert os.listdir(input_dir) == [os.path.basename(csv_file)]
+    assert csv_file.endswith(".csv")
+    assert not os.path.exists(f"{input_dir}.staging")
+    assert open(csv_file).read().splitlines()[1].startswith("u1,code,1735725600,600")
+
+
+def test_connector_ignores_files_being_written(tmp_path):
+    pytest.importorskip("pathway")
+    input_dir = tmp_path / "input"
+    make_ingestor(input_dir).write_csv(session("u1"))
+    # A staging file caught before its rename
+    staged = make_ingestor(tmp_path / "staged").write_csv(session("u2"))
+    os.replace(staged, input_dir / f".{os.path.basename(staged)}.tmp")
+    env = {
+        **os.environ,
+        "INPUT_DIR": str(input_dir),
+        "OUTPUT_DIR": str(tmp_path / "output"),
+        "PERSISTENCE_ENABLED": "false",
+        "OUTPUT_LOG_DIR": str(tmp_path / "outputs"),
+        "PIPELINE_INPUT_MODE": "static",
+        "HISTORY_ENABLED": "false",
+    }
+
+    subprocess.run([sys.executable, "pathway_analytics.py"], cwd=ENGINE_DIR, env=env, check=True, capture_output=True, timeout=120)
+
+    with open(tmp_path / "output" / "comprehensive.jsonl") as f:
+        users = {json.loads(line)["user_id"] for line in f}
+    assert users == {"u1"}
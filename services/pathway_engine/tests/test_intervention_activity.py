@@ -0,0 +1,61 @@
+from intervention_activity import ActivityTracker
+
+
+def tracker(**options) -> ActivityTracker:
+    return ActivityTracker(inactivity_seconds=100, break_seconds=30, continuous_work_seconds=60, **options)
+
+
+def types(candidates) -> list:
+    return [(c["user_id"], c["intervention_type"]) for c in candidates]
+
+
+def test_continuous_work_fires_once_per_stretch():
+    activity = tracker()
+    fired = []
+    for at in range(0, 100, 20):
+        fired += activity.observe("u1", at)
+
+    assert types(fired) == [("u1", "continuous_work")]
+    assert fired[0]["data"]["work_minutes"] == 1
+
+
+def test_break_starts_a_new_stretch():
+    activity = tracker()
+    for at in (0, 20, 40):
+        activity.observe("u1", at)
+
+    # A 30s gap is a break, the stretch restarts at 70
+    for at in (70, 90, 110):
+        assert activity.observe("u1", at) == []
+    assert types(activity.observe("u1", 130)) == [("u1", "continuous_work")]
+
+
+def test_inactivity_fires_and_forgets_idle_users():
+    activity = tracker()
+    activity.observe("u1", 0)
+    activity.observe("u2", 50)
+
+    fired = activity.observe("u2", 100)
+
+    assert types(fired) == [("u1", "inactivity")]
+    assert fired[0]["timestamp"].timestamp() == 100
+    assert activity.stats()["tracked_users"] == 1
+
+
+def test_late_events_for_idle_users_are_ignored():
+    activity = tracker()
+    activity.observe("u1", 500)
+
+    assert activity.observe("u2", 300) == []
+    assert activity.stats()["tracked_users"] == 1
+
+
+def test_bucket_changes_reach_on_fire():
+    fired = []
+    activity = tracker(on_fire=[fired.append])
+
+    activity.on_bucket_change(None, {"user_id": "u1", "last_event": "1970-01-01T00:00:00+00:00"}, 0, True)
+    activity.on_bucket_change(None, {"user_id": "u2", "last_event": "1970-01-01T00:05:00+00:00"}, 0, True)
+    activity.on_bucket_change(None, {"user_id": "u2", "last_event": "1970-01-01T00:10:00+00:00"}, 0, False)
+
+    assert types(fired) == [("u1", "inactivity")]
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from intervention_rules import Baseline, RuleEngine
+
+HOP = 5
+
+
+def engine(tmp_path, **overrides) -> RuleEngine:
+    spec = {
+        "name": "reduce_context_switching", "kind": "zscore", "event_type": "tab_switch",
+        "window_seconds": 5, "z_threshold": 3, "min_count": 5, "warmup": 10,
+        "severity": "medium", "message": "{count} switches, usually {baseline}",
+        **overrides
+    }
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([spec]))
+    return RuleEngine(str(path), HOP)
+
+
+def test_zscore_rule_fires_on_spike_above_baseline(tmp_path):
+    rules = engine(tmp_path)
+    start = 0
+    for count in [2, 3] * 10:
+        assert rules.update("u1", "tab_switch", start, count, start) == []
+        start += HOP
+
+    # Within the user's usual spread
+    assert rules.update("u1", "tab_switch", start, 4, start) == []
+    start += HOP
+    fired = rules.update("u1", "tab_switch", start, 20, start)
+
+    assert len(fired) == 1
+    assert fired[0]["data"]["z"] >= 3
+    assert fired[0]["data"]["baseline"] == pytest.approx(2.5, abs=0.5)
+
+
+def test_zscore_rule_respects_min_count(tmp_path):
+    rules = engine(tmp_path, min_count=30)
+    start = 0
+    for _ in range(20):
+        rules.update("u1", "tab_switch", start, 0, start)
+        start += HOP
+
+    assert rules.update("u1", "tab_switch", start, 20, start) == []
+
+
+def test_zscore_rule_uses_threshold_during_warmup(tmp_path):
+    rules = engine(tmp_path, threshold=10)
+
+    assert rules.update("u1", "tab_switch", 0, 10, 0) == []
+    assert len(rules.update("u1", "tab_switch", 5, 11, 5)) == 1
+
+
+def test_zero_samples_in_closed_form():
+    alpha = 0.1
+    stepped, folded = Baseline(), Baseline()
+    for x in (4, 6, 5):
+        stepped.observe(x, alpha)
+        folded.observe(x, alpha)
+
+    for _ in range(7):
+        stepped.observe(0.0, alpha)
+    folded.observe_zeros(7, alpha)
+
+    assert folded.mean == pytest.approx(stepped.mean)
+    assert folded.var == pytest.approx(stepped.var)
+    assert folded.samples == stepped.samples
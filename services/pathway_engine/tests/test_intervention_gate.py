@@ -0,0 +1,71 @@
+from intervention_gate import InterventionGate, parse_cooldowns
+
+
+def candidate(at: float, name: str = "slow_down", user_id: str = "u1", severity: str = "low") -> dict:
+    return {
+        "user_id": user_id,
+        "intervention_type": name,
+        "severity": severity,
+        "message": "Slow down",
+        "data": {"count": 5},
+        "timestamp": at
+    }
+
+
+def test_cooldown_suppresses_per_user_and_type():
+    gate = InterventionGate(cooldown_seconds=10, escalate_after=0)
+
+    first = gate.offer(candidate(0))
+    assert first["data"] == {"count": 5, "suppressed": 0, "escalation_level": 0}
+    assert gate.offer(candidate(5)) is None
+    assert gate.offer(candidate(0)) is None  # replay of the delivered candidate
+    assert gate.offer(candidate(5, user_id="u2")) is not None
+    assert gate.offer(candidate(5, name="take_break")) is not None
+
+    after = gate.offer(candidate(10))
+    assert after["data"]["suppressed"] == 2
+    assert gate.stats()["suppressed"] == 2
+
+
+def test_per_type_cooldowns():
+    gate = InterventionGate(cooldown_seconds=10, cooldowns=parse_cooldowns("take_break=100, bad"), escalate_after=0)
+
+    gate.offer(candidate(0, name="take_break"))
+    assert gate.offer(candidate(50, name="take_break")) is None
+    assert gate.offer(candidate(100, name="take_break")) is not None
+
+
+def test_escalation_raises_severity_and_cooldown():
+    gate = InterventionGate(cooldown_seconds=10, escalation_window_seconds=100, escalate_after=2)
+
+    levels = [gate.offer(candidate(at))["data"]["escalation_level"] for at in (0, 10, 20)]
+    assert levels == [0, 0, 1]
+
+    # Level 1 doubles the cooldown
+    assert gate.offer(candidate(30)) is None
+    escalated = gate.offer(candidate(40))
+    assert escalated["severity"] == "medium"
+    assert escalated["message"].startswith("Slow down (repeated")
+
+    # A quiet stretch past the escalation window resets the streak
+    assert gate.offer(candidate(500))["data"]["escalation_level"] == 0
+
+
+def test_submit_emits_only_delivered():
+    emitted = []
+    gate = InterventionGate(cooldown_seconds=10, on_emit=[emitted.append])
+
+    for at in (0, 1, 2, 15):
+        gate.submit(candidate(at))
+
+    assert [row["timestamp"] for row in emitted] == [0, 15]
+
+
+def test_idle_keys_are_evicted():
+    gate = InterventionGate(cooldown_seconds=10, escalation_window_seconds=10, prune_every=1)
+
+    gate.offer(candidate(0, user_id="u1"))
+    gate.offer(candidate(10_000, user_id="u2"))
+
+    assert gate.stats()["tracked_keys"] == 1
+    assert gate.stats()["evicted"] == 1
@@ -0,0 +1,64 @@
+import json
+
+from intervention_rules import RuleEngine
+
+HOP = 5
+
+
+def engine(tmp_path, *specs, **options) -> RuleEngine:
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(list(specs)))
+    return RuleEngine(str(path), HOP, **options)
+
+
+def threshold_rule(**overrides):
+    return {
+        "name": "slow_down", "event_type": "keystroke", "window_seconds": 10,
+        "threshold": 3, "severity": "high", "message": "Typing {count} in {window_seconds}s",
+        **overrides
+    }
+
+
+def test_threshold_rule_fires_over_window_once_per_span(tmp_path):
+    rules = engine(tmp_path, threshold_rule())
+
+    assert rules.update("u1", "keystroke", 0, 2, 1) == []
+    fired = rules.update("u1", "keystroke", 5, 2, 6)
+    assert [(c["intervention_type"], c["data"]["count"], c["message"]) for c in fired] == [
+        ("slow_down", 4, "Typing 4 in 10s")
+    ]
+
+    # Same burst, still inside the quiet period of one window span
+    assert rules.update("u1", "keystroke", 5, 3, 8) == []
+    assert rules.update("u1", "keystroke", 10, 3, 11) == []
+    assert len(rules.update("u1", "keystroke", 20, 4, 21)) == 1
+    assert rules.stats()["fired"] == {"slow_down": 2}
+
+
+def test_rules_only_see_their_event_type_and_user(tmp_path):
+    rules = engine(tmp_path, threshold_rule())
+
+    rules.update("u1", "keystroke", 0, 3, 1)
+    assert rules.update("u1", "blur", 0, 10, 1) == []
+    assert rules.update("u2", "keystroke", 0, 3, 1) == []
+
+
+def test_late_bucket_rechecks_newer_windows(tmp_path):
+    in_order = engine(tmp_path, threshold_rule(threshold=10))
+    assert in_order.update("u1", "keystroke", 0, 7, 1) == []
+    assert len(in_order.update("u1", "keystroke", 5, 8, 6)) == 1
+
+    late = engine(tmp_path, threshold_rule(threshold=10))
+    assert late.update("u1", "keystroke", 5, 8, 6) == []
+    fired = late.update("u1", "keystroke", 0, 7, 1)
+
+    assert [c["data"]["count"] for c in fired] == [15]
+
+
+def test_broken_rules_file_keeps_current_rules(tmp_path):
+    rules = engine(tmp_path, threshold_rule())
+    (tmp_path / "rules.json").write_text(json.dumps([{"name": "incomplete"}]))
+
+    rules.reload()
+
+    assert [rule.name for rule in rules.rules()] == ["slow_down"]
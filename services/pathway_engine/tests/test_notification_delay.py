@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+pytest.importorskip("pathway")
+
+from pathway_interventions import NotificationDelay
+
+
+def test_report_keeps_counters_apart_from_delay(tmp_path):
+    output = tmp_path / "notification_delay.json"
+    delay = NotificationDelay(str(output))
+    delay.observe({"intervention_type": "slow_down", "timestamp": 0.0})
+
+    delay.report({"gate": {"offered": 1, "delivered": 1}, "ingest": None})
+
+    report = json.loads(output.read_text())
+    assert report["delay"]["slow_down"]["count"] == 1
+    assert report["counters"] == {"gate": {"offered": 1, "delivered": 1}, "ingest": None}
+
+
+def test_report_without_deliveries_still_writes_counters(tmp_path):
+    output = tmp_path / "notification_delay.json"
+    NotificationDelay(str(output)).report({"gate": {"offered": 0}})
+
+    assert json.loads(output.read_text()) == {"delay": {}, "counters": {"gate": {"offered": 0}}}
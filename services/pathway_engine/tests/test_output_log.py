@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from analytics_state import LatestRow, UserAnalyticsState
+from jsonl_follower import JsonlFollower
+from output_log import OutputLogWriter, compact, log_path, prepare
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_HEADER = "user_id,session_type,timestamp,duration,focus_score,quality_score,distractions,language,lines_of_code,creativity_score\n"
+
+
+def run_pipeline(log_dir, updates, resume=True, name="global_stats"):
+    """One pipeline run: prepare the logs, then write (row, time, is_addition) updates"""
+    prepare(str(log_dir), resume=resume, names=[name])
+    writer = OutputLogWriter(log_path(str(log_dir), name))
+    for row, time, is_addition in updates:
+        writer.on_change(None, row, time, is_addition)
+    writer.on_time_end(0)
+    writer.on_end()
+
+
+def latest_total(log_dir) -> int:
+    stats = LatestRow()
+    JsonlFollower(log_path(str(log_dir), "global_stats"), stats.on_change).poll()
+    return stats.get()["total_sessions"]
+
+
+def test_log_survives_two_restarts(tmp_path):
+    run_pipeline(tmp_path, [
+        ({"total_sessions": 1}, 2, True),
+        ({"total_sessions": 1}, 4, False),
+        ({"total_sessions": 2}, 4, True),
+    ])
+    # Resumed from a snapshot taken before time 4: Pathway re-emits its updates
+    run_pipeline(tmp_path, [
+        ({"total_sessions": 1}, 4, False),
+        ({"total_sessions": 2}, 4, True),
+        ({"total_sessions": 2}, 6, False),
+        ({"total_sessions": 3}, 6, True),
+    ])
+    # Nothing new to read, Pathway emits nothing
+    run_pipeline(tmp_path, [])
+
+    assert latest_total(tmp_path) == 3
+    with open(log_path(str(tmp_path), "global_stats")) as f:
+        assert len(f.readlines()) == 1
+
+
+def test_compact_keeps_current_rows_in_update_order(tmp_path):
+    path = tmp_path / "comprehensive.jsonl"
+    lines = [
+        {"user_id": "u1", "total": 1, "time": 2, "diff": 1},
+        {"user_id": "u2", "total": 1, "time": 2, "diff": 1},
+        {"user_id": "u1", "total": 1, "time": 4, "diff": -1},
+        {"user_id": "u1", "total": 2, "time": 4, "diff": 1},
+    ]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines) + '{"user_id": "u3"')
+
+    assert compact(str(path)) == 2
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert rows == [
+        {"user_id": "u2", "total": 1, "time": 2, "diff": 1},
+        {"user_id": "u1", "total": 2, "time": 4, "diff": 1},
+    ]
+
+
+def test_prepare_without_persistence_clears_logs(tmp_path):
+    run_pipeline(tmp_path, [({"total_sessions": 5}, 2, True)])
+
+    prepare(str(tmp_path), resume=False, names=["global_stats"])
+
+    assert not os.path.exists(log_path(str(tmp_path), "global_stats"))
+
+
+def test_follower_replays_after_compaction(tmp_path):
+    updates = [
+        ({"user_id": "u1", "total_sessions": 1}, 2, True),
+        ({"user_id": "u2", "total_sessions": 1}, 2, True),
+        ({"user_id": "u1", "total_sessions": 1}, 4, False),
+        ({"user_id": "u1", "total_sessions": 2}, 4, True),
+    ]
+    run_pipeline(tmp_path, updates, name="comprehensive")
+    state = UserAnalyticsState()
+    follower = JsonlFollower(log_path(str(tmp_path), "comprehensive"), state.on_comprehensive_change)
+    assert follower.poll() == 4
+
+    run_pipeline(tmp_path, [], name="comprehensive")
+
+    assert follower.poll() == 2
+    assert state.snapshot("u1")[1]["total_sessions"] == 2
+    assert state.snapshot("u2") is not None
+
+
+def test_admission_seeds_from_log(tmp_path):
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("fastapi")
+    from ingest import persisted_session_total
+
+    run_pipeline(tmp_path, [({"total_sessions": 3}, 2, True)])
+    run_pipeline(tmp_path, [])
+
+    assert persisted_session_total(str(tmp_path)) == 3
+    assert persisted_session_total(str(tmp_path / "missing")) == 0
+
+
+def test_pipeline_restarts_keep_outputs(tmp_path):
+    pytest.importorskip("pathway")
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    env = {
+        **os.environ,
+        "INPUT_DIR": str(input_dir),
+        "OUTPUT_DIR": str(tmp_path / "output"),
+        "PERSISTENCE_DIR": str(tmp_path / "state"),
+        "PIPELINE_INPUT_MODE": "static",
+        "HISTORY_ENABLED": "false",
+    }
+
+    def restart(user_id=None, timestamp=0):
+        if user_id:
+            (input_dir / f"{user_id}.csv").write_text(CSV_HEADER + f"{user_id},code,{timestamp},600,70,60,1,python,10,0\n")
+        subprocess.run([sys.executable, "pathway_analytics.py"], cwd=ENGINE_DIR, env=env, check=True, capture_output=True, timeout=120)
+
+    restart("u1", 1735725600)
+    restart("u2", 1735725700)
+    restart()
+
+    log_dir = tmp_path / "state" / "outputs"
+    assert latest_total(log_dir) == 2
+    state = UserAnalyticsState()
+    JsonlFollower(log_path(str(log_dir), "comprehensive"), state.on_comprehensive_change).poll()
+    assert state.snapshot("u1") is not None
+    assert state.snapshot("u2") is not None
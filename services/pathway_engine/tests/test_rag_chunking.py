@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("pathway")
+pytest.importorskip("tiktoken")
+
+from pathway_rag import LocalTokenizer, SessionSplitter, load_tokenizer, number_chunks
+
+
+@pytest.fixture(params=["loaded", "local"])
+def tokenizer(request):
+    # The tiktoken encoding when it can be loaded, the offline fallback always
+    return load_tokenizer() if request.param == "loaded" else LocalTokenizer()
+
+
+def test_number_chunks():
+    assert number_chunks([("first.", {}), ("second.", {"a": 1})]) == [(0, "first."), (1, "second.")]
+    assert number_chunks([]) == []
+
+
+def test_long_session_is_split_within_token_bounds(tokenizer):
+    splitter = SessionSplitter(min_tokens=5, max_tokens=20, tokenizer=tokenizer)
+    text = " ".join(f"Worked on module {i} and fixed the failing tests." for i in range(30))
+
+    chunks = number_chunks(splitter.chunk(text))
+
+    assert len(chunks) > 1
+    assert [index for index, _ in chunks] == list(range(len(chunks)))
+    assert all(len(tokenizer.encode_ordinary(chunk)) <= 20 for _, chunk in chunks)
+    assert "".join(chunk for _, chunk in chunks).split() == text.split()
+
+
+def test_short_session_stays_one_chunk(tokenizer):
+    splitter = SessionSplitter(min_tokens=5, max_tokens=300, tokenizer=tokenizer)
+
+    assert number_chunks(splitter.chunk("Reviewed a pull request.")) == [(0, "Reviewed a pull request.")]
+
+
+def test_local_tokenizer_round_trips():
+    tokenizer = LocalTokenizer()
+    text = "  Refactored\tthe parser;  tests pass.\n"
+
+    assert tokenizer.decode(tokenizer.encode_ordinary(text)) == text
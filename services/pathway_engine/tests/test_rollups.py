@@ -0,0 +1,42 @@
+from rollups import DailyRollupStore, current_day
+
+
+def bucket(user_id: str, day: int, sessions: int = 1, session_type: str = "code") -> dict:
+    return {
+        "user_id": user_id,
+        "day": day,
+        "session_type": session_type,
+        "sessions": sessions,
+        "sum_focus": 70 * sessions,
+        "sum_quality": 60 * sessions,
+        "total_duration": 1800 * sessions,
+        "total_distractions": sessions,
+        "max_focus": 70,
+        "min_focus": 70
+    }
+
+
+def test_rows_outside_retention_leave_no_state():
+    store = DailyRollupStore(max_days=7)
+    old = bucket("u1", current_day() - 30)
+
+    store.on_change(None, old, 0, True)
+    store.on_change(None, old, 0, False)
+
+    assert store._buckets == {}
+
+
+def test_update_replaces_bucket_and_retraction_removes_user():
+    store = DailyRollupStore(max_days=7)
+    first = bucket("u1", current_day(), sessions=1)
+    second = bucket("u1", current_day(), sessions=2)
+
+    # Pathway may deliver the new row before retracting the old one
+    store.on_change(None, first, 0, True)
+    store.on_change(None, second, 1, True)
+    store.on_change(None, first, 1, False)
+
+    assert store.query("u1", "7d")["overview"]["total_sessions"] == 2
+
+    store.on_change(None, second, 2, False)
+    assert store._buckets == {}
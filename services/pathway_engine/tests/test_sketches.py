@@ -0,0 +1,104 @@
+from sketches import Leaderboard, QuantileSketch, summarize
+
+
+def leaderboard(*entries):
+    board = Leaderboard()
+    for user_id, value in entries:
+        board.add(user_id, value)
+    return board
+
+
+def test_leaderboard_update_replaces_value():
+    board = leaderboard(("a", 50.0), ("b", 70.0))
+    board.merge(leaderboard(("a", 90.0)))
+    board.subtract(leaderboard(("a", 50.0)))
+
+    assert board.top(2) == [("a", 90.0), ("b", 70.0)]
+
+
+def test_leaderboard_retraction_before_addition():
+    board = leaderboard(("a", 50.0))
+    board.subtract(leaderboard(("a", 50.0)))
+    board.subtract(leaderboard(("b", 60.0)))  # arrives before its addition
+
+    assert board.top(5) == []
+    board.merge(leaderboard(("b", 60.0)))
+    assert board.top(5) == []
+    assert board.counts == {}
+
+
+def test_leaderboard_same_value_update_keeps_user():
+    board = leaderboard(("a", 80.0))
+    # Update pair with an unchanged value, addition applied first
+    board.merge(leaderboard(("a", 80.0)))
+    board.subtract(leaderboard(("a", 80.0)))
+
+    assert board.top(1) == [("a", 80.0)]
+
+
+def test_leaderboard_reports_k_largest():
+    board = leaderboard(*[(f"u{i}", float(i)) for i in range(100)])
+
+    assert [user_id for user_id, _ in board.top(3)] == ["u99", "u98", "u97"]
+
+
+def test_quantiles_within_relative_accuracy():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    values = [float(v) for v in range(1, 1001)]
+    for value in values:
+        sketch.add(value)
+
+    assert abs(sketch.quantile(0.5) - 500.5) / 500.5 < 0.02
+    assert abs(sketch.quantile(0.9) - 900.1) / 900.1 < 0.02
+    assert summarize(sketch, [0.5])["count"] == 1000
+
+
+def test_subtract_restores_merged_sketch():
+    base = QuantileSketch()
+    extra = QuantileSketch()
+    for value in (10, 20, 30):
+        base.add(value)
+    extra.add(40)
+    extra.add(0)
+
+    base.merge(extra)
+    base.subtract(extra)
+
+    assert base.count == 3
+    assert base.zero_count == 0
+    assert base.quantile(1.0) < 31
+
+
+def test_subtract_after_collapse():
+    total = QuantileSketch(max_buckets=4)
+    rows = []
+    for value in (1, 2, 4, 8, 16, 32, 64):
+        row = QuantileSketch(max_buckets=4)
+        row.add(value)
+        rows.append(row)
+        total.merge(row)
+
+    assert len(total.buckets) == 4
+    for row in rows[:3]:
+        total.subtract(row)
+
+    assert total.count == 4
+    assert all(count > 0 for count in total.buckets.values())
+    assert total.quantile(0.0) > 4
+
+    for row in rows[3:]:
+        total.subtract(row)
+    assert total.count == 0
+
+
+def test_json_round_trip():
+    sketch = QuantileSketch()
+    for value in (0, 1.5, 70, 70, 3000):
+        sketch.add(value)
+
+    restored = QuantileSketch.from_json(sketch.to_json())
+
+    assert restored.buckets == sketch.buckets
+    assert restored.zero_count == sketch.zero_count
+    assert restored.min_index == sketch.min_index
+    assert restored.rank(70) == sketch.rank(70)